@@ -32,8 +32,8 @@ setup(
     install_requires=[
         "setuptools",
         "chardet",
+        "numpy",
         "pandas",
-        "jsonlines",
         "pyarrow",
         "pyzstd",
         "huggingface-hub",
@@ -41,6 +41,11 @@ setup(
         "pyyaml",
         "wai.logging",
     ],
+    extras_require={
+        "fast": ["orjson"],
+        "re2": ["google-re2"],
+        "tokenizers": ["tokenizers"],
+    },
     version="0.2.5",
     author='Peter Reutemann',
     author_email='fracpete@waikato.ac.nz',
@@ -53,6 +58,7 @@ setup(
             "llm-find=ldc.tool.find:sys_main",
             "llm-help=ldc.tool.help:sys_main",
             "llm-paste=ldc.tool.paste:sys_main",
+            "llm-resolve-buckets=ldc.tool.resolve_buckets:sys_main",
             "llm-registry=ldc.registry:sys_main",
         ],
         "class_lister": [
@@ -1,3 +1,4 @@
 from ._downloader import Downloader
 from ._filter import *
 from ._io import *
+from ._json import *
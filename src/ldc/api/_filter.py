@@ -10,7 +10,16 @@ class Filter(seppl.io.Filter, DomainHandler):
     """
     Ancestor for ldc filters.
     """
-    pass
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return False
 
 
 class MultiFilter(seppl.io.MultiFilter, DomainHandler):
@@ -23,3 +32,33 @@ class MultiFilter(seppl.io.MultiFilter, DomainHandler):
         :rtype: list
         """
         return [DOMAIN_ANY]
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether any of the filters keeps state across records.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return is_stateful(self.filters)
+
+
+def is_stateful(filters) -> bool:
+    """
+    Returns whether the filter(s) keep state across records, i.e., cannot be run in multiple processes.
+
+    :param filters: the filter or list of filters to check, can be None
+    :return: True if at least one of the filters is stateful
+    :rtype: bool
+    """
+    if filters is None:
+        return False
+    if not isinstance(filters, list):
+        filters = [filters]
+    for filter_ in filters:
+        if isinstance(filter_, seppl.io.MultiFilter) and not hasattr(filter_, "is_stateful"):
+            if is_stateful(filter_.filters):
+                return True
+        elif hasattr(filter_, "is_stateful") and filter_.is_stateful():
+            return True
+    return False
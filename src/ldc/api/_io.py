@@ -1,15 +1,22 @@
 import abc
+import argparse
 import bz2
+import codecs
+import csv
+import io
+import json
 import logging
+import queue
+import threading
 
-import chardet
+from chardet.universaldetector import UniversalDetector
 import gzip
 import lzma
 import os
 import pyzstd
 import seppl.io
 
-from typing import Iterable, Optional
+from typing import Iterable, List, Optional, Tuple
 
 from ldc.core import DomainHandler
 from wai.logging import LOGGING_WARNING
@@ -58,25 +65,201 @@ def encoding_max_check_length() -> int:
     return ENCODING_MAX_CHECK_LENGTH
 
 
-def determine_encoding(path: str, max_check_length: int = None) -> Optional[str]:
+ENV_ENCODING_CACHE = "LDC_ENCODING_CACHE"
+""" the environment variable with the file to persist the determined file encodings in. """
+
+ENCODING_DETECTION_CHUNK_SIZE = 4096
+""" the number of bytes to feed into the encoding detector at a time. """
+
+_encoding_cache = None
+""" the cache for determined encodings: (path, size, mtime) -> encoding. """
+
+_encoding_cache_file = None
+""" the file to persist the cache in, None if in-memory only. """
+
+
+def _encoding_cache_key(path: str) -> Tuple[str, int, int]:
+    """
+    Generates the cache key for the file.
+
+    :param path: the file to generate the key for
+    :type path: str
+    :return: the key: absolute path, size, modification time (ns)
+    :rtype: tuple
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def set_encoding_cache_file(path: Optional[str]):
+    """
+    Sets the file to persist the determined file encodings in, loading any encodings stored in it.
+    Uses the file specified by environment variable constant ENV_ENCODING_CACHE by default.
+
+    :param path: the cache file to use, None for an in-memory cache only
+    :type path: str
+    """
+    global _encoding_cache
+    global _encoding_cache_file
+    _encoding_cache = dict()
+    _encoding_cache_file = path
+    if (path is None) or not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            parts = line.rstrip("\n").split("\t", 3)
+            if len(parts) != 4:
+                continue
+            try:
+                _encoding_cache[(parts[3], int(parts[1]), int(parts[2]))] = parts[0]
+            except ValueError:
+                continue
+
+
+def _get_encoding_cache() -> dict:
+    """
+    Returns the encoding cache, initializing it if necessary.
+
+    :return: the cache
+    :rtype: dict
+    """
+    if _encoding_cache is None:
+        set_encoding_cache_file(os.environ.get(ENV_ENCODING_CACHE, None))
+    return _encoding_cache
+
+
+def cache_encoding(path: str, encoding: str):
+    """
+    Stores the encoding for the file in the cache (and the cache file, if any).
+
+    :param path: the file to store the encoding for
+    :type path: str
+    :param encoding: the encoding of the file
+    :type encoding: str
+    """
+    key = _encoding_cache_key(path)
+    cache = _get_encoding_cache()
+    if cache.get(key, None) == encoding:
+        return
+    cache[key] = encoding
+    if _encoding_cache_file is not None:
+        with open(_encoding_cache_file, "a", encoding="utf-8") as fp:
+            fp.write("%s\t%d\t%d\t%s\n" % (encoding, key[1], key[2], key[0]))
+
+
+def clear_encoding_cache():
+    """
+    Empties the in-memory encoding cache (the cache file remains untouched).
+    """
+    global _encoding_cache
+    _encoding_cache = dict()
+
+
+def load_encoding_map(path: str) -> int:
+    """
+    Loads the per-file encodings from the map generated by llm-file-encoding (JSON lines or CSV format,
+    determined by extension) into the encoding cache. Files that no longer exist get skipped.
+
+    :param path: the map to load (.jsonl or .csv)
+    :type path: str
+    :return: the number of encodings that were loaded
+    :rtype: int
+    """
+    result = 0
+    with open(path, "r", encoding="utf-8", newline="") as fp:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(fp)
+        elif path.lower().endswith(".jsonl"):
+            rows = (json.loads(line) for line in fp if len(line.strip()) > 0)
+        else:
+            raise Exception("Unsupported encoding map format (.jsonl or .csv): %s" % path)
+        for row in rows:
+            input_file = row.get("file", None)
+            encoding = row.get("encoding", None)
+            if (input_file is None) or (encoding is None) or (len(encoding) == 0):
+                continue
+            if not os.path.exists(input_file):
+                continue
+            cache_encoding(input_file, encoding)
+            result += 1
+    return result
+
+
+def _is_utf8(raw: bytes, complete: bool) -> bool:
+    """
+    Checks whether the bytes are valid UTF-8. Null bytes are not accepted, as they hint at UTF-16/32.
+
+    :param raw: the bytes to check
+    :type raw: bytes
+    :param complete: whether the bytes represent the complete file, otherwise a truncated multibyte
+                     sequence at the end is accepted
+    :type complete: bool
+    :return: True if valid UTF-8
+    :rtype: bool
+    """
+    if b"\x00" in raw:
+        return False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(raw, final=complete)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _detect_encoding(path: str, max_check_length: int) -> Optional[str]:
+    """
+    Determines the encoding of the file. Accepts UTF-8 if the sample validates as such,
+    otherwise feeds the sample incrementally into chardet's detector until it is confident.
+
+    :param path: the file to determine the encoding for
+    :type path: str
+    :param max_check_length: the maximum number of bytes to use for determining the encoding, -1 for all
+    :type max_check_length: int
+    :return: the encoding, None if it could not be determined
+    :rtype: str
+    """
+    with open(path, "rb") as fp:
+        raw = fp.read(max_check_length)
+        complete = (max_check_length < 0) or (len(raw) < max_check_length) or (len(fp.read(1)) == 0)
+    if raw.startswith(codecs.BOM_UTF8):
+        return "UTF-8-SIG"
+    if _is_utf8(raw, complete):
+        return "utf-8"
+    detector = UniversalDetector()
+    for i in range(0, len(raw), ENCODING_DETECTION_CHUNK_SIZE):
+        detector.feed(raw[i:i + ENCODING_DETECTION_CHUNK_SIZE])
+        if detector.done:
+            break
+    return detector.close()["encoding"]
+
+
+def determine_encoding(path: str, max_check_length: int = None, use_cache: bool = True) -> Optional[str]:
     """
     Determines the file encoding of the text file.
+    Results get cached using path, size and modification time of the file (see set_encoding_cache_file).
 
     :param path: the file to determine the encoding for
     :type path: str
     :param max_check_length: the maximum number of bytes to use for determining the encoding, -1 for all
     :type max_check_length: int
+    :param use_cache: whether to use the encoding cache
+    :type use_cache: bool
     :return: the encoding, None if file does not exist
     :rtype: str
     """
     if os.path.exists(path):
+        if use_cache:
+            result = _get_encoding_cache().get(_encoding_cache_key(path), None)
+            if result is not None:
+                return result
         if max_check_length is None:
             max_check_length = encoding_max_check_length()
-        raw = open(path, "rb").read(max_check_length)
-        result = chardet.detect(raw)["encoding"]
+        result = _detect_encoding(path, max_check_length)
         # use utf-8 over ascii
         if result == "ascii":
             result = "utf-8"
+        if use_cache and (result is not None):
+            cache_encoding(path, result)
         return result
     else:
         return None
@@ -156,10 +339,373 @@ def strip_filename(path: str, strip_path: bool = False, strip_extension: bool =
     return path
 
 
-def open_file(path: str, mode: str = None, encoding: str = None, compression: str = None, logger: logging.Logger = None):
+DEFAULT_COMPRESSION_CHUNK_SIZE = 1024 * 1024
+""" the size of the chunks that the background threads (de)compress at a time. """
+
+DEFAULT_COMPRESSION_MAX_CHUNKS = 4
+""" the maximum number of chunks that get buffered by the background threads. """
+
+
+class PrefetchStream(io.RawIOBase):
+    """
+    Reads (and thereby decompresses) the chunks of the wrapped binary stream in a background
+    thread, buffering up to a maximum number of chunks. File I/O and the decompressors release
+    the GIL, allowing reading/decompression to overlap with processing the data.
+    """
+
+    def __init__(self, fp, chunk_size: int = DEFAULT_COMPRESSION_CHUNK_SIZE,
+                 max_chunks: int = DEFAULT_COMPRESSION_MAX_CHUNKS):
+        """
+        Initializes the stream.
+
+        :param fp: the binary stream to read from
+        :param chunk_size: the number of bytes to read at a time
+        :type chunk_size: int
+        :param max_chunks: the maximum number of chunks to read ahead
+        :type max_chunks: int
+        """
+        super().__init__()
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=max(1, max_chunks))
+        self._stop = threading.Event()
+        self._chunk = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """
+        Adds the item to the queue, unless the stream gets closed.
+
+        :param item: the item to add
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self):
+        """
+        Reads the chunks until EOF, an error occurs or the stream gets closed.
+        """
+        try:
+            while not self._stop.is_set():
+                data = self._fp.read(self._chunk_size)
+                self._put(data)
+                if len(data) == 0:
+                    break
+        except BaseException as e:
+            self._put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        """
+        Reads the next bytes into the buffer.
+
+        :param b: the buffer to fill
+        :return: the number of bytes read, 0 for EOF
+        :rtype: int
+        """
+        if len(self._chunk) == 0:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            if len(item) == 0:
+                self._eof = True
+                return 0
+            self._chunk = memoryview(item)
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        """
+        Stops the background thread and closes the wrapped stream.
+        """
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._fp.close()
+        super().close()
+
+
+class _WriteBehindStream(io.RawIOBase):
+    """
+    Writes (and thereby compresses) the data to the wrapped binary stream in a background
+    thread, buffering up to a maximum number of chunks. The compressors release the GIL,
+    allowing compression to overlap with generating the data.
+    """
+
+    def __init__(self, fp, max_chunks: int = DEFAULT_COMPRESSION_MAX_CHUNKS):
+        """
+        Initializes the stream.
+
+        :param fp: the binary stream to write to
+        :param max_chunks: the maximum number of chunks to buffer
+        :type max_chunks: int
+        """
+        super().__init__()
+        self._fp = fp
+        self._queue = queue.Queue(maxsize=max(1, max_chunks))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Writes the chunks until the stream gets closed.
+        """
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._fp.write(data)
+            except BaseException as e:
+                self._error = e
+
+    def _check_error(self):
+        """
+        Raises the error that occurred in the background thread, if any.
+        """
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        """
+        Queues the bytes for writing.
+
+        :param b: the bytes to write
+        :return: the number of bytes
+        :rtype: int
+        """
+        self._check_error()
+        data = bytes(b)
+        self._queue.put(data)
+        return len(data)
+
+    def close(self):
+        """
+        Waits for the background thread to write all the data and closes the wrapped stream.
+        """
+        if not self.closed:
+            self._queue.put(None)
+            self._thread.join()
+            try:
+                self._fp.close()
+            finally:
+                super().close()
+            self._check_error()
+        else:
+            super().close()
+
+
+def get_compression_level(session) -> Optional[int]:
+    """
+    Returns the compression level from the session's options.
+
+    :param session: the session to get the level from
+    :type session: Session
+    :return: the level, None if not set
+    :rtype: int
+    """
+    if (session is None) or (session.options is None):
+        return None
+    return getattr(session.options, "compression_level", None)
+
+
+def get_compression_threads(session) -> int:
+    """
+    Returns the number of threads to use for compression from the session's options.
+
+    :param session: the session to get the number of threads from
+    :type session: Session
+    :return: the number of threads, 0 if not set
+    :rtype: int
+    """
+    if (session is None) or (session.options is None):
+        return 0
+    result = getattr(session.options, "compression_threads", 0)
+    return 0 if (result is None) else result
+
+
+def _determine_compression(path: str, compression: str = None) -> Optional[str]:
+    """
+    Determines the compression based on the file extension, falling back on the explicit one.
+
+    :param path: the file to determine the compression for
+    :type path: str
+    :param compression: the explicit compression to use (gz/bz2/xz/zstd)
+    :type compression: str
+    :return: the compression, None if uncompressed
+    :rtype: str
+    """
+    path_lc = path.lower()
+    if path_lc.endswith(".gz"):
+        return COMPRESSION_GZIP
+    elif path_lc.endswith(".bz2"):
+        return COMPRESSION_BZIP2
+    elif path_lc.endswith(".xz"):
+        return COMPRESSION_XZ
+    elif path_lc.endswith(".zst") or path_lc.endswith(".zstd"):
+        return COMPRESSION_ZSTD
+    if (compression is not None) and (compression not in COMPRESSION_FORMATS):
+        raise Exception("Unhandled compression: %s" % compression)
+    return compression
+
+
+def get_prefetch_size(session) -> int:
+    """
+    Returns the number of bytes to read ahead from input files from the session's options.
+
+    :param session: the session to get the size from
+    :type session: Session
+    :return: the number of bytes, 0 if not set
+    :rtype: int
+    """
+    if (session is None) or (session.options is None):
+        return 0
+    result = getattr(session.options, "prefetch", 0)
+    return 0 if (result is None) else result
+
+
+MAX_PREFETCHED_FILES = 2
+""" the maximum number of files that get prefetched ahead of being opened. """
+
+_prefetched = dict()
+""" the files that are being prefetched: path -> PrefetchStream. """
+
+_prefetched_lock = threading.Lock()
+""" for synchronizing access to the prefetched files. """
+
+
+def _create_prefetch_stream(path: str, compression: Optional[str], prefetch_size: int) -> PrefetchStream:
+    """
+    Opens the file in binary mode and starts reading it in the background.
+
+    :param path: the file to open
+    :type path: str
+    :param compression: the compression of the file, None for uncompressed
+    :type compression: str
+    :param prefetch_size: the number of bytes to read ahead
+    :type prefetch_size: int
+    :return: the stream
+    :rtype: PrefetchStream
+    """
+    chunk_size = min(prefetch_size, DEFAULT_COMPRESSION_CHUNK_SIZE)
+    max_chunks = (prefetch_size + chunk_size - 1) // chunk_size
+    if compression is None:
+        fp = open(path, mode="rb")
+    else:
+        fp = _open_compressed(path, "rb", compression, None, 0)
+    return PrefetchStream(fp, chunk_size=chunk_size, max_chunks=max_chunks)
+
+
+def prefetch_file(path: str, prefetch_size: int):
+    """
+    Starts reading (and decompressing) the file in the background, so that the data is already
+    available when the file gets opened with open_file using a prefetch size > 0.
+    Does nothing if the prefetch size is 0 or the file is already being prefetched.
+
+    :param path: the file to prefetch
+    :type path: str
+    :param prefetch_size: the number of bytes to read ahead, 0 to disable
+    :type prefetch_size: int
+    """
+    if (prefetch_size <= 0) or not os.path.isfile(path):
+        return
+    with _prefetched_lock:
+        if path in _prefetched:
+            return
+        # discard files that never got opened
+        while len(_prefetched) >= MAX_PREFETCHED_FILES:
+            _prefetched.pop(next(iter(_prefetched))).close()
+        _prefetched[path] = _create_prefetch_stream(path, _determine_compression(path), prefetch_size)
+
+
+def prefetch_next(inputs: List[str], session):
+    """
+    Starts prefetching the first of the remaining input files, if prefetching is enabled
+    in the session's options.
+
+    :param inputs: the remaining input files
+    :type inputs: list
+    :param session: the session to obtain the prefetch size from
+    :type session: Session
+    """
+    if (inputs is not None) and (len(inputs) > 0):
+        prefetch_file(inputs[0], get_prefetch_size(session))
+
+
+def _open_compressed(path: str, mode: str, compression: str, compression_level: Optional[int],
+                     compression_threads: int):
+    """
+    Opens the compressed file in binary mode.
+
+    :param path: the file to open
+    :type path: str
+    :param mode: the binary mode to use
+    :type mode: str
+    :param compression: the compression to use (gz/bz2/xz/zstd)
+    :type compression: str
+    :param compression_level: the compression level to use, None for default
+    :type compression_level: int
+    :param compression_threads: the number of threads to use for compression, only used by zstd
+    :type compression_threads: int
+    :return: the binary file-like object
+    """
+    writing = "r" not in mode
+    if compression == COMPRESSION_GZIP:
+        if writing and (compression_level is not None):
+            return gzip.open(path, mode=mode, compresslevel=compression_level)
+        return gzip.open(path, mode=mode)
+    elif compression == COMPRESSION_BZIP2:
+        if writing and (compression_level is not None):
+            return bz2.open(path, mode=mode, compresslevel=compression_level)
+        return bz2.open(path, mode=mode)
+    elif compression == COMPRESSION_XZ:
+        if writing and (compression_level is not None):
+            return lzma.open(path, mode=mode, preset=compression_level)
+        return lzma.open(path, mode=mode)
+    elif compression == COMPRESSION_ZSTD:
+        if writing and ((compression_level is not None) or (compression_threads > 0)):
+            option = dict()
+            if compression_level is not None:
+                option[pyzstd.CParameter.compressionLevel] = compression_level
+            if compression_threads > 0:
+                option[pyzstd.CParameter.nbWorkers] = compression_threads
+            return pyzstd.open(path, mode=mode, level_or_option=option)
+        return pyzstd.open(path, mode=mode)
+    else:
+        raise Exception("Unhandled compression: %s" % compression)
+
+
+def open_file(path: str, mode: str = None, encoding: str = None, compression: str = None, logger: logging.Logger = None,
+              compression_level: int = None, compression_threads: int = 0, prefetch_size: int = 0):
     """
     Opens the file and returns a file-like object.
     Automatically decompresses: .gz, bz2, .xz, .zst/.zstd
+    With compression threads > 0, compressed files get decompressed in a background thread when
+    reading. When writing, zstd uses that many worker threads and the other formats compress
+    in a background thread.
+    With a prefetch size > 0, files opened for reading get read (and decompressed) ahead in a
+    background thread, using a file that has already been prefetched with prefetch_file if available.
 
     :param path: the file to open
     :type path: str
@@ -171,26 +717,49 @@ def open_file(path: str, mode: str = None, encoding: str = None, compression: st
     :type compression: str
     :param logger: the optional logger to use for outputting auto-determined encoding
     :type logger: str
+    :param compression_level: the compression level to use when writing (gz/bz2: 1-9, xz: 0-9, zstd: 1-22), None for default
+    :type compression_level: int
+    :param compression_threads: the number of threads to use for (de)compression, 0 for none
+    :type compression_threads: int
+    :param prefetch_size: the number of bytes to read ahead when reading, 0 for none
+    :type prefetch_size: int
     :return: the file-like object
     """
-    path_lc = path.lower()
-    if path_lc.endswith(".gz") or (compression == COMPRESSION_GZIP):
-        return gzip.open(path, mode=mode, encoding=encoding)
-    elif path_lc.endswith(".bz2") or (compression == COMPRESSION_BZIP2):
-        return bz2.open(path, mode=mode, encoding=encoding)
-    elif path_lc.endswith(".xz") or (compression == COMPRESSION_XZ):
-        return lzma.open(path, mode=mode, encoding=encoding)
-    elif path_lc.endswith(".zst") or path_lc.endswith(".zstd") or (compression == COMPRESSION_ZSTD):
-        return pyzstd.open(path, mode=mode, encoding=encoding)
+    compression = _determine_compression(path, compression)
+    reading = (mode is None) or ("r" in mode)
+    prefetch = reading and (prefetch_size > 0)
+    if (compression is None) and not prefetch:
+        if reading and (encoding is None) and ((mode is None) or ("b" not in mode)):
+            encoding = determine_encoding(path)
+            if logger is not None:
+                logger.info("Auto-determined encoding '%s' for %s" % (str(encoding), path))
+        return open(path, mode=mode, encoding=encoding)
+
+    if mode is None:
+        mode = "r" if (compression is None) else "rb"
+    binary_mode = mode.replace("t", "")
+    if "b" not in binary_mode:
+        binary_mode += "b"
+    if prefetch:
+        with _prefetched_lock:
+            fp = _prefetched.pop(path, None)
+        if fp is None:
+            fp = _create_prefetch_stream(path, compression, prefetch_size)
+        fp = io.BufferedReader(fp, buffer_size=DEFAULT_COMPRESSION_CHUNK_SIZE)
     else:
-        if compression is not None:
-            raise Exception("Unhandled compression: %s" % compression)
-        else:
-            if encoding is None:
-                encoding = determine_encoding(path)
-                if logger is not None:
-                    logger.info("Auto-determined encoding '%s' for %s" % (str(encoding), path))
-            return open(path, mode=mode, encoding=encoding)
+        fp = _open_compressed(path, binary_mode, compression, compression_level, compression_threads)
+        if compression_threads > 0:
+            if reading:
+                fp = io.BufferedReader(PrefetchStream(fp), buffer_size=DEFAULT_COMPRESSION_CHUNK_SIZE)
+            elif compression != COMPRESSION_ZSTD:
+                fp = io.BufferedWriter(_WriteBehindStream(fp), buffer_size=DEFAULT_COMPRESSION_CHUNK_SIZE)
+    if "b" in mode:
+        return fp
+    if reading and (compression is None) and (encoding is None):
+        encoding = determine_encoding(path)
+        if logger is not None:
+            logger.info("Auto-determined encoding '%s' for %s" % (str(encoding), path))
+    return io.TextIOWrapper(fp, encoding=encoding)
 
 
 def generate_output(input_path: str, output_path: str, ext: str, compression: Optional[str]) -> str:
@@ -222,6 +791,192 @@ def generate_output(input_path: str, output_path: str, ext: str, compression: Op
         return output_path
 
 
+DEFAULT_SHARD_DIGITS = 5
+""" the number of digits to use for the shard index in the filename. """
+
+SIZE_UNITS = {
+    "K": 1024,
+    "M": 1024 ** 2,
+    "G": 1024 ** 3,
+    "T": 1024 ** 4,
+}
+""" the units that can be used for sizes (binary multiples). """
+
+
+def parse_size(size: str) -> int:
+    """
+    Parses the size, which can have an optional unit suffix (K, M, G, T; case-insensitive, optional trailing B),
+    e.g., "1024", "512K", "256MB" or "1g".
+
+    :param size: the size to parse
+    :type size: str
+    :return: the size in bytes
+    :rtype: int
+    """
+    s = str(size).strip().upper()
+    if s.endswith("B"):
+        s = s[:-1]
+    factor = 1
+    if (len(s) > 0) and (s[-1] in SIZE_UNITS):
+        factor = SIZE_UNITS[s[-1]]
+        s = s[:-1]
+    try:
+        return int(float(s) * factor)
+    except:
+        raise ValueError("Invalid size: %s" % size)
+
+
+def shard_filename(path: str, index: int, num_digits: int = DEFAULT_SHARD_DIGITS) -> str:
+    """
+    Generates the filename for the specified shard by inserting the index before the
+    extension (and compression suffix), e.g., "out.jsonl.zst" becomes "out-00001.jsonl.zst".
+
+    :param path: the filename to generate the shard filename for
+    :type path: str
+    :param index: the 0-based index of the shard
+    :type index: int
+    :param num_digits: the number of digits to use for the index
+    :type num_digits: int
+    :return: the shard filename
+    :rtype: str
+    """
+    compression = ""
+    if is_compressed(path):
+        path, compression = os.path.splitext(path)
+    base, ext = os.path.splitext(path)
+    return base + "-" + ("%0" + str(num_digits) + "d") % index + ext + compression
+
+
+class ShardedWriter(object):
+    """
+    Mixin for writers that can split their output into shards, based on the number
+    of records and/or the (approximate, uncompressed) size of the records.
+    Writers call _shard_begin when starting a new output, check _shard_is_full before
+    writing a record (switching to the _shard_next file if necessary) and report
+    the written records via _shard_written.
+    """
+
+    shard_records = 0
+    """ the maximum number of records per shard, <= 0 for no limit. """
+
+    shard_bytes = 0
+    """ the maximum (approximate) number of bytes per shard, <= 0 for no limit. """
+
+    _shard_base = None
+    _shard_path = None
+    _shard_index = 0
+    _shard_num_records = 0
+    _shard_num_bytes = 0
+
+    def _add_shard_options(self, parser: argparse.ArgumentParser):
+        """
+        Adds the sharding options to the parser.
+
+        :param parser: the parser to extend
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument("--shard_records", metavar="NUM", type=int, default=0, help="The maximum number of records per output file, splits the output into shards (NAME-00000.EXT, NAME-00001.EXT, ...); <= 0 for no limit", required=False)
+        parser.add_argument("--shard_bytes", metavar="SIZE", type=parse_size, default=0, help="The maximum (approximate, uncompressed) size per output file, splits the output into shards (NAME-00000.EXT, NAME-00001.EXT, ...); supports K/M/G/T suffixes; <= 0 for no limit", required=False)
+
+    def _apply_shard_args(self, ns: argparse.Namespace):
+        """
+        Applies the sharding options of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        self.shard_records = ns.shard_records
+        self.shard_bytes = ns.shard_bytes
+
+    def _sharding_enabled(self) -> bool:
+        """
+        Returns whether sharding is enabled.
+
+        :return: True if enabled
+        :rtype: bool
+        """
+        return (self.shard_records > 0) or (self.shard_bytes > 0)
+
+    def _shard_begin(self, output: str) -> str:
+        """
+        Starts a new (logical) output and returns the filename of its first shard.
+
+        :param output: the output file
+        :type output: str
+        :return: the file to write to
+        :rtype: str
+        """
+        self._shard_base = output
+        self._shard_index = 0
+        self._shard_num_records = 0
+        self._shard_num_bytes = 0
+        if self._sharding_enabled():
+            self._shard_path = shard_filename(output, self._shard_index)
+        else:
+            self._shard_path = output
+        return self._shard_path
+
+    def _shard_is_full(self) -> bool:
+        """
+        Checks whether the current shard has reached its limits and the next record
+        needs to go into a new shard.
+
+        :return: True if a new shard is required
+        :rtype: bool
+        """
+        if (self._shard_base is None) or (self._shard_num_records == 0):
+            return False
+        if (self.shard_records > 0) and (self._shard_num_records >= self.shard_records):
+            return True
+        if (self.shard_bytes > 0) and (self._shard_num_bytes >= self.shard_bytes):
+            return True
+        return False
+
+    def _shard_next(self) -> str:
+        """
+        Moves on to the next shard and returns its filename.
+
+        :return: the file to write to
+        :rtype: str
+        """
+        self._shard_index += 1
+        self._shard_num_records = 0
+        self._shard_num_bytes = 0
+        self._shard_path = shard_filename(self._shard_base, self._shard_index)
+        return self._shard_path
+
+    def _shard_written(self, num_bytes: int = 0, num_records: int = 1):
+        """
+        Records that data was written to the current shard.
+
+        :param num_bytes: the (approximate) number of bytes written
+        :type num_bytes: int
+        :param num_records: the number of records written
+        :type num_records: int
+        """
+        self._shard_num_records += num_records
+        if num_bytes is not None:
+            self._shard_num_bytes += num_bytes
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def get_extension(self) -> str:
+        """
+        Returns the extension of the output files that the writer generates.
+
+        :return: the extension (incl dot)
+        :rtype: str
+        """
+        return self._get_extension()
+
+
 class Reader(seppl.io.Reader, seppl.Initializable, DomainHandler, abc.ABC):
     """
     Ancestor of classes that read data.
@@ -238,12 +993,58 @@ class Reader(seppl.io.Reader, seppl.Initializable, DomainHandler, abc.ABC):
         """
         super().__init__(logger_name=logger_name, logging_level=logging_level)
 
+    def located_inputs(self) -> Optional[List[str]]:
+        """
+        Returns the input files that the reader located during initialization and has not read yet.
+
+        :return: the files, None if the reader does not read from files or has not been initialized
+        :rtype: list
+        """
+        inputs = getattr(self, "_inputs", None)
+        if inputs is None:
+            return None
+        return list(inputs)
 
-class StreamWriter(seppl.io.StreamWriter, seppl.Initializable, DomainHandler, abc.ABC):
+
+class StreamWriter(seppl.io.StreamWriter, ShardedWriter, seppl.Initializable, DomainHandler, abc.ABC):
     """
     Ancestor for classes that write data one record at a time.
     """
 
+    def __init__(self, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the handler.
+
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.shard_records = 0
+        self.shard_bytes = 0
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        self._add_shard_options(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self._apply_shard_args(ns)
+
     def write_stream(self, data):
         """
         Saves the data one by one.
@@ -252,6 +1053,15 @@ class StreamWriter(seppl.io.StreamWriter, seppl.Initializable, DomainHandler, ab
         """
         raise NotImplementedError()
 
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        raise NotImplementedError()
+
     def _output_needs_changing(self, current_output: str, target: str, ext: str) -> bool:
         """
         Checks whether the output needs changing.
@@ -273,11 +1083,45 @@ class StreamWriter(seppl.io.StreamWriter, seppl.Initializable, DomainHandler, ab
         return False
 
 
-class BatchWriter(seppl.io.BatchWriter, seppl.Initializable, DomainHandler, abc.ABC):
+class BatchWriter(seppl.io.BatchWriter, ShardedWriter, seppl.Initializable, DomainHandler, abc.ABC):
     """
     Ancestor of classes that write data all at once.
     """
 
+    def __init__(self, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the handler.
+
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.shard_records = 0
+        self.shard_bytes = 0
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        self._add_shard_options(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self._apply_shard_args(ns)
+
     def write_batch(self, data: Iterable):
         """
         Saves the data in one go.
@@ -287,6 +1131,15 @@ class BatchWriter(seppl.io.BatchWriter, seppl.Initializable, DomainHandler, abc.
         """
         raise NotImplementedError()
 
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        raise NotImplementedError()
+
     def _output_needs_changing(self, current_output: str, target: str, ext: str) -> bool:
         """
         Checks whether the output needs changing.
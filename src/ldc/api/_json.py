@@ -0,0 +1,362 @@
+import codecs
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+from ._io import open_file, determine_encoding, is_compressed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_BACKEND_STDLIB = "json"
+JSON_BACKEND_ORJSON = "orjson"
+JSON_BACKENDS = [
+    JSON_BACKEND_STDLIB,
+    JSON_BACKEND_ORJSON,
+]
+
+ENV_JSON_BACKEND = "LDC_JSON_BACKEND"
+""" the environment variable to use for overriding the JSON backend (json|orjson). """
+
+JSON_BACKEND = None
+""" the determined JSON backend. """
+
+_STDLIB_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+""" the stdlib encoder, using the same compact output format as orjson. """
+
+
+def json_backend() -> str:
+    """
+    Returns the JSON backend to use. Uses orjson if installed, otherwise the json module from the
+    standard library. See environment variable constant ENV_JSON_BACKEND.
+
+    :return: the backend
+    :rtype: str
+    """
+    global JSON_BACKEND
+    if JSON_BACKEND is None:
+        JSON_BACKEND = JSON_BACKEND_ORJSON if (orjson is not None) else JSON_BACKEND_STDLIB
+        if ENV_JSON_BACKEND in os.environ:
+            backend = os.environ[ENV_JSON_BACKEND]
+            if backend not in JSON_BACKENDS:
+                print("Unknown JSON backend in env var '%s': %s" % (ENV_JSON_BACKEND, backend))
+            elif (backend == JSON_BACKEND_ORJSON) and (orjson is None):
+                print("JSON backend '%s' is not installed, using '%s' instead" % (backend, JSON_BACKEND))
+            else:
+                JSON_BACKEND = backend
+    return JSON_BACKEND
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    Decodes the JSON string/bytes. Falls back on the json module in case the fast backend
+    fails, e.g., due to NaN or integers that exceed 64bit.
+
+    :param data: the JSON data to decode
+    :type data: str or bytes
+    :return: the decoded data
+    """
+    if json_backend() == JSON_BACKEND_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """
+    Checks whether the object contains NaN or infinite floats, which orjson writes as null.
+
+    :param obj: the object to check (dicts and lists get checked recursively)
+    :return: True if non-finite floats are present
+    :rtype: bool
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    else:
+        return False
+    for value in values:
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, (dict, list, tuple)) and _has_non_finite(value):
+            return True
+    return False
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    Encodes the object as UTF-8 encoded JSON. Falls back on the json module in case the
+    fast backend fails, e.g., due to non-string keys or integers that exceed 64bit,
+    or the object contains NaN/Infinity (which orjson would turn into null).
+    Both backends output compact JSON, only the notation of floats with exponents can differ.
+
+    :param obj: the object to encode
+    :return: the encoded data
+    :rtype: bytes
+    """
+    if json_backend() == JSON_BACKEND_ORJSON:
+        try:
+            result = orjson.dumps(obj)
+            # orjson turns NaN/Infinity into null
+            if (b"null" not in result) or not _has_non_finite(obj):
+                return result
+        except orjson.JSONEncodeError:
+            pass
+    return _STDLIB_ENCODER.encode(obj).encode("utf-8")
+
+
+PROJECT_MIN_LENGTH = 8192
+""" the minimum length of JSON data to scan with json_project when using the fast backend, shorter data is faster to decode fully. """
+
+
+class _JsonSyntax(object):
+    """
+    The regular expressions and tokens for scanning JSON, either as str or bytes.
+    """
+
+    def __init__(self, conv):
+        """
+        Initializes the syntax.
+
+        :param conv: for converting str into the target type
+        """
+        self.whitespace = re.compile(conv(r"\s*"))
+        self.string = re.compile(conv(r'"[^"\\]*(?:\\.[^"\\]*)*"'), re.DOTALL)
+        self.token = re.compile(conv(r'[^"\[\]{}]*("[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}])'), re.DOTALL)
+        self.scalar = re.compile(conv(r"[^,}\]\s]+"))
+        self.quote = conv('"')
+        self.backslash = conv("\\")
+        self.colon = conv(":")
+        self.comma = conv(",")
+        self.obj_open = conv("{")
+        self.obj_close = conv("}")
+        self.opening = [conv("{"), conv("[")]
+        self.closing = [conv("}"), conv("]")]
+
+
+_SYNTAX_STR = _JsonSyntax(lambda x: x)
+_SYNTAX_BYTES = _JsonSyntax(lambda x: x.encode("utf-8"))
+
+
+def _skip_json_value(data: Union[str, bytes], pos: int, syntax: _JsonSyntax, thorough: bool) -> Optional[int]:
+    """
+    Determines the end of the JSON value that starts at the specified position, without decoding it.
+    Strings without escaped quotes and arrays without strings/nested structures get skipped via find.
+    All other values get scanned with regular expressions, but only if thorough is True.
+
+    :param data: the JSON data
+    :type data: str or bytes
+    :param pos: the start of the value
+    :type pos: int
+    :param syntax: the syntax to use
+    :type syntax: _JsonSyntax
+    :param thorough: whether to scan values that cannot be skipped quickly
+    :type thorough: bool
+    :return: the end position (excl), None if invalid or not scanned
+    :rtype: int
+    """
+    c = data[pos:pos + 1]
+    if c == syntax.quote:
+        # the first quote closes the string, unless escaped
+        end = data.find(syntax.quote, pos + 1)
+        if end == -1:
+            return None
+        if data[end - 1:end] != syntax.backslash:
+            return end + 1
+        if not thorough:
+            return None
+        m = syntax.string.match(data, pos)
+        return None if (m is None) else m.end()
+    if c in syntax.opening:
+        # flat array (e.g., numbers)?
+        if c == syntax.opening[1]:
+            end = data.find(syntax.closing[1], pos + 1)
+            if end > -1:
+                inner = data[pos + 1:end]
+                if (syntax.quote not in inner) and (syntax.opening[0] not in inner) and (syntax.opening[1] not in inner):
+                    return end + 1
+        if not thorough:
+            return None
+        depth = 0
+        token = syntax.token
+        while True:
+            m = token.match(data, pos)
+            if m is None:
+                return None
+            pos = m.end()
+            t = m.group(1)
+            if t in syntax.opening:
+                depth += 1
+            elif t in syntax.closing:
+                depth -= 1
+                if depth == 0:
+                    return pos
+    m = syntax.scalar.match(data, pos)
+    return None if (m is None) else m.end()
+
+
+def json_project(data: Union[str, bytes], keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    Decodes only the specified top-level keys of the JSON object, all other values get skipped
+    without being decoded. Stops scanning as soon as all keys have been located (the first
+    occurrence of a key wins). Values that get skipped are not validated.
+    With the fast backend, short data (see PROJECT_MIN_LENGTH) and values that cannot be skipped
+    quickly (strings with escaped quotes, nested structures) result in None, as decoding the full
+    object is faster in that case.
+
+    :param data: the JSON object to decode
+    :type data: str or bytes
+    :param keys: the keys to extract
+    :type keys: list or set
+    :return: the extracted keys/values (only keys that are present), None if not a JSON object, invalid or not scanned
+    :rtype: dict
+    """
+    thorough = json_backend() != JSON_BACKEND_ORJSON
+    if not thorough and (len(data) < PROJECT_MIN_LENGTH):
+        return None
+    syntax = _SYNTAX_BYTES if isinstance(data, bytes) else _SYNTAX_STR
+    if not isinstance(keys, (set, frozenset)):
+        keys = set(keys)
+    result = dict()
+    pos = syntax.whitespace.match(data).end()
+    if data[pos:pos + 1] != syntax.obj_open:
+        return None
+    pos = syntax.whitespace.match(data, pos + 1).end()
+    if data[pos:pos + 1] == syntax.obj_close:
+        return result
+    while True:
+        # key
+        if data[pos:pos + 1] != syntax.quote:
+            return None
+        end = _skip_json_value(data, pos, syntax, thorough)
+        if end is None:
+            return None
+        key = data[pos:end]
+        if syntax.backslash in key:
+            key = json_loads(key)
+        else:
+            key = key[1:-1]
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+        pos = syntax.whitespace.match(data, end).end()
+        if data[pos:pos + 1] != syntax.colon:
+            return None
+        # value
+        pos = syntax.whitespace.match(data, pos + 1).end()
+        end = _skip_json_value(data, pos, syntax, thorough)
+        if end is None:
+            return None
+        if (key in keys) and (key not in result):
+            result[key] = json_loads(data[pos:end])
+            if len(result) == len(keys):
+                return result
+        # next
+        pos = syntax.whitespace.match(data, end).end()
+        c = data[pos:pos + 1]
+        if c == syntax.obj_close:
+            return result
+        if c != syntax.comma:
+            return None
+        pos = syntax.whitespace.match(data, pos + 1).end()
+
+
+def open_json_lines(path: str, encoding: str = None, logger: logging.Logger = None, compression_threads: int = 0,
+                    prefetch_size: int = 0):
+    """
+    Opens the JsonLines file for reading. UTF-8 encoded files get opened in binary mode when
+    using the fast backend, as it can decode the bytes directly.
+
+    :param path: the file to open
+    :type path: str
+    :param encoding: the encoding to use, None for auto-detect
+    :type encoding: str
+    :param logger: the optional logger to use for outputting auto-determined encoding
+    :type logger: logging.Logger
+    :param compression_threads: the number of threads to use for decompression, 0 for none
+    :type compression_threads: int
+    :param prefetch_size: the number of bytes to read ahead in a background thread, 0 for none
+    :type prefetch_size: int
+    :return: the file-like object
+    """
+    if json_backend() == JSON_BACKEND_ORJSON:
+        if (encoding is None) and not is_compressed(path):
+            encoding = determine_encoding(path)
+            if logger is not None:
+                logger.info("Auto-determined encoding '%s' for %s" % (str(encoding), path))
+        if (encoding is None) or (codecs.lookup(encoding).name in ["utf-8", "ascii"]):
+            return open_file(path, mode="rb", compression_threads=compression_threads, prefetch_size=prefetch_size)
+    return open_file(path, mode="rt", encoding=encoding, logger=logger, compression_threads=compression_threads,
+                     prefetch_size=prefetch_size)
+
+
+def read_json_lines(fp, keys: Iterable[str] = None) -> Iterator[Any]:
+    """
+    Decodes the lines of the file-like object (text or binary), skipping empty lines.
+    If keys are specified, only these top-level keys of the JSON objects get decoded where possible
+    (see json_project), otherwise the full objects.
+
+    :param fp: the file-like object to read from
+    :param keys: the keys to extract, None to decode the full lines
+    :type keys: list or set
+    :return: the decoded lines
+    :rtype: Iterator
+    """
+    if keys is not None:
+        keys = set(keys)
+    for lineno, line in enumerate(fp, start=1):
+        if len(line.strip()) == 0:
+            continue
+        try:
+            if keys is not None:
+                item = json_project(line, keys)
+                if item is not None:
+                    yield item
+                    continue
+            yield json_loads(line)
+        except ValueError as e:
+            raise Exception("Invalid JSON in line %d: %s" % (lineno, str(e)))
+
+
+class JsonLinesWriter(object):
+    """
+    Writes objects as JSON lines to a binary file-like object.
+    """
+
+    def __init__(self, fp):
+        """
+        Initializes the writer.
+
+        :param fp: the binary file-like object to write to
+        """
+        self._fp = fp
+
+    def write(self, obj: Any) -> int:
+        """
+        Encodes and writes the object.
+
+        :param obj: the object to write
+        :return: the number of bytes written
+        :rtype: int
+        """
+        line = json_dumps(obj)
+        self._fp.write(line)
+        self._fp.write(b"\n")
+        return len(line) + 1
+
+    def close(self):
+        """
+        Closes the writer. Does not close the underlying file-like object.
+        """
+        self._fp = None
@@ -96,6 +96,42 @@ class Session(seppl.Session):
         self._add_option("compression", compression)
         return self
 
+    def set_compression_level(self, level: int):
+        """
+        Sets the compression level for outputs.
+
+        :param level: the level, None for the default of the compression format
+        :type level: int
+        :return: itself
+        :rtype: Session
+        """
+        self._add_option("compression_level", level)
+        return self
+
+    def set_compression_threads(self, threads: int):
+        """
+        Sets the number of threads to use for compressing outputs and decompressing inputs.
+
+        :param threads: the number of threads, 0 for none
+        :type threads: int
+        :return: itself
+        :rtype: Session
+        """
+        self._add_option("compression_threads", threads)
+        return self
+
+    def set_prefetch(self, size: int):
+        """
+        Sets the number of bytes to read ahead from input files in a background thread.
+
+        :param size: the number of bytes, 0 for none
+        :type size: int
+        :return: itself
+        :rtype: Session
+        """
+        self._add_option("prefetch", size)
+        return self
+
 
 class DomainHandler(object):
     """
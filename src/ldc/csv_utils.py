@@ -0,0 +1,199 @@
+import codecs
+import csv
+import logging
+from typing import Dict, Iterable, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from ldc.api import open_file, determine_encoding, is_compressed
+
+
+CSV_ENGINE_PYTHON = "python"
+CSV_ENGINE_PYARROW = "pyarrow"
+CSV_ENGINES = [
+    CSV_ENGINE_PYTHON,
+    CSV_ENGINE_PYARROW,
+]
+
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+""" the default number of bytes to parse at a time with the pyarrow engine. """
+
+
+def read_csv_header(path: str, delimiter: str, encoding: str) -> Optional[List[str]]:
+    """
+    Reads the first row of the CSV file.
+
+    :param path: the file to read
+    :type path: str
+    :param delimiter: the delimiter in use
+    :type delimiter: str
+    :param encoding: the encoding of the file
+    :type encoding: str
+    :return: the cells of the first row, None if the file is empty
+    :rtype: list
+    """
+    with open_file(path, mode="rt", encoding=encoding) as fp:
+        return next(csv.reader(fp, delimiter=delimiter), None)
+
+
+class ArrowCsvReader(object):
+    """
+    Parses CSV-like files in blocks with pyarrow (using multiple threads), all cells are read as strings.
+    The rows are either lists (like csv.reader) or dictionaries (like csv.DictReader), but only
+    contain the requested columns. Rows with a different number of columns get skipped.
+    """
+
+    def __init__(self, path: str, delimiter: str = ",", no_header: bool = False, as_dict: bool = True,
+                 columns: List[Union[str, int]] = None, encoding: str = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                 compression_threads: int = 0, prefetch_size: int = 0, logger: logging.Logger = None):
+        """
+        Initializes the reader.
+
+        :param path: the file to read
+        :type path: str
+        :param delimiter: the delimiter in use
+        :type delimiter: str
+        :param no_header: whether the file has no header row
+        :type no_header: bool
+        :param as_dict: whether to return the rows as dictionaries (header names -> cell) rather than lists
+        :type as_dict: bool
+        :param columns: the columns to return, either names or 0-based indices (unavailable ones are skipped), None for all
+        :type columns: list
+        :param encoding: the encoding to use, None for auto-detect
+        :type encoding: str
+        :param block_size: the number of bytes to parse at a time
+        :type block_size: int
+        :param compression_threads: the number of threads to use for decompression, 0 for none
+        :type compression_threads: int
+        :param prefetch_size: the number of bytes to read ahead in a background thread, 0 for none
+        :type prefetch_size: int
+        :param logger: the optional logger to use
+        :type logger: logging.Logger
+        """
+        if no_header and as_dict:
+            raise Exception("Rows can only be returned as dictionaries if the file has a header row!")
+        self.path = path
+        self.delimiter = delimiter
+        self.no_header = no_header
+        self.as_dict = as_dict
+        self.columns = columns
+        self.encoding = encoding
+        self.block_size = DEFAULT_BLOCK_SIZE if (block_size is None) or (block_size < 1) else block_size
+        self.compression_threads = compression_threads
+        self.prefetch_size = prefetch_size
+        self.logger = logger
+        self._fp = None
+        self._reader = None
+
+    def _determine_encoding(self) -> str:
+        """
+        Determines the encoding of the file if necessary.
+
+        :return: the encoding
+        :rtype: str
+        """
+        if self.encoding is not None:
+            return self.encoding
+        if is_compressed(self.path):
+            return "utf-8"
+        result = determine_encoding(self.path)
+        if self.logger is not None:
+            self.logger.info("Auto-determined encoding '%s' for %s" % (str(result), self.path))
+        return "utf-8" if (result is None) else result
+
+    def _select(self, header: List[str]) -> List[int]:
+        """
+        Determines the 0-based indices of the columns to return.
+
+        :param header: the cells of the first row
+        :type header: list
+        :return: the indices
+        :rtype: list
+        """
+        if self.columns is None:
+            return list(range(len(header)))
+        # like csv.DictReader, the last occurrence of a name wins
+        names = dict()
+        for i, name in enumerate(header):
+            names[name] = i
+        result = []
+        for c in self.columns:
+            if isinstance(c, int):
+                # negative indices count from the end, like with lists
+                index = c % len(header) if (-len(header) <= c < len(header)) else None
+            else:
+                index = names.get(c, None)
+            if (index is not None) and (index not in result):
+                result.append(index)
+        return result
+
+    def _handle_invalid_row(self, row) -> str:
+        """
+        Skips rows with an unexpected number of columns.
+
+        :param row: the invalid row
+        :return: the action to take
+        :rtype: str
+        """
+        if self.logger is not None:
+            self.logger.warning("Skipping row %s of %s (expected %d columns, found %d): %s"
+                                % (str(row.number), self.path, row.expected_columns, row.actual_columns, row.text))
+        return "skip"
+
+    def __iter__(self) -> Iterable[Union[List, Dict]]:
+        """
+        Returns the rows of the file.
+
+        :return: the rows
+        :rtype: Iterable
+        """
+        encoding = self._determine_encoding()
+        header = read_csv_header(self.path, self.delimiter, encoding)
+        if header is None:
+            return
+        selected = self._select(header)
+        column_names = [str(i) for i in range(len(header))]
+        if codecs.lookup(encoding).name in ["utf-8", "ascii"]:
+            encoding = "utf8"
+        read_options = pacsv.ReadOptions(
+            use_threads=True, block_size=self.block_size, column_names=column_names,
+            skip_rows_after_names=0 if self.no_header else 1, encoding=encoding)
+        parse_options = pacsv.ParseOptions(
+            delimiter=self.delimiter, newlines_in_values=True, invalid_row_handler=self._handle_invalid_row)
+        convert_options = pacsv.ConvertOptions(
+            column_types={column_names[i]: pa.string() for i in selected},
+            include_columns=[column_names[i] for i in selected])
+
+        if is_compressed(self.path) or (self.compression_threads > 0) or (self.prefetch_size > 0):
+            self._fp = open_file(self.path, mode="rb", compression_threads=self.compression_threads,
+                                 prefetch_size=self.prefetch_size)
+            source = self._fp
+        else:
+            source = self.path
+        self._reader = pacsv.open_csv(source, read_options=read_options, parse_options=parse_options,
+                                      convert_options=convert_options)
+
+        keys = [header[i] for i in selected] if self.as_dict else selected
+        for batch in self._reader:
+            values = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+            if self.as_dict:
+                for row in zip(*values):
+                    yield dict(zip(keys, row))
+            else:
+                for row in zip(*values):
+                    result = [None] * len(header)
+                    for i, value in zip(keys, row):
+                        result[i] = value
+                    yield result
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
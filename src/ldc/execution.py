@@ -0,0 +1,378 @@
+import logging
+import os
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait, as_completed
+from multiprocessing.util import Finalize
+from typing import Callable, List, Optional, Tuple
+
+from seppl import init_initializable, Initializable
+from seppl.io import Reader, Writer, StreamWriter, BatchWriter, Filter, filter_data, execute
+from wai.logging import init_logging, set_logging_level
+
+from ldc.core import Session, ENV_LLM_LOGLEVEL
+from ldc.api import generate_output, is_stateful
+
+
+DEFAULT_CHUNK_SIZE = 100
+""" the default number of records to send to a worker process at a time. """
+
+_worker_filter = None
+""" the filter (chain) of the worker process. """
+
+_worker_session = None
+""" the session object of the worker process. """
+
+
+def _init_worker(filter_: Optional[Filter], options, logger_name: str):
+    """
+    Initializes the filter (chain) in the worker process.
+
+    :param filter_: the filter to use, can be None
+    :type filter_: Filter
+    :param options: the global options of the session
+    :param logger_name: the name of the session logger
+    :type logger_name: str
+    """
+    global _worker_filter
+    global _worker_session
+    init_logging(env_var=ENV_LLM_LOGLEVEL)
+    _worker_session = Session(options=options)
+    _worker_session.logger = logging.getLogger(logger_name)
+    set_logging_level(_worker_session.logger, options.logging_level)
+    _worker_filter = filter_
+    if _worker_filter is None:
+        return
+    _worker_filter.session = _worker_session
+    if isinstance(_worker_filter, Initializable) and not init_initializable(_worker_filter, "filter"):
+        raise Exception("Failed to initialize filter in worker process!")
+    Finalize(None, _finalize_worker, exitpriority=10)
+
+
+def _finalize_worker():
+    """
+    Finalizes the filter (chain) when the worker process exits.
+    """
+    global _worker_filter
+    if isinstance(_worker_filter, Initializable):
+        _worker_filter.finalize()
+    _worker_filter = None
+
+
+def _process_chunk(current_input: Optional[str], start: int, chunk: List) -> List[Tuple[int, object]]:
+    """
+    Pushes the records of the chunk through the filter (chain) of the worker process.
+
+    :param current_input: the input the records originate from
+    :type current_input: str
+    :param start: the number (1-based) of the first record of the chunk as read by the reader
+    :type start: int
+    :param chunk: the records to filter
+    :type chunk: list
+    :return: the filtered records, tuples of the number of the record they were generated from and the record
+    :rtype: list
+    """
+    _worker_session.current_input = current_input
+    if _worker_filter is None:
+        return [(start + i, item) for i, item in enumerate(chunk)]
+    result = []
+    for i, item in enumerate(chunk):
+        _worker_session.count = start + i
+        for filtered in filter_data(item, [_worker_filter], session=_worker_session):
+            if filtered is None:
+                continue
+            if isinstance(filtered, list):
+                result.extend([(start + i, x) for x in filtered])
+            else:
+                result.append((start + i, filtered))
+    return result
+
+
+def _read_chunks(reader: Reader, session: Session, chunk_size: int):
+    """
+    Reads the records and groups them into chunks. A chunk never spans more than one input.
+    The records get numbered as they are read (1-based), like the session counter in serial
+    execution; the session counter itself only gets updated when writing the records.
+
+    :param reader: the reader to obtain the records from
+    :type reader: Reader
+    :param session: the session to use
+    :type session: Session
+    :param chunk_size: the maximum number of records per chunk
+    :type chunk_size: int
+    :return: generator of (current input, number of first record, records) tuples
+    """
+    chunk = []
+    chunk_input = None
+    count = 0
+    while True:
+        for item in reader.read():
+            if item is None:
+                continue
+            if session.stopped:
+                return
+            if (len(chunk) > 0) and ((len(chunk) >= chunk_size) or (session.current_input != chunk_input)):
+                yield chunk_input, count - len(chunk) + 1, chunk
+                chunk = []
+            chunk_input = session.current_input
+            chunk.append(item)
+            count += 1
+            if count % session.options.update_interval == 0:
+                session.logger.info("%d records read..." % count)
+        if reader.has_finished():
+            break
+    if len(chunk) > 0:
+        yield chunk_input, count - len(chunk) + 1, chunk
+
+
+def _next_result(pending: deque, preserve_order: bool, block: bool) -> Optional[Tuple[str, List]]:
+    """
+    Removes the next processed chunk from the pending ones. Chunks of different inputs are always
+    returned in input order, whereas chunks of the same input only in order if preserve_order is True.
+
+    :param pending: the pending tasks, tuples of (input number, input, future)
+    :type pending: deque
+    :param preserve_order: whether to return the chunks in the order they were submitted
+    :type preserve_order: bool
+    :param block: whether to wait for a chunk to finish
+    :type block: bool
+    :return: the (input, records) tuple, None if no chunk available
+    :rtype: tuple
+    """
+    if len(pending) == 0:
+        return None
+    if preserve_order:
+        candidates = [pending[0]]
+    else:
+        candidates = [x for x in pending if x[0] == pending[0][0]]
+    done = [x for x in candidates if x[2].done()]
+    if (len(done) == 0) and block:
+        wait([x[2] for x in candidates], return_when=FIRST_COMPLETED)
+        done = [x for x in candidates if x[2].done()]
+    if len(done) == 0:
+        return None
+    pending.remove(done[0])
+    return done[0][1], done[0][2].result()
+
+
+def _write(writer: Optional[Writer], session: Session, current_input: str, data: List, batch: List):
+    """
+    Forwards the filtered records to the writer, or collects them in batch mode. When writing,
+    the session counter gets set to the number of the record that the record was generated from,
+    like in serial execution (writers can use it for naming files).
+
+    :param writer: the writer to use, can be None
+    :type writer: Writer
+    :param session: the session to use
+    :type session: Session
+    :param current_input: the input the records originate from
+    :type current_input: str
+    :param data: the records to write, tuples of record number and record
+    :type data: list
+    :param batch: the list for collecting the records in batch mode, None in stream mode
+    :type batch: list
+    """
+    if batch is not None:
+        batch.extend([x[1] for x in data])
+    elif writer is not None:
+        # the reader may already be further ahead
+        reader_input = session.current_input
+        session.current_input = current_input
+        for count, item in data:
+            session.count = count
+            writer.write_stream(item)
+        session.current_input = reader_input
+
+
+def execute_parallel(reader: Reader, filter_: Optional[Filter], writer: Optional[Writer], session: Session,
+                     num_processes: int, chunk_size: int = DEFAULT_CHUNK_SIZE, preserve_order: bool = False):
+    """
+    Executes the pipeline, with the filter (chain) running in a pool of worker processes.
+    The reader and writer remain in the main process, the records are sent to the workers in chunks.
+    Every worker has its own copy of the filter (chain), i.e., filters that maintain state across
+    records (e.g., for detecting duplicates or counting) would only see the records of their worker
+    and are therefore rejected (see ldc.api.is_stateful).
+    Records of different inputs are always written in input order, within an input they can get
+    written out of order unless preserve_order is enabled.
+
+    :param reader: the reader to use
+    :type reader: Reader
+    :param filter_: the filter to use, can be None
+    :type filter_: Filter
+    :param writer: the writer to use, can be None
+    :type writer: Writer
+    :param session: the session object to use
+    :type session: Session
+    :param num_processes: the number of worker processes to use
+    :type num_processes: int
+    :param chunk_size: the maximum number of records per chunk
+    :type chunk_size: int
+    :param preserve_order: whether to preserve the order of the records within an input
+    :type preserve_order: bool
+    """
+    if num_processes < 1:
+        raise Exception("At least one process is required: %d" % num_processes)
+    if chunk_size < 1:
+        raise Exception("Chunk size must be at least 1: %d" % chunk_size)
+    if is_stateful(filter_):
+        raise Exception("Filter(s) keep state across records, cannot be run in multiple processes!")
+
+    # propagate session
+    reader.session = session
+    if writer is not None:
+        writer.session = session
+
+    # initialize (filter gets initialized in the worker processes)
+    if isinstance(reader, Initializable) and not init_initializable(reader, "reader"):
+        return
+    if (writer is not None) and isinstance(writer, Initializable) and not init_initializable(writer, "writer"):
+        return
+
+    # batch mode?
+    batch = None
+    if session.options.force_batch or isinstance(writer, BatchWriter):
+        batch = []
+
+    # process data
+    executor = ProcessPoolExecutor(max_workers=num_processes, initializer=_init_worker, initargs=(filter_, session.options, session.logger.name))
+    try:
+        pending = deque()
+        input_no = 0
+        last_input = None
+        total = 0
+        for current_input, start, chunk in _read_chunks(reader, session, chunk_size):
+            if current_input != last_input:
+                input_no += 1
+                last_input = current_input
+            total = start + len(chunk) - 1
+            pending.append((input_no, current_input, executor.submit(_process_chunk, current_input, start, chunk)))
+            # write whatever is finished, limit the number of chunks in flight
+            while True:
+                result = _next_result(pending, preserve_order, len(pending) >= 2 * num_processes)
+                if result is None:
+                    break
+                _write(writer, session, result[0], result[1], batch)
+        while len(pending) > 0:
+            result = _next_result(pending, preserve_order, True)
+            _write(writer, session, result[0], result[1], batch)
+
+        if (batch is not None) and (writer is not None):
+            if isinstance(writer, StreamWriter):
+                for item in batch:
+                    writer.write_stream(item)
+            elif isinstance(writer, BatchWriter):
+                writer.write_batch(batch)
+            else:
+                raise Exception("Neither stream nor batch writer: %s" % str(type(writer)))
+        session.count = total
+        session.logger.info("%d records processed in total." % session.count)
+    except:
+        traceback.print_exc()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    # clean up
+    if isinstance(reader, Initializable):
+        reader.finalize()
+    if (writer is not None) and isinstance(writer, Initializable):
+        writer.finalize()
+
+
+PipelineFactory = Callable[[], Tuple[Reader, Optional[Filter], Optional[Writer], Session]]
+""" generates a new pipeline: reader, filter (can be None), writer (can be None), session. """
+
+
+def _locate_inputs(reader: Reader, session: Session) -> List[str]:
+    """
+    Determines the files that the reader would process. The reader gets initialized
+    for locating the files and finalized again afterwards.
+
+    :param reader: the (uninitialized) reader to get the files from
+    :type reader: Reader
+    :param session: the session to use
+    :type session: Session
+    :return: the files
+    :rtype: list
+    """
+    if not hasattr(reader, "source"):
+        raise Exception("Reader does not read from files: %s" % reader.name())
+    reader.session = session
+    if isinstance(reader, Initializable) and not init_initializable(reader, "reader"):
+        raise Exception("Failed to initialize reader: %s" % reader.name())
+    try:
+        result = reader.located_inputs()
+    finally:
+        if isinstance(reader, Initializable):
+            reader.finalize()
+    if result is None:
+        raise Exception("Reader does not provide the located input files: %s" % reader.name())
+    return result
+
+
+def _execute_file(factory: PipelineFactory, input_file: str, output: Optional[str]) -> int:
+    """
+    Runs a private copy of the pipeline for a single input file.
+
+    :param factory: for generating the pipeline
+    :param input_file: the file to read
+    :type input_file: str
+    :param output: the file to write to, ignored if no writer
+    :type output: str
+    :return: the number of records that were processed
+    :rtype: int
+    """
+    init_logging(env_var=ENV_LLM_LOGLEVEL)
+    reader, filter_, writer, session = factory()
+    reader.source = [input_file]
+    reader.source_list = None
+    if writer is not None:
+        writer.target = output
+    execute(reader, filter_, writer, session)
+    return session.count
+
+
+def execute_per_file(factory: PipelineFactory, num_processes: int):
+    """
+    Executes the pipeline for each input file of the reader separately, using a pool of worker processes.
+    Every worker generates its own copy of the full pipeline (reader, filter(s), writer) via the factory,
+    with the reader restricted to a single file and the writer's output directory replaced with a file
+    in that directory named after the input file. Filters that maintain state across records therefore
+    only see the records of a single file.
+
+    :param factory: for generating the pipeline, must be picklable
+    :param num_processes: the number of worker processes to use
+    :type num_processes: int
+    """
+    if num_processes < 1:
+        raise Exception("At least one process is required: %d" % num_processes)
+
+    reader, filter_, writer, session = factory()
+    inputs = _locate_inputs(reader, session)
+    outputs = []
+    if writer is not None:
+        if not os.path.isdir(writer.target):
+            raise Exception("Output must be an existing directory when processing files separately: %s" % writer.target)
+        for input_file in inputs:
+            output = generate_output(input_file, writer.target, writer.get_extension(), session.options.compression)
+            if output in outputs:
+                raise Exception("Multiple input files map to the same output file: %s" % output)
+            outputs.append(output)
+    else:
+        outputs = [None] * len(inputs)
+
+    count = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        futures = dict()
+        for input_file, output in zip(inputs, outputs):
+            futures[executor.submit(_execute_file, factory, input_file, output)] = input_file
+        for future in as_completed(futures):
+            try:
+                count += future.result()
+                session.logger.info("Finished: %s" % futures[future])
+            except:
+                failed += 1
+                session.logger.exception("Failed to process: %s" % futures[future])
+    session.logger.info("%d records processed in total." % count)
+    if failed > 0:
+        session.logger.error("Failed to process %d of %d file(s)." % (failed, len(inputs)))
@@ -3,6 +3,7 @@ from ._change_case import ChangeCase, CASES, CASE_UNCHANGED, CASE_LOWER, CASE_UP
 from ._discard_by_name import DiscardByName
 from ._file_filter import FileFilter
 from ._find_substr import FindSubstring
+from ._hash_partition import HashPartition
 from ._inspect import Inspect, MODES, MODE_NONINTERACTIVE, MODE_INTERACTIVE, OUTPUTS, OUTPUT_STDOUT, OUTPUT_STDERR, OUTPUT_LOGGER, OUTPUT_FILE
 from ._keyword import Keyword
 from ._llama2_to_pairs import Llama2ToPairs
@@ -14,6 +15,7 @@ from ._pairs_to_pretrain import PairsToPretrain
 from ._pretrain_sentences_to_classification import PretrainSentencesToClassification
 from ._pretrain_sentences_to_pairs import PretrainSentencesToPairs
 from ._randomize_records import RandomizeRecords
+from ._record_filter import RecordFilter
 from ._record_files import RecordFiles
 from ._record_window import RecordWindow
 from ._remove_blocks import RemoveBlocks
@@ -23,6 +25,7 @@ from ._replace_patterns import ReplacePatterns
 from ._reset_ids import ResetIDs
 from ._skip_duplicate_ids import SkipDuplicateIDs
 from ._skip_duplicate_text import SkipDuplicateText
+from ._skip_near_duplicates import SkipNearDuplicates, NEAR_DUPLICATE_ACTIONS, NEAR_DUPLICATE_ACTION_DISCARD, NEAR_DUPLICATE_ACTION_TAG
 from ._split_records import SplitRecords
 from ._tee import Tee
 from ._text_length import TextLength
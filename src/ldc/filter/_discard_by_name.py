@@ -1,6 +1,5 @@
 import argparse
 import os
-import re
 from typing import List
 
 from seppl import MetaDataHandler
@@ -12,6 +11,7 @@ from ldc.api.pretrain import PretrainData
 from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
+from ldc.pattern_utils import compile_regexp, MatchBudget, add_regexp_arguments, REGEXP_BACKEND_RE
 
 
 class DiscardByName(Filter):
@@ -22,6 +22,7 @@ class DiscardByName(Filter):
     def __init__(self, names: List[str] = None, names_file: str = None,
                  regexps: List[str] = None, regexps_file: str = None,
                  remove_ext: bool = None, invert: bool = None,
+                 regexp_backend: str = REGEXP_BACKEND_RE, time_budget: float = 0.0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -38,6 +39,10 @@ class DiscardByName(Filter):
         :type remove_ext: bool
         :param invert: whether to invert the matching sense
         :type invert: bool
+        :param regexp_backend: the engine for the regular expressions, see REGEXP_BACKENDS
+        :type regexp_backend: str
+        :param time_budget: the maximum time in seconds for matching a record, no limit if <= 0
+        :type time_budget: float
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -50,6 +55,9 @@ class DiscardByName(Filter):
         self.regexps_file = regexps_file
         self.remove_ext = remove_ext
         self.invert = invert
+        self.regexp_backend = regexp_backend
+        self.time_budget = time_budget
+        self._budget = None
         self._names = None
         self._regexps = None
 
@@ -112,6 +120,7 @@ class DiscardByName(Filter):
         parser.add_argument("-R", "--regexps_file", type=str, help="The text file with regular expressions for matching image name(s) to drop.", required=False, default=None)
         parser.add_argument("-e", "--remove_ext", action="store_true", help="Whether to remove the extension (and dot) before matching.")
         parser.add_argument("-V", "--invert", action="store_true", help="Whether to invert the matching sense.")
+        add_regexp_arguments(parser)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -128,6 +137,8 @@ class DiscardByName(Filter):
         self.regexps_file = ns.regexps_file
         self.remove_ext = ns.remove_ext
         self.invert = ns.invert
+        self.regexp_backend = ns.regexp_backend
+        self.time_budget = ns.time_budget
 
     def initialize(self):
         """
@@ -157,15 +168,38 @@ class DiscardByName(Filter):
         self._regexps = list()
         if self.regexps is not None:
             for regexp in self.regexps:
-                self._regexps.append(re.compile(regexp))
+                self._regexps.append(compile_regexp(regexp, backend=self.regexp_backend, logger=self.logger()))
         if self.regexps_file is not None:
             with open(self.regexps_file) as fp:
                 lines = fp.readlines()
                 for line in lines:
                     line = line.strip()
                     if len(line) > 0:
-                        self._regexps.append(re.compile(line))
+                        self._regexps.append(compile_regexp(line, backend=self.regexp_backend, logger=self.logger()))
         self.logger().info("# regexps: %d" % len(self._regexps))
+        self._budget = MatchBudget(self.time_budget, self.logger())
+
+    def _check_regexps(self, file_name: str, full_file_name: str) -> bool:
+        """
+        Checks the file name against the regular expressions.
+
+        :param file_name: the file name to check
+        :type file_name: str
+        :param full_file_name: the full file name, for logging purposes
+        :type full_file_name: str
+        :return: whether to keep the record
+        :rtype: bool
+        """
+        for regexp in self._regexps:
+            if regexp.fullmatch(file_name) is not None:
+                if not self.invert:
+                    self.logger().info("Skipping based on regexp match: %s" % full_file_name)
+                    return False
+            else:
+                if self.invert:
+                    self.logger().info("Skipping based on no regexp match (invert): %s" % full_file_name)
+                    return False
+        return True
 
     def _do_process(self, data):
         """
@@ -205,19 +239,19 @@ class DiscardByName(Filter):
 
         # check against regexps
         if add:
-            for regexp in self._regexps:
-                if regexp.fullmatch(file_name) is not None:
-                    if not self.invert:
-                        self.logger().info("Skipping based on regexp match: %s" % full_file_name)
-                        add = False
-                        break
-                else:
-                    if self.invert:
-                        self.logger().info("Skipping based on no regexp match (invert): %s" % full_file_name)
-                        add = False
-                        break
+            finished, add = self._budget.run(lambda: self._check_regexps(file_name, full_file_name), full_file_name)
+            if not finished:
+                add = False
 
         if add:
             return data
         else:
             return None
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._budget is not None:
+            self._budget.report()
@@ -1,5 +1,4 @@
 import argparse
-import re
 from typing import List, Union
 
 from wai.logging import LOGGING_WARNING
@@ -11,6 +10,7 @@ from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
 from ldc.api import Filter, FILTER_ACTIONS, FILTER_ACTION_DISCARD, FILTER_ACTION_KEEP
+from ldc.pattern_utils import PatternSet, MatchBudget, add_regexp_arguments, REGEXP_BACKEND_RE
 
 
 class FindSubstring(Filter):
@@ -21,6 +21,7 @@ class FindSubstring(Filter):
     def __init__(self, substrings: List[str] = None, is_regexp: bool = False,
                  action: str = FILTER_ACTION_KEEP,
                  location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
+                 regexp_backend: str = REGEXP_BACKEND_RE, time_budget: float = 0.0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -35,6 +36,10 @@ class FindSubstring(Filter):
         :type location: str or list
         :param languages: the languages to restrict the substrings to, None to check all
         :type languages: list
+        :param regexp_backend: the engine for the regular expressions, see REGEXP_BACKENDS
+        :type regexp_backend: str
+        :param time_budget: the maximum time in seconds for matching a record, no limit if <= 0
+        :type time_budget: float
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -52,8 +57,12 @@ class FindSubstring(Filter):
         self.action = action
         self.location = location
         self.languages = languages
+        self.regexp_backend = regexp_backend
+        self.time_budget = time_budget
+        self._budget = None
         self.kept = 0
         self.discarded = 0
+        self._patterns = None
 
     def name(self) -> str:
         """
@@ -113,6 +122,7 @@ class FindSubstring(Filter):
         add_location_argument(parser, "Where to look for the substrings")
         parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
         parser.add_argument("-a", "--action", choices=FILTER_ACTIONS, default=FILTER_ACTION_KEEP, help="How to react when a substring is found")
+        add_regexp_arguments(parser)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -128,6 +138,8 @@ class FindSubstring(Filter):
         self.action = ns.action
         self.location = ns.location
         self.languages = ns.language
+        self.regexp_backend = ns.regexp_backend
+        self.time_budget = ns.time_budget
 
     def initialize(self):
         """
@@ -142,6 +154,8 @@ class FindSubstring(Filter):
             self.languages = [x.lower() for x in self.languages]
         if isinstance(self.location, str):
             self.location = [self.location]
+        self._patterns = PatternSet(self.substrings, is_regexp=self.is_regexp, backend=self.regexp_backend, logger=self.logger())
+        self._budget = MatchBudget(self.time_budget, self.logger())
         self.kept = 0
         self.discarded = 0
 
@@ -193,19 +207,9 @@ class FindSubstring(Filter):
         strings = self._to_strings(data)
 
         # check for substrings
-        found = False
-        for s in strings:
-            for sub in self.substrings:
-                if self.is_regexp:
-                    if re.search(sub, s) is not None:
-                        found = True
-                        break
-                else:
-                    if sub in s:
-                        found = True
-                        break
-            if found:
-                break
+        finished, found = self._budget.run(lambda: any(self._patterns.matches(x) for x in strings), data)
+        if not finished:
+            return None
 
         if self.action == FILTER_ACTION_KEEP:
             if not found:
@@ -233,3 +237,5 @@ class FindSubstring(Filter):
         super().finalize()
         self.logger().info("# kept: %d" % self.kept)
         self.logger().info("# discarded: %d" % self.discarded)
+        if self._budget is not None:
+            self._budget.report()
@@ -0,0 +1,253 @@
+import argparse
+import os
+from typing import List, Union
+
+from wai.logging import LOGGING_WARNING
+from ldc.core import DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION
+from ldc.core import LOCATION_ANY, LOCATION_INSTRUCTION, LOCATION_INPUT, LOCATION_OUTPUT, LOCATION_CONTENT, \
+    LOCATION_TEXT, LOCATIONS, locations_match, add_location_argument
+from ldc.api.pretrain import PretrainData
+from ldc.api.supervised.classification import ClassificationData
+from ldc.api.supervised.pairs import PairData
+from ldc.api.translation import TranslationData
+from ldc.api import Filter, strip_filename
+from ldc.hash_utils import text_digest, bucket_filename, DEFAULT_NUM_BUCKETS
+
+
+class HashPartition(Filter):
+    """
+    Writes the digests of the texts along with the location of the records (input file and position)
+    to bucket files, partitioned by digest. The buckets can then be resolved with llm-resolve-buckets.
+    """
+
+    def __init__(self, location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
+                 output_dir: str = None, num_buckets: int = DEFAULT_NUM_BUCKETS, prefix: str = None,
+                 ignore_path: bool = False, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param location: which part of the data to compute the digests for
+        :type location: str or list
+        :param languages: the languages to restrict the digests to, None to use all
+        :type languages: list
+        :param output_dir: the directory to write the bucket files to
+        :type output_dir: str
+        :param num_buckets: the number of buckets to partition the digests into
+        :type num_buckets: int
+        :param prefix: the prefix for the bucket files, e.g., the name of the node
+        :type prefix: str
+        :param ignore_path: whether to remove the directory path from the input files
+        :type ignore_path: bool
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        if location not in LOCATIONS:
+            raise Exception("Invalid location: %s" % location)
+        self.location = location
+        self.languages = languages
+        self.output_dir = output_dir
+        self.num_buckets = num_buckets
+        self.prefix = prefix
+        self.ignore_path = ignore_path
+        self._buckets = None
+        self._input = None
+        self._position = 0
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "hash-partition"
+
+    def description(self) -> str:
+        """
+        Returns a description of the handler.
+
+        :return: the description
+        :rtype: str
+        """
+        return "First pass of distributed deduplication: writes the digests of the (lower case) texts " \
+               "along with the location of the records (input file and 0-based position in it) to bucket " \
+               "files, partitioned by digest. Records are passed through unchanged. The bucket files of " \
+               "all nodes can then be resolved with llm-resolve-buckets and the resulting list applied " \
+               "with record-filter, placed at the same position in the same pipeline. " \
+               "Forces serial execution of the filters (-j gets ignored), as the positions need to be " \
+               "counted across all records."
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
+    def domains(self) -> List[str]:
+        """
+        Returns the domains of the handler.
+
+        :return: the domains
+        :rtype: list
+        """
+        return [DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION]
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        add_location_argument(parser, "Which portion to compute the digests for")
+        parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
+        parser.add_argument("-o", "--output_dir", metavar="DIR", type=str, help="The directory to write the bucket files to", required=True)
+        parser.add_argument("-n", "--num_buckets", metavar="NUM", type=int, default=DEFAULT_NUM_BUCKETS, help="The number of buckets to partition the digests into; must be the same on all nodes", required=False)
+        parser.add_argument("--prefix", type=str, default=None, help="The prefix for the bucket files, e.g., the name of the node", required=False)
+        parser.add_argument("-p", "--ignore_path", action="store_true", help="Whether to ignore the path of the input files when recording the location")
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.location = ns.location
+        self.languages = ns.language
+        self.output_dir = ns.output_dir
+        self.num_buckets = ns.num_buckets
+        self.prefix = ns.prefix
+        self.ignore_path = ns.ignore_path
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.output_dir is None:
+            raise Exception("No output directory provided!")
+        if not os.path.isdir(self.output_dir):
+            raise Exception("Output directory does not exist: %s" % self.output_dir)
+        if self.num_buckets < 1:
+            raise Exception("At least one bucket is required: %d" % self.num_buckets)
+        if self.languages is not None:
+            self.languages = [x.lower() for x in self.languages]
+        if isinstance(self.location, str):
+            self.location = [self.location]
+        self._buckets = dict()
+        self._input = None
+        self._position = 0
+
+    def _get_texts(self, data) -> List[str]:
+        """
+        Turns the record into list of texts.
+
+        :return: the compiled list of texts (lower case)
+        :rtype: list
+        """
+        words = list()
+
+        if isinstance(data, PairData):
+            if locations_match(self.location, LOCATION_INSTRUCTION):
+                words.append(data.instruction.lower())
+            if locations_match(self.location, LOCATION_INPUT):
+                words.append(data.input.lower())
+            if locations_match(self.location, LOCATION_OUTPUT):
+                words.append(data.output.lower())
+        elif isinstance(data, ClassificationData):
+            if locations_match(self.location, LOCATION_TEXT):
+                words.append(data.text.lower())
+        elif isinstance(data, PretrainData):
+            if locations_match(self.location, LOCATION_CONTENT):
+                words.append(data.content.lower())
+        elif isinstance(data, TranslationData):
+            if self.languages is None:
+                for k in data.translations:
+                    words.append(data.translations[k].lower())
+            else:
+                for lang in self.languages:
+                    if lang in data.translations:
+                        words.append(data.translations[lang].lower())
+        else:
+            raise Exception("Unhandled data type: %s" % str(type(data)))
+
+        return words
+
+    def _bucket(self, index: int):
+        """
+        Returns the file for the bucket, opens it if necessary.
+
+        :param index: the index of the bucket
+        :type index: int
+        :return: the file-like object
+        """
+        if index not in self._buckets:
+            path = os.path.join(self.output_dir, bucket_filename(index, prefix=self.prefix))
+            self.logger().debug("Writing to: %s" % path)
+            self._buckets[index] = open(path, "w", encoding="utf-8")
+        return self._buckets[index]
+
+    def _do_process(self, data):
+        """
+        Processes the data record.
+
+        :param data: the record to process
+        :return: the potentially updated record or None if to drop
+        """
+        current_input = self.session.current_input
+        if current_input != self._input:
+            self._input = current_input
+            self._position = 0
+        else:
+            self._position += 1
+
+        if current_input is None:
+            self.logger().warning("No input file available, cannot record location: %s" % str(data))
+            return data
+        filename = strip_filename(current_input, strip_path=self.ignore_path)
+
+        # the texts of a record are combined, i.e., duplicates are records with the same texts
+        digest = text_digest("\n".join(self._get_texts(data)))
+        fp = self._bucket(digest % self.num_buckets)
+        fp.write("%016x\t%s\t%d\n" % (digest, filename, self._position))
+
+        return data
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        if self._buckets is not None:
+            for fp in self._buckets.values():
+                fp.close()
+            self.logger().info("# buckets written: %d" % len(self._buckets))
+            self._buckets = None
@@ -1,5 +1,5 @@
 import argparse
-from typing import List, Set, Union
+from typing import List, Union
 
 from wai.logging import LOGGING_WARNING
 from ldc.core import DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION
@@ -10,21 +10,24 @@ from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
 from ldc.api import Filter, FILTER_ACTIONS, FILTER_ACTION_DISCARD, FILTER_ACTION_KEEP
+from ldc.pattern_utils import KeywordMatcher, load_keywords
 
 
 class Keyword(Filter):
     """
-    Keeps or discards data records based on keyword(s).
+    Keeps or discards data records based on keyword(s) and/or multi-word phrases.
     """
 
-    def __init__(self, keywords: List[str] = None, action: str = FILTER_ACTION_KEEP,
+    def __init__(self, keywords: List[str] = None, keyword_files: List[str] = None, action: str = FILTER_ACTION_KEEP,
                  location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
 
-        :param keywords: the list of keywords to look for (lower case)
+        :param keywords: the list of keywords/phrases to look for (lower case)
         :type keywords: list
+        :param keyword_files: the text files with the keywords/phrases to look for (one per line)
+        :type keyword_files: list
         :param action: the action to perform
         :type action: str
         :param location: in which part of the data to look for the keywords
@@ -44,11 +47,13 @@ class Keyword(Filter):
             raise Exception("Invalid location: %s" % location)
 
         self.keywords = keywords
+        self.keyword_files = keyword_files
         self.action = action
         self.location = location
         self.languages = languages
         self.kept = 0
         self.discarded = 0
+        self._matcher = None
 
     def name(self) -> str:
         """
@@ -66,7 +71,8 @@ class Keyword(Filter):
         :return: the description
         :rtype: str
         """
-        return "Keeps or discards data records based on keyword(s). Search is performed in lower-case."
+        return "Keeps or discards data records based on keyword(s) and/or multi-word phrases (matching consecutive words). " \
+               "Search is performed in lower-case, the text gets split into words on whitespace."
 
     def domains(self) -> List[str]:
         """
@@ -103,7 +109,8 @@ class Keyword(Filter):
         :rtype: argparse.ArgumentParser
         """
         parser = super()._create_argparser()
-        parser.add_argument("-k", "--keyword", type=str, help="The keywords to look for (lower case)", required=True, nargs="+")
+        parser.add_argument("-k", "--keyword", type=str, help="The keywords/phrases to look for (lower case)", required=False, nargs="*")
+        parser.add_argument("-K", "--keyword_file", metavar="FILE", type=str, help="The text file(s) with the keywords/phrases to look for (one per line; empty lines and lines starting with # get ignored)", required=False, nargs="*")
         add_location_argument(parser, "Where to look for the keywords")
         parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
         parser.add_argument("-a", "--action", choices=FILTER_ACTIONS, default=FILTER_ACTION_KEEP, help="How to react when a keyword is encountered")
@@ -117,7 +124,8 @@ class Keyword(Filter):
         :type ns: argparse.Namespace
         """
         super()._apply_args(ns)
-        self.keywords = ns.keyword[:]
+        self.keywords = None if (ns.keyword is None) else ns.keyword[:]
+        self.keyword_files = ns.keyword_file
         self.action = ns.action
         self.location = ns.location
         self.languages = ns.language
@@ -127,9 +135,16 @@ class Keyword(Filter):
         Initializes the processing, e.g., for opening files or databases.
         """
         super().initialize()
-        if (self.keywords is None) or (len(self.keywords) == 0):
+        keywords = []
+        if self.keywords is not None:
+            keywords.extend(self.keywords)
+        if self.keyword_files is not None:
+            for keyword_file in self.keyword_files:
+                keywords.extend(load_keywords(keyword_file))
+        if len(keywords) == 0:
             raise Exception("No keywords provided!")
-        self.keywords = [x.lower() for x in self.keywords]
+        self._matcher = KeywordMatcher(keywords)
+        self.logger().info("Compiled %d keyword(s)/phrase(s)" % len(keywords))
         if self.languages is not None:
             self.languages = [x.lower() for x in self.languages]
         if isinstance(self.location, str):
@@ -137,36 +152,36 @@ class Keyword(Filter):
         self.kept = 0
         self.discarded = 0
 
-    def _to_words(self, data) -> Set[str]:
+    def _to_words(self, data) -> List[List[str]]:
         """
-        Turns the record into words.
+        Turns the record into words, one list per text (phrases cannot span texts).
 
-        :return: the compiled set of words (lower case)
-        :rtype: set
+        :return: the lists of words (lower case)
+        :rtype: list
         """
-        words = set()
+        words = list()
 
         if isinstance(data, PairData):
             if locations_match(self.location, LOCATION_INSTRUCTION):
-                words.update(data.instruction.lower().split())
+                words.append(data.instruction.lower().split())
             if locations_match(self.location, LOCATION_INPUT):
-                words.update(data.input.lower().split())
+                words.append(data.input.lower().split())
             if locations_match(self.location, LOCATION_OUTPUT):
-                words.update(data.output.lower().split())
+                words.append(data.output.lower().split())
         elif isinstance(data, ClassificationData):
             if locations_match(self.location, LOCATION_TEXT):
-                words.update(data.text.lower().split())
+                words.append(data.text.lower().split())
         elif isinstance(data, PretrainData):
             if locations_match(self.location, LOCATION_CONTENT):
-                words.update(data.content.lower().split())
+                words.append(data.content.lower().split())
         elif isinstance(data, TranslationData):
             if self.languages is None:
                 for k in data.translations:
-                    words.update(data.translations[k].lower().split())
+                    words.append(data.translations[k].lower().split())
             else:
                 for lang in self.languages:
                     if lang in data.translations:
-                        words.update(data.translations[lang].lower().split())
+                        words.append(data.translations[lang].lower().split())
         else:
             raise Exception("Unhandled data type: %s" % str(type(data)))
 
@@ -181,13 +196,10 @@ class Keyword(Filter):
         """
         result = data
 
-        # prepare lookup
-        words = self._to_words(data)
-
         # check for keywords
         found = False
-        for keyword in self.keywords:
-            if keyword in words:
+        for words in self._to_words(data):
+            if self._matcher.matches(words):
                 found = True
                 break
 
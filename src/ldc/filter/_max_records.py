@@ -47,6 +47,16 @@ class MaxRecords(Filter):
         """
         return "Suppresses records after the specified maximum number of records have passed through."
 
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
     def domains(self) -> List[str]:
         """
         Returns the domains of the filter.
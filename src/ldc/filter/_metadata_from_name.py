@@ -1,12 +1,12 @@
 import argparse
 import copy
-import re
 from typing import List
 
 from wai.logging import LOGGING_WARNING
 
 from ldc.api import Filter
 from ldc.core import DOMAIN_ANY
+from ldc.pattern_utils import compile_regexp, MatchBudget, add_regexp_arguments, REGEXP_BACKEND_RE
 from seppl import AnyData
 
 
@@ -16,6 +16,7 @@ class MetaDataFromName(Filter):
     """
 
     def __init__(self, regexp: str = None, metadata_key: str = None,
+                 regexp_backend: str = REGEXP_BACKEND_RE, time_budget: float = 0.0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -24,6 +25,10 @@ class MetaDataFromName(Filter):
         :type regexp: str
         :param metadata_key: the metadata key to store the extracted substring under
         :type metadata_key: str
+        :param regexp_backend: the engine for the regular expressions, see REGEXP_BACKENDS
+        :type regexp_backend: str
+        :param time_budget: the maximum time in seconds for matching a record, no limit if <= 0
+        :type time_budget: float
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -32,6 +37,10 @@ class MetaDataFromName(Filter):
         super().__init__(logger_name=logger_name, logging_level=logging_level)
         self.regexp = regexp
         self.metadata_key = metadata_key
+        self.regexp_backend = regexp_backend
+        self.time_budget = time_budget
+        self._budget = None
+        self._regexp = None
 
     def name(self) -> str:
         """
@@ -88,6 +97,7 @@ class MetaDataFromName(Filter):
         parser = super()._create_argparser()
         parser.add_argument("-r", "--regexp", type=str, help="The regular expression apply to the current input name, with the 1st group being used as the meta-data value.", default=None, required=False)
         parser.add_argument("-k", "--metadata_key", type=str, help="The key in the meta-data to store the extracted sub-string under.", default=None, required=False)
+        add_regexp_arguments(parser)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -100,6 +110,8 @@ class MetaDataFromName(Filter):
         super()._apply_args(ns)
         self.regexp = ns.regexp
         self.metadata_key = ns.metadata_key
+        self.regexp_backend = ns.regexp_backend
+        self.time_budget = ns.time_budget
 
     def initialize(self):
         """
@@ -108,6 +120,10 @@ class MetaDataFromName(Filter):
         super().initialize()
         if self.metadata_key is None:
             raise Exception("No meta-data key provided!")
+        if self.regexp is None:
+            raise Exception("No regular expression provided!")
+        self._regexp = compile_regexp(self.regexp, backend=self.regexp_backend, logger=self.logger())
+        self._budget = MatchBudget(self.time_budget, self.logger())
 
     def _update(self, data):
         """
@@ -120,7 +136,9 @@ class MetaDataFromName(Filter):
             if name is None:
                 self.logger().warning("No file name available: %s" % str(data))
                 return data
-            m = re.search(self.regexp, name)
+            finished, m = self._budget.run(lambda: self._regexp.search(name), data)
+            if not finished:
+                return None
             if m is None:
                 return data
             value = m.group(1)
@@ -147,7 +165,16 @@ class MetaDataFromName(Filter):
             result = list(data)
             for i, item in enumerate(data):
                 result[i] = self._update(item)
+            result = [x for x in result if x is not None]
         else:
             result = self._update(data)
 
         return result
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._budget is not None:
+            self._budget.report()
@@ -48,6 +48,16 @@ class RandomizeRecords(Filter):
         """
         return "Batch filter that randomizes the order of the records."
 
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
     def domains(self) -> List[str]:
         """
         Returns the domains of the filter.
@@ -56,6 +56,16 @@ class RecordFiles(Filter):
         """
         return "Records the file names in the meta-data ('file') and outputs them, either to a file or stdout."
 
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
     def domains(self) -> List[str]:
         """
         Returns the domains of the filter.
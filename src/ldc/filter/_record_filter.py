@@ -0,0 +1,217 @@
+import argparse
+import os.path
+from array import array
+from typing import List
+
+import numpy as np
+from wai.logging import LOGGING_WARNING
+
+from ldc.api import Filter, FILTER_ACTIONS, FILTER_ACTION_DISCARD, FILTER_ACTION_KEEP, strip_filename
+from ldc.api.pretrain import PretrainData
+from ldc.api.supervised.classification import ClassificationData
+from ldc.api.supervised.pairs import PairData
+from ldc.api.translation import TranslationData
+from ldc.core import DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION
+
+
+class RecordFilter(Filter):
+    """
+    Keeps or discards records based on a list of record locations (input file and 0-based position in it),
+    e.g., as generated by llm-resolve-buckets.
+    """
+
+    def __init__(self, record_list: str = None, action: str = FILTER_ACTION_KEEP, ignore_path: bool = False,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param record_list: the text file listing the locations of the to keep/to discard records
+        :type record_list: str
+        :param action: whether the listed records are to be kept or discarded
+        :type action: str
+        :param ignore_path: whether to remove the directory path from the filenames
+        :type ignore_path: bool
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+
+        if action not in FILTER_ACTIONS:
+            raise Exception("Invalid action: %s" % action)
+
+        self.record_list = record_list
+        self.action = action
+        self.ignore_path = ignore_path
+        self._positions = None
+        self._input = None
+        self._input_positions = None
+        self._position = 0
+        self._kept = 0
+        self._discarded = 0
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "record-filter"
+
+    def description(self) -> str:
+        """
+        Returns a description of the handler.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Keeps or discards records based on a list of record locations, i.e., the input file and the " \
+               "0-based position of the record in it, separated by a tab (one location per line). " \
+               "Such a list gets generated by llm-resolve-buckets from the output of the hash-partition filter. " \
+               "The positions are counted by this filter, i.e., it must be placed at the same position in the " \
+               "pipeline as hash-partition. Forces serial execution of the filters (-j gets ignored)."
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
+    def domains(self) -> List[str]:
+        """
+        Returns the domains of the handler.
+
+        :return: the domains
+        :rtype: list
+        """
+        return [DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION]
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-r", "--record_list", type=str, default=None, help="The file containing the locations of the records to be kept or discarded", required=True)
+        parser.add_argument("-a", "--action", choices=FILTER_ACTIONS, default=FILTER_ACTION_KEEP, help="How to react when a record's location is listed.")
+        parser.add_argument("-p", "--ignore_path", action="store_true", help="Whether to ignore the path in files when checking against the record list")
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.record_list = ns.record_list
+        self.action = ns.action
+        self.ignore_path = ns.ignore_path
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if not os.path.exists(self.record_list):
+            raise Exception("Record list does not exist: %s" % self.record_list)
+        positions = dict()
+        with open(self.record_list, "r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.rstrip("\n")
+                if len(line) == 0:
+                    continue
+                filename, position = line.rsplit("\t", 1)
+                filename = strip_filename(filename, strip_path=self.ignore_path)
+                if filename not in positions:
+                    positions[filename] = array("Q")
+                positions[filename].append(int(position))
+        self._positions = dict()
+        for filename in positions:
+            self._positions[filename] = np.sort(np.frombuffer(positions[filename], dtype=np.uint64))
+        self.logger().info("Loaded record list for %d file(s)" % len(self._positions))
+        self._input = None
+        self._input_positions = None
+        self._position = 0
+        self._kept = 0
+        self._discarded = 0
+
+    def _is_listed(self) -> bool:
+        """
+        Checks whether the current record is listed.
+
+        :return: whether listed
+        :rtype: bool
+        """
+        positions = self._input_positions
+        if (positions is None) or (len(positions) == 0):
+            return False
+        i = np.searchsorted(positions, self._position)
+        return (i < len(positions)) and (positions[i] == self._position)
+
+    def _do_process(self, data):
+        """
+        Processes the data record.
+
+        :param data: the record to process
+        :return: the potentially updated record or None if to drop
+        """
+        current_input = self.session.current_input
+        if current_input != self._input:
+            self._input = current_input
+            self._position = 0
+            self._input_positions = None
+            if current_input is not None:
+                self._input_positions = self._positions.get(strip_filename(current_input, strip_path=self.ignore_path), None)
+        else:
+            self._position += 1
+
+        listed = self._is_listed()
+        if self.action == FILTER_ACTION_DISCARD:
+            result = None if listed else data
+        elif self.action == FILTER_ACTION_KEEP:
+            result = data if listed else None
+        else:
+            raise Exception("Unhandled action: %s" % self.action)
+
+        if result is None:
+            self._discarded += 1
+            self.logger().debug("discarding record #%d of: %s" % (self._position, str(self._input)))
+        else:
+            self._kept += 1
+
+        return result
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        self.logger().info("# kept: %d, # discarded: %d" % (self._kept, self._discarded))
+        self._positions = None
@@ -52,6 +52,16 @@ class RecordWindow(Filter):
         """
         return "Only lets records pass that match the defined window and step size."
 
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
     def domains(self) -> List[str]:
         """
         Returns the domains of the filter.
@@ -10,7 +10,7 @@ from ldc.api.pretrain import PretrainData
 from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
-from ldc.text_utils import remove_patterns
+from ldc.pattern_utils import PatternSet, MatchBudget, add_regexp_arguments, REGEXP_BACKEND_RE
 from ldc.api import Filter
 
 
@@ -21,6 +21,7 @@ class RemovePatterns(Filter):
 
     def __init__(self, expr_remove: List[str] = None,
                  location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
+                 regexp_backend: str = REGEXP_BACKEND_RE, time_budget: float = 0.0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -31,6 +32,10 @@ class RemovePatterns(Filter):
         :type location: str or list
         :param languages: the languages to restrict the keywords to, None to check all
         :type languages: list
+        :param regexp_backend: the engine for the regular expressions, see REGEXP_BACKENDS
+        :type regexp_backend: str
+        :param time_budget: the maximum time in seconds for matching a record, no limit if <= 0
+        :type time_budget: float
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -44,7 +49,11 @@ class RemovePatterns(Filter):
         self.expr_remove = expr_remove
         self.location = location
         self.languages = languages
+        self.regexp_backend = regexp_backend
+        self.time_budget = time_budget
+        self._budget = None
         self.affected = 0
+        self._patterns = None
 
     def name(self) -> str:
         """
@@ -102,6 +111,7 @@ class RemovePatterns(Filter):
         parser.add_argument("-r", "--expr_remove", type=str, default=None, help="Regular expressions for removing sub-strings from the text (gets applied before skipping empty lines); uses re.sub(...).", nargs="*")
         add_location_argument(parser, "Where to remove the patterns")
         parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
+        add_regexp_arguments(parser)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -115,6 +125,8 @@ class RemovePatterns(Filter):
         self.expr_remove = ns.expr_remove
         self.location = ns.location
         self.languages = ns.language
+        self.regexp_backend = ns.regexp_backend
+        self.time_budget = ns.time_budget
 
     def initialize(self):
         """
@@ -125,7 +137,11 @@ class RemovePatterns(Filter):
             self.languages = [x.lower() for x in self.languages]
         if isinstance(self.location, str):
             self.location = [self.location]
+        if (self.expr_remove is None) or (len(self.expr_remove) == 0):
+            raise Exception("No regular expressions defined to remove sub-strings!")
+        self._patterns = PatternSet(self.expr_remove, backend=self.regexp_backend, logger=self.logger())
         self.affected = 0
+        self._budget = MatchBudget(self.time_budget, self.logger())
 
     def _remove_patterns(self, line: str) -> Tuple[str, int]:
         """
@@ -136,8 +152,7 @@ class RemovePatterns(Filter):
         :return: the processed lines
         :rtype: list
         """
-        result, affected = remove_patterns(line.split("\n"), self.expr_remove)
-        return "\n".join(result), affected
+        return self._patterns.sub_text(line)
 
     def _process(self, data) -> int:
         """
@@ -189,7 +204,9 @@ class RemovePatterns(Filter):
         :return: the potentially updated record or None if to drop
         """
         result = copy.deepcopy(data)
-        affected = self._process(result)
+        finished, affected = self._budget.run(lambda: self._process(result), data)
+        if not finished:
+            return None
         self.affected += affected
 
         self.logger().debug("affected # lines: %d" % affected)
@@ -202,3 +219,5 @@ class RemovePatterns(Filter):
         """
         super().finalize()
         self.logger().info("total # lines affected: %d" % self.affected)
+        if self._budget is not None:
+            self._budget.report()
@@ -10,7 +10,7 @@ from ldc.api.pretrain import PretrainData
 from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
-from ldc.text_utils import replace_patterns
+from ldc.pattern_utils import PatternSet, MatchBudget, add_regexp_arguments, REGEXP_BACKEND_RE
 from ldc.api import Filter
 
 
@@ -21,6 +21,7 @@ class ReplacePatterns(Filter):
 
     def __init__(self, find: List[str] = None, replace: List[str] = None,
                  location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
+                 regexp_backend: str = REGEXP_BACKEND_RE, time_budget: float = 0.0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -33,6 +34,10 @@ class ReplacePatterns(Filter):
         :type location: str or list
         :param languages: the languages to restrict the keywords to, None to check all
         :type languages: list
+        :param regexp_backend: the engine for the regular expressions, see REGEXP_BACKENDS
+        :type regexp_backend: str
+        :param time_budget: the maximum time in seconds for matching a record, no limit if <= 0
+        :type time_budget: float
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -47,7 +52,11 @@ class ReplacePatterns(Filter):
         self.replace = replace
         self.location = location
         self.languages = languages
+        self.regexp_backend = regexp_backend
+        self.time_budget = time_budget
+        self._budget = None
         self.affected = 0
+        self._patterns = None
 
     def name(self) -> str:
         """
@@ -106,6 +115,7 @@ class ReplacePatterns(Filter):
         parser.add_argument("-r", "--replace", type=str, default=None, help="The corresponding replacement strings.", nargs="*")
         add_location_argument(parser, "Where to replace the patterns")
         parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
+        add_regexp_arguments(parser)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -120,6 +130,8 @@ class ReplacePatterns(Filter):
         self.replace = ns.replace
         self.location = ns.location
         self.languages = ns.language
+        self.regexp_backend = ns.regexp_backend
+        self.time_budget = ns.time_budget
 
     def initialize(self):
         """
@@ -136,7 +148,9 @@ class ReplacePatterns(Filter):
             raise Exception("No replacement strings defined!")
         if len(self.find) != len(self.replace):
             raise Exception("Number of regexp to find strings and replacement strings differ: %d != %d" % (len(self.find), len(self.replace)))
+        self._patterns = PatternSet(self.find, self.replace, backend=self.regexp_backend, logger=self.logger())
         self.affected = 0
+        self._budget = MatchBudget(self.time_budget, self.logger())
 
     def _replace_patterns(self, line: str) -> Tuple[str, int]:
         """
@@ -147,8 +161,7 @@ class ReplacePatterns(Filter):
         :return: the processed lines
         :rtype: list
         """
-        result, affected = replace_patterns(line.split("\n"), self.find, self.replace)
-        return "\n".join(result), affected
+        return self._patterns.sub_text(line)
 
     def _process(self, data) -> int:
         """
@@ -200,7 +213,9 @@ class ReplacePatterns(Filter):
         :return: the potentially updated record or None if to drop
         """
         result = copy.deepcopy(data)
-        affected = self._process(result)
+        finished, affected = self._budget.run(lambda: self._process(result), data)
+        if not finished:
+            return None
         self.affected += affected
 
         self.logger().debug("affected # lines: %d" % affected)
@@ -213,3 +228,5 @@ class ReplacePatterns(Filter):
         """
         super().finalize()
         self.logger().info("total # lines affected: %d" % self.affected)
+        if self._budget is not None:
+            self._budget.report()
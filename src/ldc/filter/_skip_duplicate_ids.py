@@ -1,3 +1,4 @@
+import argparse
 from typing import List
 
 from wai.logging import LOGGING_WARNING
@@ -7,24 +8,30 @@ from ldc.api.pretrain import PretrainData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
 from ldc.api import Filter
+from ldc.hash_utils import DigestIndex, text_digest
 
 
 class SkipDuplicateIDs(Filter):
     """
     Suppresses records with IDs that have already passed through.
+    With an index, the digests of the IDs get stored in a SQLite database, persisting them across runs.
     """
 
-    def __init__(self, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+    def __init__(self, index: str = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
 
+        :param index: the SQLite database to store the IDs in across runs, None for in-memory
+        :type index: str
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.index = index
         self._ids = set()
+        self._index = None
         self._num_ids_skipped = 0
 
     def name(self) -> str:
@@ -43,7 +50,19 @@ class SkipDuplicateIDs(Filter):
         :return: the description
         :rtype: str
         """
-        return "Suppresses records with IDs that have already passed through. Uses the 'id' value from the meta-data."
+        return "Suppresses records with IDs that have already passed through. Uses the 'id' value from the meta-data. " \
+               "With an index, the digests of the IDs get stored in a SQLite database, which allows " \
+               "deduplicating against the data of previous runs."
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
 
     def domains(self) -> List[str]:
         """
@@ -72,12 +91,35 @@ class SkipDuplicateIDs(Filter):
         """
         return [PairData, PretrainData, TranslationData]
 
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("--index", metavar="FILE", type=str, default=None, help="The SQLite database to store the IDs in, for deduplicating across runs; gets created if necessary", required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.index = ns.index
+
     def initialize(self):
         """
         Initializes the processing, e.g., for opening files or databases.
         """
         super().initialize()
         self._ids = set()
+        if self.index is not None:
+            self._index = DigestIndex(self.index, logger=self.logger())
         self._num_ids_skipped = 0
 
     def _do_process(self, data):
@@ -96,6 +138,12 @@ class SkipDuplicateIDs(Filter):
             id_ = meta["id"]
 
         # already passed through?
+        if self._index is not None:
+            # the representation keeps IDs of different types apart, like the set does
+            if not self._index.add(text_digest(repr(id_))):
+                self._num_ids_skipped += 1
+                return None
+            return data
         if id_ in self._ids:
             self._num_ids_skipped += 1
             return None
@@ -108,3 +156,6 @@ class SkipDuplicateIDs(Filter):
         Finishes the reading, e.g., for closing files or databases.
         """
         self.logger().info("# duplicate IDs skipped: %d" % self._num_ids_skipped)
+        if self._index is not None:
+            self._index.close()
+            self._index = None
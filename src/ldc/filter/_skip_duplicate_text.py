@@ -9,16 +9,20 @@ from ldc.api.pretrain import PretrainData
 from ldc.api.supervised.classification import ClassificationData
 from ldc.api.supervised.pairs import PairData
 from ldc.api.translation import TranslationData
-from ldc.api import Filter
+from ldc.api import Filter, parse_size
+from ldc.hash_utils import DigestSet, DigestIndex, text_digest, DIGEST_BITS, DEFAULT_DIGEST_BITS
 
 
 class SkipDuplicateText(Filter):
     """
     Suppresses records with text that has already passed through.
+    Only the digests of the (lower case) texts are kept in memory, optionally spilling to disk.
+    With an index, the digests get stored in a SQLite database instead, persisting them across runs.
     """
 
     def __init__(self, location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
-                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 digest_bits: int = DEFAULT_DIGEST_BITS, max_memory: int = 0, spill_dir: str = None,
+                 index: str = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
 
@@ -26,6 +30,14 @@ class SkipDuplicateText(Filter):
         :type location: str or list
         :param languages: the languages to restrict the keywords to, None to check all
         :type languages: list
+        :param digest_bits: the size of the digests to store for the texts (64 or 128 bits)
+        :type digest_bits: int
+        :param max_memory: the maximum number of bytes to use for storing digests in memory before spilling them to disk, <= 0 for no limit
+        :type max_memory: int
+        :param spill_dir: the directory to spill the digests to, None for the system's temp directory
+        :type spill_dir: str
+        :param index: the SQLite database to store the digests in across runs, None for in-memory
+        :type index: str
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -36,7 +48,11 @@ class SkipDuplicateText(Filter):
             raise Exception("Invalid location: %s" % location)
         self.location = location
         self.languages = languages
-        self._texts = set()
+        self.digest_bits = digest_bits
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.index = index
+        self._digests = None
         self._num_texts_skipped = 0
 
     def name(self) -> str:
@@ -55,7 +71,21 @@ class SkipDuplicateText(Filter):
         :return: the description
         :rtype: str
         """
-        return "Suppresses records with text that has already passed through."
+        return "Suppresses records with text that has already passed through. " \
+               "Only fixed-size digests of the lower case texts get stored, which can be spilled to disk " \
+               "when exceeding the specified amount of memory. " \
+               "With an index, the digests get stored in a SQLite database instead, which allows " \
+               "deduplicating against the data of previous runs."
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
 
     def domains(self) -> List[str]:
         """
@@ -94,6 +124,10 @@ class SkipDuplicateText(Filter):
         parser = super()._create_argparser()
         add_location_argument(parser, "Which portion to take into account for detecting duplicate text")
         parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
+        parser.add_argument("--digest_bits", type=int, choices=DIGEST_BITS, default=DEFAULT_DIGEST_BITS, help="The size of the digests that get stored for the texts; larger digests reduce the chance of collisions with very large datasets", required=False)
+        parser.add_argument("--max_memory", metavar="SIZE", type=parse_size, default=0, help="The maximum amount of memory to use for the digests before spilling them to disk; supports K/M/G suffixes; <= 0 for no limit", required=False)
+        parser.add_argument("--spill_dir", metavar="DIR", type=str, default=None, help="The directory to spill the digests to; uses the system's temp directory if not specified", required=False)
+        parser.add_argument("--index", metavar="FILE", type=str, default=None, help="The SQLite database to store the digests in, for deduplicating across runs; gets created if necessary; the digest size must match the one used for creating it", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -106,6 +140,10 @@ class SkipDuplicateText(Filter):
         super()._apply_args(ns)
         self.location = ns.location
         self.languages = ns.language
+        self.digest_bits = ns.digest_bits
+        self.max_memory = ns.max_memory
+        self.spill_dir = ns.spill_dir
+        self.index = ns.index
 
     def initialize(self):
         """
@@ -116,7 +154,10 @@ class SkipDuplicateText(Filter):
             self.languages = [x.lower() for x in self.languages]
         if isinstance(self.location, str):
             self.location = [self.location]
-        self._texts = set()
+        if self.index is not None:
+            self._digests = DigestIndex(self.index, bits=self.digest_bits, logger=self.logger())
+        else:
+            self._digests = DigestSet(bits=self.digest_bits, max_memory=self.max_memory, spill_dir=self.spill_dir, logger=self.logger())
         self._num_texts_skipped = 0
 
     def _get_texts(self, data) -> List[str]:
@@ -163,17 +204,16 @@ class SkipDuplicateText(Filter):
         """
         result = data
 
-        texts = self._get_texts(data)
-
-        # already passed through?
-        for t in texts:
-            if t in self._texts:
+        # already passed through? (identical texts within the record don't count)
+        present = dict()
+        for t in self._get_texts(data):
+            d = text_digest(t, self.digest_bits)
+            if d not in present:
+                present[d] = not self._digests.add(d)
+            if present[d]:
                 self._num_texts_skipped += 1
                 result = None
 
-        for t in texts:
-            self._texts.add(t)
-
         return result
 
     def finalize(self):
@@ -181,3 +221,6 @@ class SkipDuplicateText(Filter):
         Finishes the reading, e.g., for closing files or databases.
         """
         self.logger().info("# duplicate texts skipped: %d" % self._num_texts_skipped)
+        if self._digests is not None:
+            self._digests.close()
+            self._digests = None
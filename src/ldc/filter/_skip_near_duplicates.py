@@ -0,0 +1,267 @@
+import argparse
+import copy
+from typing import List, Union
+
+from wai.logging import LOGGING_WARNING
+from ldc.core import DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION
+from ldc.core import LOCATION_ANY, LOCATION_INSTRUCTION, LOCATION_INPUT, LOCATION_OUTPUT, LOCATION_CONTENT, \
+    LOCATION_TEXT, LOCATIONS, locations_match, add_location_argument
+from ldc.api.pretrain import PretrainData
+from ldc.api.supervised.classification import ClassificationData
+from ldc.api.supervised.pairs import PairData
+from ldc.api.translation import TranslationData
+from ldc.api import Filter
+from ldc.hash_utils import MinHasher, LSHIndex, lsh_params, DEFAULT_NUM_PERM, DEFAULT_SHINGLE_SIZE, DEFAULT_THRESHOLD
+
+NEAR_DUPLICATE_ACTION_DISCARD = "discard"
+NEAR_DUPLICATE_ACTION_TAG = "tag"
+NEAR_DUPLICATE_ACTIONS = [
+    NEAR_DUPLICATE_ACTION_DISCARD,
+    NEAR_DUPLICATE_ACTION_TAG,
+]
+
+DEFAULT_METADATA_KEY = "near_duplicate"
+
+
+class SkipNearDuplicates(Filter):
+    """
+    Suppresses (or tags) records with text that is similar to text that has already passed through,
+    using MinHash signatures of word shingles and locality sensitive hashing.
+    """
+
+    def __init__(self, location: Union[str, List[str]] = LOCATION_ANY, languages: List[str] = None,
+                 threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM, bands: int = 0,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1, action: str = NEAR_DUPLICATE_ACTION_DISCARD,
+                 metadata_key: str = DEFAULT_METADATA_KEY, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param location: in which part of the data to look for the text
+        :type location: str or list
+        :param languages: the languages to restrict the check to, None to check all
+        :type languages: list
+        :param threshold: the minimum (estimated) Jaccard similarity for a record to be considered a near-duplicate
+        :type threshold: float
+        :param num_perm: the number of hash functions for the MinHash signatures
+        :type num_perm: int
+        :param bands: the number of LSH bands, <= 0 to determine them based on the threshold
+        :type bands: int
+        :param shingle_size: the number of words per shingle
+        :type shingle_size: int
+        :param seed: the seed for generating the hash functions
+        :type seed: int
+        :param action: how to handle near-duplicates
+        :type action: str
+        :param metadata_key: the meta-data key to store the similarity under when tagging
+        :type metadata_key: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        if location not in LOCATIONS:
+            raise Exception("Invalid location: %s" % location)
+        if action not in NEAR_DUPLICATE_ACTIONS:
+            raise Exception("Invalid action: %s" % action)
+        self.location = location
+        self.languages = languages
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.action = action
+        self.metadata_key = metadata_key
+        self._hasher = None
+        self._index = None
+        self._num_near_duplicates = 0
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "skip-near-duplicates"
+
+    def description(self) -> str:
+        """
+        Returns a description of the handler.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Suppresses records with text that is similar to text that has already passed through, " \
+               "based on the Jaccard similarity of word shingles estimated via MinHash signatures and " \
+               "located via locality sensitive hashing (LSH). Near-duplicates can be discarded or tagged " \
+               "with their estimated similarity in the meta-data. Search is performed in lower-case, " \
+               "the texts of the selected locations get combined. The LSH bands get chosen to favour recall, " \
+               "pairs close to the threshold can still be missed due to the estimated similarity being too low " \
+               "(e.g., one-word edits of 60-word texts, Jaccard of ~0.84: ~90% detected with 128 hash " \
+               "functions, ~99% with 512)."
+
+    def is_stateful(self) -> bool:
+        """
+        Returns whether the filter keeps state across records (e.g., for detecting duplicates or counting),
+        i.e., whether it needs to see all the records and cannot be run in multiple processes.
+
+        :return: True if stateful
+        :rtype: bool
+        """
+        return True
+
+    def domains(self) -> List[str]:
+        """
+        Returns the domains of the handler.
+
+        :return: the domains
+        :rtype: list
+        """
+        return [DOMAIN_PAIRS, DOMAIN_PRETRAIN, DOMAIN_TRANSLATION, DOMAIN_CLASSIFICATION]
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [PairData, PretrainData, TranslationData, ClassificationData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        add_location_argument(parser, "Which portion to take into account for detecting near-duplicate text")
+        parser.add_argument("-g", "--language", type=str, help="The languages to inspect; inspects all if not specified", required=False, nargs="*")
+        parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help="The minimum (estimated) Jaccard similarity (0-1) for a record to be considered a near-duplicate", required=False)
+        parser.add_argument("-p", "--num_perm", metavar="NUM", type=int, default=DEFAULT_NUM_PERM, help="The number of hash functions to use for the MinHash signatures; more functions give more accurate similarity estimates (i.e., better recall close to the threshold) at the expense of speed", required=False)
+        parser.add_argument("-b", "--bands", metavar="NUM", type=int, default=0, help="The number of LSH bands to split the signatures into; determined based on the threshold if <= 0", required=False)
+        parser.add_argument("-s", "--shingle_size", metavar="NUM", type=int, default=DEFAULT_SHINGLE_SIZE, help="The number of words per shingle", required=False)
+        parser.add_argument("--seed", type=int, default=1, help="The seed for generating the hash functions", required=False)
+        parser.add_argument("-a", "--action", choices=NEAR_DUPLICATE_ACTIONS, default=NEAR_DUPLICATE_ACTION_DISCARD, help="How to handle near-duplicates", required=False)
+        parser.add_argument("-k", "--metadata_key", metavar="KEY", type=str, default=DEFAULT_METADATA_KEY, help="The meta-data key to store the estimated similarity under when tagging near-duplicates", required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.location = ns.location
+        self.languages = ns.language
+        self.threshold = ns.threshold
+        self.num_perm = ns.num_perm
+        self.bands = ns.bands
+        self.shingle_size = ns.shingle_size
+        self.seed = ns.seed
+        self.action = ns.action
+        self.metadata_key = ns.metadata_key
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if (self.threshold < 0) or (self.threshold > 1):
+            raise Exception("Threshold must be between 0 and 1: %f" % self.threshold)
+        if self.languages is not None:
+            self.languages = [x.lower() for x in self.languages]
+        if isinstance(self.location, str):
+            self.location = [self.location]
+        bands = self.bands
+        if bands <= 0:
+            bands, rows = lsh_params(self.threshold, self.num_perm)
+            self.logger().info("Using %d bands with %d rows for threshold %f" % (bands, rows, self.threshold))
+        self._hasher = MinHasher(num_perm=self.num_perm, shingle_size=self.shingle_size, seed=self.seed)
+        self._index = LSHIndex(self.num_perm, bands)
+        self._num_near_duplicates = 0
+
+    def _get_texts(self, data) -> List[str]:
+        """
+        Turns the record into list of texts.
+
+        :return: the compiled list of texts (lower case)
+        :rtype: list
+        """
+        words = list()
+
+        if isinstance(data, PairData):
+            if locations_match(self.location, LOCATION_INSTRUCTION):
+                words.append(data.instruction.lower())
+            if locations_match(self.location, LOCATION_INPUT):
+                words.append(data.input.lower())
+            if locations_match(self.location, LOCATION_OUTPUT):
+                words.append(data.output.lower())
+        elif isinstance(data, ClassificationData):
+            if locations_match(self.location, LOCATION_TEXT):
+                words.append(data.text.lower())
+        elif isinstance(data, PretrainData):
+            if locations_match(self.location, LOCATION_CONTENT):
+                words.append(data.content.lower())
+        elif isinstance(data, TranslationData):
+            if self.languages is None:
+                for k in data.translations:
+                    words.append(data.translations[k].lower())
+            else:
+                for lang in self.languages:
+                    if lang in data.translations:
+                        words.append(data.translations[lang].lower())
+        else:
+            raise Exception("Unhandled data type: %s" % str(type(data)))
+
+        return words
+
+    def _do_process(self, data):
+        """
+        Processes the data record.
+
+        :param data: the record to process
+        :return: the potentially updated record or None if to drop
+        """
+        signature = self._hasher.signature("\n".join(self._get_texts(data)))
+        if signature is None:
+            return data
+
+        index, similarity = self._index.query(signature, self.threshold)
+        if index < 0:
+            self._index.insert(signature)
+            return data
+
+        self._num_near_duplicates += 1
+        if self.action == NEAR_DUPLICATE_ACTION_DISCARD:
+            return None
+        result = copy.deepcopy(data)
+        if not result.has_metadata():
+            meta = dict()
+        else:
+            meta = result.get_metadata()
+        meta[self.metadata_key] = similarity
+        result.set_metadata(meta)
+        return result
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        self.logger().info("# near-duplicates: %d" % self._num_near_duplicates)
+        self._hasher = None
+        self._index = None
@@ -0,0 +1,792 @@
+import bisect
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zlib
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DIGEST_BITS = [64, 128]
+""" the supported digest sizes in bits. """
+
+DEFAULT_DIGEST_BITS = 64
+
+INITIAL_CAPACITY = 1 << 16
+""" the initial number of slots in the hash table of a DigestSet. """
+
+MAX_RUNS = 16
+""" the number of spilled runs after which they get merged into a single one. """
+
+RUN_INDEX_STEP = 512
+""" every n-th digest of a spilled run is kept in memory for locating the block to search. """
+
+_MASK64 = (1 << 64) - 1
+
+
+def text_digest(text: str, bits: int = DEFAULT_DIGEST_BITS) -> int:
+    """
+    Computes the blake2b digest of the (UTF-8 encoded) text.
+
+    :param text: the text to hash
+    :type text: str
+    :param bits: the size of the digest in bits, see DIGEST_BITS
+    :type bits: int
+    :return: the digest
+    :rtype: int
+    """
+    if bits not in DIGEST_BITS:
+        raise Exception("Unsupported number of digest bits: %d" % bits)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=bits // 8).digest(), "big")
+
+
+class _DigestRun(object):
+    """
+    A sorted run of digests that got spilled to disk. Lookups use a sparse in-memory index
+    to locate the block, which then gets searched via the memory-mapped file.
+    """
+
+    def __init__(self, path: str, digest_bytes: int):
+        """
+        Opens the run.
+
+        :param path: the file with the sorted digests (big-endian)
+        :type path: str
+        :param digest_bytes: the number of bytes per digest
+        :type digest_bytes: int
+        """
+        self.path = path
+        self.digest_bytes = digest_bytes
+        self.size = os.path.getsize(path) // digest_bytes
+        self._fp = open(path, "rb")
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = [self._mm[i * digest_bytes:(i + 1) * digest_bytes] for i in range(0, self.size, RUN_INDEX_STEP)]
+
+    def __contains__(self, key: bytes) -> bool:
+        """
+        Checks whether the digest is present.
+
+        :param key: the digest to look for (big-endian)
+        :type key: bytes
+        :return: whether present
+        :rtype: bool
+        """
+        block = bisect.bisect_right(self._index, key) - 1
+        if block < 0:
+            return False
+        n = self.digest_bytes
+        lo = block * RUN_INDEX_STEP
+        hi = min(lo + RUN_INDEX_STEP, self.size)
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = mm[mid * n:(mid + 1) * n]
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __iter__(self) -> Iterator[bytes]:
+        """
+        Returns the digests in sorted order.
+
+        :return: the digests (big-endian)
+        :rtype: Iterator
+        """
+        n = self.digest_bytes
+        chunk = n * 65536
+        with open(self.path, "rb") as fp:
+            while True:
+                data = fp.read(chunk)
+                if len(data) == 0:
+                    break
+                for i in range(0, len(data), n):
+                    yield data[i:i + n]
+
+    def close(self):
+        """
+        Closes the run.
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._fp.close()
+            self._fp = None
+
+
+class DigestSet(object):
+    """
+    Memory-efficient set of fixed-size digests (see text_digest), stored in an open-addressing
+    hash table backed by arrays of unsigned 64bit integers rather than Python objects.
+    With a memory limit, the table gets sorted and spilled to disk once the limit is reached,
+    with lookups also checking the spilled runs. The spilled runs get removed when closing the set.
+    """
+
+    def __init__(self, bits: int = DEFAULT_DIGEST_BITS, max_memory: int = 0, spill_dir: str = None,
+                 logger: logging.Logger = None):
+        """
+        Initializes the set.
+
+        :param bits: the size of the digests in bits, see DIGEST_BITS
+        :type bits: int
+        :param max_memory: the maximum number of bytes to use for the in-memory hash table before spilling to disk, <= 0 for no limit
+        :type max_memory: int
+        :param spill_dir: the directory to create the spill directory in, None for the system's temp directory
+        :type spill_dir: str
+        :param logger: the optional logger to use
+        :type logger: logging.Logger
+        """
+        if bits not in DIGEST_BITS:
+            raise Exception("Unsupported number of digest bits: %d" % bits)
+        self.bits = bits
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.logger = logger
+        self._wide = (bits > 64)
+        self._runs = []
+        self._tmp_dir = None
+        self._num_spilled = 0
+        self._reset(INITIAL_CAPACITY)
+
+    def _reset(self, capacity: int):
+        """
+        Replaces the hash table with an empty one.
+
+        :param capacity: the number of slots (power of 2)
+        :type capacity: int
+        """
+        self._capacity = capacity
+        self._mask = capacity - 1
+        self._count = 0
+        self._high = array("Q", bytes(8 * capacity))
+        self._low = array("Q", bytes(8 * capacity)) if self._wide else None
+
+    def _table_bytes(self, capacity: int) -> int:
+        """
+        Returns the memory required by a hash table with the specified number of slots.
+
+        :param capacity: the number of slots
+        :type capacity: int
+        :return: the number of bytes
+        :rtype: int
+        """
+        return capacity * (16 if self._wide else 8)
+
+    def _split(self, digest: int):
+        """
+        Splits the digest into high and low 64bit words. The high word is never 0, as 0 marks empty slots.
+
+        :param digest: the digest to split
+        :type digest: int
+        :return: the tuple of high and low word
+        :rtype: tuple
+        """
+        if self._wide:
+            high = (digest >> 64) & _MASK64
+            low = digest & _MASK64
+        else:
+            high = digest & _MASK64
+            low = 0
+        if high == 0:
+            high = 1
+        return high, low
+
+    def _slot(self, high: int, low: int) -> int:
+        """
+        Locates the slot of the digest in the hash table (linear probing).
+
+        :param high: the high word
+        :type high: int
+        :param low: the low word
+        :type low: int
+        :return: the slot, negative (-slot - 1) if not present, pointing to the empty slot to use
+        :rtype: int
+        """
+        table_high = self._high
+        table_low = self._low
+        mask = self._mask
+        i = high & mask
+        while True:
+            value = table_high[i]
+            if value == 0:
+                return -i - 1
+            if (value == high) and ((table_low is None) or (table_low[i] == low)):
+                return i
+            i = (i + 1) & mask
+
+    def _key(self, high: int, low: int) -> bytes:
+        """
+        Returns the digest in the format used by the spilled runs.
+
+        :param high: the high word
+        :type high: int
+        :param low: the low word
+        :type low: int
+        :return: the big-endian bytes
+        :rtype: bytes
+        """
+        if self._wide:
+            return high.to_bytes(8, "big") + low.to_bytes(8, "big")
+        return high.to_bytes(8, "big")
+
+    def _in_runs(self, high: int, low: int) -> bool:
+        """
+        Checks whether the digest is present in one of the spilled runs.
+
+        :param high: the high word
+        :type high: int
+        :param low: the low word
+        :type low: int
+        :return: whether present
+        :rtype: bool
+        """
+        if len(self._runs) == 0:
+            return False
+        key = self._key(high, low)
+        for run in self._runs:
+            if key in run:
+                return True
+        return False
+
+    def _sorted_table(self) -> bytes:
+        """
+        Returns the digests of the hash table, sorted and in the format of the spilled runs.
+
+        :return: the digests
+        :rtype: bytes
+        """
+        high = np.frombuffer(self._high, dtype=np.uint64)
+        used = high != 0
+        high = high[used]
+        if self._wide:
+            low = np.frombuffer(self._low, dtype=np.uint64)[used]
+            order = np.lexsort((low, high))
+            values = np.empty((len(order), 2), dtype=">u8")
+            values[:, 0] = high[order]
+            values[:, 1] = low[order]
+        else:
+            values = np.sort(high).astype(">u8")
+        return values.tobytes()
+
+    def _new_run_path(self) -> str:
+        """
+        Returns the filename for the next run.
+
+        :return: the filename
+        :rtype: str
+        """
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="ldc-digests-", dir=self.spill_dir)
+        self._num_spilled += 1
+        return os.path.join(self._tmp_dir, "run-%06d.bin" % self._num_spilled)
+
+    def _spill(self):
+        """
+        Writes the hash table as sorted run to disk and empties it.
+        """
+        path = self._new_run_path()
+        if self.logger is not None:
+            self.logger.info("Spilling %d digests to: %s" % (self._count, path))
+        with open(path, "wb") as fp:
+            fp.write(self._sorted_table())
+        self._runs.append(_DigestRun(path, self.bits // 8))
+        self._reset(self._capacity)
+        if len(self._runs) >= MAX_RUNS:
+            self._merge_runs()
+
+    def _merge_runs(self):
+        """
+        Merges all spilled runs into a single one.
+        """
+        path = self._new_run_path()
+        if self.logger is not None:
+            self.logger.info("Merging %d runs into: %s" % (len(self._runs), path))
+        with open(path, "wb") as fp:
+            buffer = []
+            for key in heapq.merge(*self._runs):
+                buffer.append(key)
+                if len(buffer) >= 65536:
+                    fp.write(b"".join(buffer))
+                    buffer = []
+            fp.write(b"".join(buffer))
+        for run in self._runs:
+            run.close()
+            os.remove(run.path)
+        self._runs = [_DigestRun(path, self.bits // 8)]
+
+    def _grow(self):
+        """
+        Doubles the size of the hash table or spills it to disk if that would exceed the memory limit.
+        """
+        capacity = self._capacity * 2
+        if (self.max_memory > 0) and (self._table_bytes(capacity) > self.max_memory):
+            self._spill()
+            return
+        old_high = self._high
+        old_low = self._low
+        count = self._count
+        self._reset(capacity)
+        if old_low is None:
+            for high in old_high:
+                if high != 0:
+                    self._high[-self._slot(high, 0) - 1] = high
+        else:
+            for high, low in zip(old_high, old_low):
+                if high != 0:
+                    slot = -self._slot(high, low) - 1
+                    self._high[slot] = high
+                    self._low[slot] = low
+        self._count = count
+
+    def add(self, digest: int) -> bool:
+        """
+        Adds the digest to the set.
+
+        :param digest: the digest to add
+        :type digest: int
+        :return: True if added, False if already present
+        :rtype: bool
+        """
+        high, low = self._split(digest)
+        # inlined version of _slot
+        table_high = self._high
+        table_low = self._low
+        mask = self._mask
+        i = high & mask
+        while True:
+            value = table_high[i]
+            if value == 0:
+                break
+            if (value == high) and ((table_low is None) or (table_low[i] == low)):
+                return False
+            i = (i + 1) & mask
+        if self._runs and self._in_runs(high, low):
+            return False
+        table_high[i] = high
+        if table_low is not None:
+            table_low[i] = low
+        self._count += 1
+        if self._count * 2 > self._capacity:
+            self._grow()
+        return True
+
+    def __contains__(self, digest: int) -> bool:
+        """
+        Checks whether the digest is present.
+
+        :param digest: the digest to look for
+        :type digest: int
+        :return: whether present
+        :rtype: bool
+        """
+        high, low = self._split(digest)
+        if self._slot(high, low) >= 0:
+            return True
+        return self._in_runs(high, low)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of digests in the set.
+
+        :return: the number of digests
+        :rtype: int
+        """
+        return self._count + sum(run.size for run in self._runs)
+
+    @property
+    def num_runs(self) -> int:
+        """
+        Returns the number of runs that are currently spilled to disk.
+
+        :return: the number of runs
+        :rtype: int
+        """
+        return len(self._runs)
+
+    def close(self):
+        """
+        Releases the memory and removes any spilled runs from disk.
+        """
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._reset(INITIAL_CAPACITY)
+
+
+DEFAULT_COMMIT_INTERVAL = 10000
+""" the number of additions after which a DigestIndex commits the changes. """
+
+
+class DigestIndex(object):
+    """
+    Persistent set of fixed-size digests (see text_digest), stored in a SQLite database.
+    Allows deduplicating against the data of previous runs. New digests get committed in
+    batches and when closing the index.
+    """
+
+    def __init__(self, path: str, bits: int = DEFAULT_DIGEST_BITS, commit_interval: int = DEFAULT_COMMIT_INTERVAL,
+                 logger: logging.Logger = None):
+        """
+        Opens the index, creating the database if necessary.
+
+        :param path: the SQLite database to use
+        :type path: str
+        :param bits: the size of the digests in bits, see DIGEST_BITS; must match the one of an existing index
+        :type bits: int
+        :param commit_interval: the number of additions after which to commit
+        :type commit_interval: int
+        :param logger: the optional logger to use
+        :type logger: logging.Logger
+        """
+        if bits not in DIGEST_BITS:
+            raise Exception("Unsupported number of digest bits: %d" % bits)
+        self.path = path
+        self.bits = bits
+        self.commit_interval = commit_interval
+        self.logger = logger
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS digests (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        row = self._conn.execute("SELECT value FROM settings WHERE key = 'bits'").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO settings VALUES ('bits', ?)", (str(bits),))
+        elif int(row[0]) != bits:
+            self._conn.close()
+            self._conn = None
+            raise Exception("Index %s uses %s bit digests, but %d bits requested!" % (path, row[0], bits))
+        self._conn.commit()
+        if self.logger is not None:
+            self.logger.info("Using index: %s" % path)
+
+    def _key(self, digest: int) -> bytes:
+        """
+        Returns the digest in the format stored in the database.
+
+        :param digest: the digest to convert
+        :type digest: int
+        :return: the big-endian bytes
+        :rtype: bytes
+        """
+        return digest.to_bytes(self.bits // 8, "big")
+
+    def add(self, digest: int) -> bool:
+        """
+        Adds the digest to the index.
+
+        :param digest: the digest to add
+        :type digest: int
+        :return: True if added, False if already present
+        :rtype: bool
+        """
+        cursor = self._conn.execute("INSERT OR IGNORE INTO digests VALUES (?)", (self._key(digest),))
+        if cursor.rowcount < 1:
+            return False
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_interval:
+            self.commit()
+        return True
+
+    def __contains__(self, digest: int) -> bool:
+        """
+        Checks whether the digest is present.
+
+        :param digest: the digest to look for
+        :type digest: int
+        :return: whether present
+        :rtype: bool
+        """
+        return self._conn.execute("SELECT 1 FROM digests WHERE digest = ?", (self._key(digest),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        """
+        Returns the number of digests in the index (requires a full scan).
+
+        :return: the number of digests
+        :rtype: int
+        """
+        return self._conn.execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+
+    def commit(self):
+        """
+        Commits the added digests.
+        """
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        """
+        Commits the added digests and closes the database.
+        """
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+
+DEFAULT_NUM_BUCKETS = 256
+""" the default number of buckets for partitioning digests. """
+
+BUCKET_FILENAME_PATTERN = re.compile(r"bucket-([0-9]+)\.tsv$")
+""" for extracting the bucket index from the name of a bucket file. """
+
+
+def bucket_filename(index: int, prefix: str = None) -> str:
+    """
+    Generates the name of the file for the bucket.
+
+    :param index: the index of the bucket
+    :type index: int
+    :param prefix: the optional prefix, e.g., the name of the node
+    :type prefix: str
+    :return: the filename
+    :rtype: str
+    """
+    result = "bucket-%05d.tsv" % index
+    if (prefix is not None) and (len(prefix) > 0):
+        result = prefix + "-" + result
+    return result
+
+
+def bucket_index(path: str) -> Optional[int]:
+    """
+    Determines the index of the bucket from the name of the bucket file.
+
+    :param path: the bucket file
+    :type path: str
+    :return: the index, None if not a bucket file
+    :rtype: int
+    """
+    m = BUCKET_FILENAME_PATTERN.search(os.path.basename(path))
+    if m is None:
+        return None
+    return int(m.group(1))
+
+
+DEFAULT_NUM_PERM = 128
+""" the default number of hash functions to use for MinHash signatures. """
+
+DEFAULT_SHINGLE_SIZE = 5
+""" the default number of words per shingle. """
+
+DEFAULT_THRESHOLD = 0.8
+""" the default Jaccard similarity threshold for near-duplicates. """
+
+DEFAULT_FALSE_NEGATIVE_WEIGHT = 0.95
+""" the default weight of the false negatives when determining the LSH parameters (false positives: 1 - weight). """
+
+MINHASH_CHUNK_SIZE = 4096
+""" the number of shingles to hash at a time, limits the size of the intermediate matrix. """
+
+_SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def lsh_params(threshold: float, num_perm: int, false_negative_weight: float = DEFAULT_FALSE_NEGATIVE_WEIGHT) -> Tuple[int, int]:
+    """
+    Determines the number of bands and rows per band for LSH that minimize the weighted
+    probabilities of false positives and false negatives for the Jaccard threshold.
+    Since the candidates get checked against the threshold using their estimated similarity,
+    false positives only cost time and the default weights favour recall: with 128 hash functions
+    and a threshold of 0.8, a pair right at the threshold becomes a candidate with a probability
+    of about 95% (99% at 0.85).
+
+    :param threshold: the Jaccard similarity threshold (0-1)
+    :type threshold: float
+    :param num_perm: the number of hash functions in the signatures
+    :type num_perm: int
+    :param false_negative_weight: the weight of the false negatives (0-1), false positives use 1 - weight
+    :type false_negative_weight: float
+    :return: the tuple of bands and rows
+    :rtype: tuple
+    """
+    below = np.linspace(0.0, threshold, 100)
+    above = np.linspace(threshold, 1.0, 100)
+    best = None
+    best_error = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_pos = np.mean(1.0 - (1.0 - below ** rows) ** bands) * threshold
+        false_neg = np.mean((1.0 - above ** rows) ** bands) * (1.0 - threshold)
+        error = (1.0 - false_negative_weight) * false_pos + false_negative_weight * false_neg
+        if (best_error is None) or (error < best_error):
+            best = (bands, rows)
+            best_error = error
+    return best
+
+
+class MinHasher(object):
+    """
+    Computes MinHash signatures over the word shingles of texts. The words get hashed individually,
+    the shingles and the hash functions (multiply-shift hashing) are computed with numpy.
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1):
+        """
+        Initializes the hasher.
+
+        :param num_perm: the number of hash functions
+        :type num_perm: int
+        :param shingle_size: the number of words per shingle
+        :type shingle_size: int
+        :param seed: the seed for generating the hash functions
+        :type seed: int
+        """
+        if num_perm < 1:
+            raise Exception("Number of hash functions must be at least 1: %d" % num_perm)
+        if shingle_size < 1:
+            raise Exception("Shingle size must be at least 1: %d" % shingle_size)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        Computes the 32bit hashes of the word shingles of the text.
+
+        :param text: the text to process
+        :type text: str
+        :return: the hashes (uint64, can contain duplicates), empty if no words
+        :rtype: np.ndarray
+        """
+        hashes = np.fromiter(map(zlib.crc32, map(str.encode, text.split())), dtype=np.uint64)
+        if len(hashes) == 0:
+            return hashes
+        size = min(self.shingle_size, len(hashes))
+        count = len(hashes) - size + 1
+        result = hashes[:count].copy()
+        with np.errstate(over="ignore"):
+            for i in range(1, size):
+                result = result * _SHINGLE_MULTIPLIER + hashes[i:i + count]
+            result = (result * _SHINGLE_MULTIPLIER) >> np.uint64(32)
+        return result
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Computes the MinHash signature of the text.
+
+        :param text: the text to process
+        :type text: str
+        :return: the signature (uint32, num_perm values), None if the text has no words
+        :rtype: np.ndarray
+        """
+        shingles = self.shingles(text)
+        if len(shingles) == 0:
+            return None
+        result = None
+        with np.errstate(over="ignore"):
+            for i in range(0, len(shingles), MINHASH_CHUNK_SIZE):
+                hashes = self._a * shingles[None, i:i + MINHASH_CHUNK_SIZE]
+                hashes += self._b
+                mins = hashes.min(axis=1)
+                result = mins if (result is None) else np.minimum(result, mins)
+        # the upper 32 bits, shifting after taking the minimum gives the same result
+        return (result >> np.uint64(32)).astype(np.uint32)
+
+
+class LSHIndex(object):
+    """
+    Locality sensitive hashing (banding) of MinHash signatures for locating near-duplicates.
+    The signatures get stored as well, for estimating the similarity of the candidates.
+    """
+
+    def __init__(self, num_perm: int, bands: int):
+        """
+        Initializes the index.
+
+        :param num_perm: the number of hash functions in the signatures
+        :type num_perm: int
+        :param bands: the number of bands to split the signatures into
+        :type bands: int
+        """
+        if (bands < 1) or (bands > num_perm):
+            raise Exception("Number of bands must be between 1 and %d: %d" % (num_perm, bands))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._count = 0
+
+    def _keys(self, signature: np.ndarray) -> List[int]:
+        """
+        Generates the bucket keys of the signature, one per band.
+
+        :param signature: the signature to get the keys for
+        :type signature: np.ndarray
+        :return: the keys
+        :rtype: list
+        """
+        data = signature.tobytes()
+        n = self.rows * 4
+        return [hash(data[i * n:(i + 1) * n]) for i in range(self.bands)]
+
+    def query(self, signature: np.ndarray, threshold: float) -> Tuple[int, float]:
+        """
+        Locates the most similar signature among the ones sharing at least one band with the signature.
+
+        :param signature: the signature to look for
+        :type signature: np.ndarray
+        :param threshold: the minimum estimated Jaccard similarity
+        :type threshold: float
+        :return: the tuple of index of the stored signature (-1 if none) and estimated similarity
+        :rtype: tuple
+        """
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            if key in bucket:
+                candidates.update(bucket[key])
+        if len(candidates) == 0:
+            return -1, 0.0
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[candidates] == signature).sum(axis=1) / self.num_perm
+        best = int(np.argmax(similarity))
+        if similarity[best] < threshold:
+            return -1, float(similarity[best])
+        return int(candidates[best]), float(similarity[best])
+
+    def insert(self, signature: np.ndarray) -> int:
+        """
+        Adds the signature to the index.
+
+        :param signature: the signature to add
+        :type signature: np.ndarray
+        :return: the index of the stored signature
+        :rtype: int
+        """
+        if self._count == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        index = self._count
+        self._signatures[index] = signature
+        self._count += 1
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            if key in bucket:
+                bucket[key].append(index)
+            else:
+                bucket[key] = [index]
+        return index
+
+    def __len__(self) -> int:
+        """
+        Returns the number of signatures in the index.
+
+        :return: the number of signatures
+        :rtype: int
+        """
+        return self._count
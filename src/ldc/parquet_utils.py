@@ -0,0 +1,308 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+DEFAULT_BATCH_SIZE = 1024
+""" the default number of rows per record batch when reading Parquet files. """
+
+
+def select_columns(available: List[str], columns: List[Optional[str]]) -> List[str]:
+    """
+    Determines the unique columns to load, skipping None and unavailable columns.
+
+    :param available: the columns available in the file
+    :type available: list
+    :param columns: the columns of interest, can contain None and duplicates
+    :type columns: list
+    :return: the columns to load, in order of first appearance
+    :rtype: list
+    """
+    result = []
+    for c in columns:
+        if (c is not None) and (c in available) and (c not in result):
+            result.append(c)
+    return result
+
+
+def batch_to_rows(batch: Union[pa.RecordBatch, pa.Table]) -> Iterable[Dict]:
+    """
+    Turns the record batch into rows, converting each column only once.
+
+    :param batch: the batch to convert
+    :type batch: pa.RecordBatch or pa.Table
+    :return: the rows as dictionaries (column name -> python value)
+    :rtype: Iterable
+    """
+    names = batch.schema.names
+    values = [batch.column(i).to_pylist() for i in range(len(names))]
+    for row in zip(*values):
+        yield dict(zip(names, row))
+
+
+def iterate_rows(parquet_file: pq.ParquetFile, columns: List[Optional[str]],
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterable[Dict]:
+    """
+    Streams the rows of the Parquet file, only decoding the specified columns.
+    Columns that are not present in the file are silently skipped.
+
+    :param parquet_file: the file to read from
+    :type parquet_file: pq.ParquetFile
+    :param columns: the columns to load, can contain None and duplicates
+    :type columns: list
+    :param batch_size: the maximum number of rows per record batch
+    :type batch_size: int
+    :return: the rows as dictionaries (column name -> python value)
+    :rtype: Iterable
+    """
+    if batch_size < 1:
+        batch_size = DEFAULT_BATCH_SIZE
+    cols = select_columns(parquet_file.schema_arrow.names, columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=cols):
+        for row in batch_to_rows(batch):
+            yield row
+
+
+def _read_row_group(path: str, metadata: pq.FileMetaData, index: int, columns: List[str]) -> pa.Table:
+    """
+    Decodes a single row group, used by the worker threads of RowGroupLoader.
+
+    :param path: the Parquet file to read from
+    :type path: str
+    :param metadata: the already parsed meta-data of the file
+    :type metadata: pq.FileMetaData
+    :param index: the 0-based index of the row group
+    :type index: int
+    :param columns: the columns to decode
+    :type columns: list
+    :return: the decoded row group
+    :rtype: pa.Table
+    """
+    return pq.ParquetFile(path, metadata=metadata).read_row_group(index, columns=columns, use_threads=False)
+
+
+class RowGroupLoader(object):
+    """
+    Decodes the row groups of Parquet files concurrently using a thread pool (Arrow releases the GIL
+    while decoding). Row groups are decoded ahead of time, across file boundaries, but are always
+    returned in file/row group order.
+    """
+
+    def __init__(self, files: List[str], columns: List[Optional[str]], num_workers: int, max_pending: int = None):
+        """
+        Initializes the loader.
+
+        :param files: the Parquet files that will get read, in the order they will be requested
+        :type files: list
+        :param columns: the columns to load, can contain None and duplicates
+        :type columns: list
+        :param num_workers: the number of threads to use for decoding
+        :type num_workers: int
+        :param max_pending: the maximum number of row groups to decode ahead, uses 2 * num_workers if None
+        :type max_pending: int
+        """
+        if num_workers < 1:
+            raise Exception("At least one worker is required: %d" % num_workers)
+        if max_pending is None:
+            max_pending = 2 * num_workers
+        self._files = list(files)
+        self._columns = columns
+        self._max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=num_workers)
+        self._tasks = self._generate_tasks()
+        self._pending = deque()
+
+    def _generate_tasks(self):
+        """
+        Generates the decoding tasks, one per row group.
+        Files without row groups generate a single task without row group index.
+
+        :return: the generator of (file number, path, metadata, index, columns) tuples
+        """
+        for file_no, path in enumerate(self._files):
+            metadata = pq.read_metadata(path)
+            columns = select_columns(metadata.schema.to_arrow_schema().names, self._columns)
+            if metadata.num_row_groups == 0:
+                yield file_no, path, metadata, None, columns
+            for index in range(metadata.num_row_groups):
+                yield file_no, path, metadata, index, columns
+
+    def _fill(self):
+        """
+        Submits tasks to the thread pool until the maximum number of pending row groups is reached.
+        """
+        while len(self._pending) < self._max_pending:
+            task = next(self._tasks, None)
+            if task is None:
+                break
+            file_no, path, metadata, index, columns = task
+            if index is None:
+                future = None
+            else:
+                future = self._executor.submit(_read_row_group, path, metadata, index, columns)
+            self._pending.append((file_no, path, future))
+
+    def tables(self, path: str) -> Iterable[pa.Table]:
+        """
+        Returns the decoded row groups of the specified file.
+        Files must be requested in the same order as they were supplied to the loader.
+
+        :param path: the file to get the row groups for
+        :type path: str
+        :return: the row groups
+        :rtype: Iterable
+        """
+        self._fill()
+        if (len(self._pending) == 0) or (self._pending[0][1] != path):
+            raise Exception("File requested out of order: %s" % path)
+        file_no = self._pending[0][0]
+        while (len(self._pending) > 0) and (self._pending[0][0] == file_no):
+            _, _, future = self._pending.popleft()
+            self._fill()
+            if future is not None:
+                yield future.result()
+
+    def rows(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterable[Dict]:
+        """
+        Returns the rows of the specified file.
+        Files must be requested in the same order as they were supplied to the loader.
+
+        :param path: the file to get the rows for
+        :type path: str
+        :param batch_size: the maximum number of rows to convert at a time
+        :type batch_size: int
+        :return: the rows as dictionaries (column name -> python value)
+        :rtype: Iterable
+        """
+        if batch_size < 1:
+            batch_size = DEFAULT_BATCH_SIZE
+        for table in self.tables(path):
+            for batch in table.to_batches(max_chunksize=batch_size):
+                for row in batch_to_rows(batch):
+                    yield row
+
+    def close(self):
+        """
+        Stops the thread pool, cancelling any outstanding decoding tasks.
+        """
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+""" the default maximum number of records per row group when writing Parquet files. """
+
+DEFAULT_ROW_GROUP_BYTES = 64 * 1024 * 1024
+""" the default maximum (estimated) number of bytes per row group when writing Parquet files. """
+
+
+class BufferedParquetWriter(object):
+    """
+    Buffers rows and writes them as row groups to a Parquet file, either once the number of
+    buffered rows or their estimated size exceeds the limits. The schema of the file gets inferred
+    from the first row group (columns with only nulls get stored as strings) and subsequent row
+    groups get converted to it, raising an exception if values cannot be converted without loss
+    (e.g., floating point numbers in an integer column).
+    """
+
+    def __init__(self, path: str, columns: List[str], row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES):
+        """
+        Initializes the writer.
+
+        :param path: the Parquet file to write to
+        :type path: str
+        :param columns: the columns to write
+        :type columns: list
+        :param row_group_size: the maximum number of rows per row group, <= 0 for no limit
+        :type row_group_size: int
+        :param row_group_bytes: the maximum estimated size in bytes per row group, <= 0 for no limit
+        :type row_group_bytes: int
+        """
+        self.path = path
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.row_group_bytes = row_group_bytes
+        self._buffer = dict()
+        self._buffer_rows = 0
+        self._buffer_bytes = 0
+        self._schema = None
+        self._writer = None
+        self._clear_buffer()
+
+    def _clear_buffer(self):
+        """
+        Empties the buffer.
+        """
+        self._buffer = dict()
+        for c in self.columns:
+            self._buffer[c] = []
+        self._buffer_rows = 0
+        self._buffer_bytes = 0
+
+    def append(self, row: Dict) -> int:
+        """
+        Adds the row to the buffer, flushing it if necessary.
+
+        :param row: the row to add (column name -> value), missing columns are stored as None
+        :type row: dict
+        :return: the estimated size of the row in bytes
+        :rtype: int
+        """
+        result = 0
+        for c in self.columns:
+            value = row.get(c, None)
+            self._buffer[c].append(value)
+            if isinstance(value, str):
+                result += len(value)
+            else:
+                result += 8
+        self._buffer_rows += 1
+        self._buffer_bytes += result
+        if (self.row_group_size > 0) and (self._buffer_rows >= self.row_group_size):
+            self.flush()
+        elif (self.row_group_bytes > 0) and (self._buffer_bytes >= self.row_group_bytes):
+            self.flush()
+        return result
+
+    def flush(self):
+        """
+        Writes the buffered rows as a row group to the file.
+        """
+        if self._buffer_rows == 0:
+            return
+        try:
+            table = pa.Table.from_pydict(self._buffer)
+        except Exception as e:
+            raise Exception("Failed to convert rows for %s: %s" % (self.path, str(e)))
+        if self._writer is None:
+            fields = []
+            for f in table.schema:
+                if pa.types.is_null(f.type):
+                    f = pa.field(f.name, pa.string())
+                fields.append(f)
+            self._schema = pa.schema(fields)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        try:
+            table = table.cast(self._schema, safe=True)
+        except Exception as e:
+            raise Exception("Failed to convert rows for %s to the schema of the first row group (%s), "
+                            "a larger row group size might help: %s"
+                            % (self.path, ", ".join(["%s: %s" % (f.name, str(f.type)) for f in self._schema]), str(e)))
+        self._writer.write_table(table, row_group_size=self._buffer_rows)
+        self._clear_buffer()
+
+    def close(self):
+        """
+        Flushes the buffer and closes the file. If no rows were written, an empty file with
+        string columns gets created.
+        """
+        self.flush()
+        if self._writer is None:
+            self._schema = pa.schema([pa.field(c, pa.string()) for c in self.columns])
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.close()
+        self._writer = None
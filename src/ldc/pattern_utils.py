@@ -0,0 +1,886 @@
+import argparse
+import logging
+import re
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+REGEXP_BACKEND_RE = "re"
+REGEXP_BACKEND_RE2 = "re2"
+REGEXP_BACKENDS = [
+    REGEXP_BACKEND_RE,
+    REGEXP_BACKEND_RE2,
+]
+
+# the flags that can be translated into re2 options
+_RE2_FLAGS = re.IGNORECASE | re.DOTALL | re.MULTILINE | re.UNICODE
+
+
+def load_keywords(path: str) -> List[str]:
+    """
+    Loads the keywords/phrases from the text file, one per line. Empty lines and lines
+    starting with # get skipped.
+
+    :param path: the file to load
+    :type path: str
+    :return: the keywords
+    :rtype: list
+    """
+    result = []
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.strip()
+            if (len(line) == 0) or line.startswith("#"):
+                continue
+            result.append(line)
+    return result
+
+
+class KeywordMatcher(object):
+    """
+    Locates keywords and multi-word phrases in tokenized text. Single-word keywords are looked up
+    in a set, phrases get compiled into an Aho-Corasick automaton over tokens, which scans the
+    text in a single pass regardless of the number of phrases.
+    """
+
+    def __init__(self, keywords: Iterable[str], lower: bool = True):
+        """
+        Compiles the keywords.
+
+        :param keywords: the keywords/phrases to look for, phrases get split on whitespace
+        :type keywords: list
+        :param lower: whether to turn the keywords into lower case
+        :type lower: bool
+        """
+        self._words = set()
+        # automaton: goto (token -> state), failure link and the matched phrase per state
+        self._goto = [dict()]
+        self._fail = [0]
+        self._output = [None]
+        for keyword in keywords:
+            if lower:
+                keyword = keyword.lower()
+            tokens = keyword.split()
+            if len(tokens) == 0:
+                continue
+            if len(tokens) == 1:
+                self._words.add(tokens[0])
+            else:
+                self._add_phrase(tokens)
+        self._build()
+
+    def _add_phrase(self, tokens: List[str]):
+        """
+        Adds the phrase to the trie.
+
+        :param tokens: the tokens of the phrase
+        :type tokens: list
+        """
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append(dict())
+                self._fail.append(0)
+                self._output.append(None)
+                self._goto[state][token] = next_state
+            state = next_state
+        self._output[state] = " ".join(tokens)
+
+    def _build(self):
+        """
+        Computes the failure links (breadth-first) and propagates the matches along them.
+        """
+        queue = list(self._goto[0].values())
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while (fail > 0) and (token not in self._goto[fail]):
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                self._fail[next_state] = fail
+                if self._output[next_state] is None:
+                    self._output[next_state] = self._output[fail]
+
+    @property
+    def has_phrases(self) -> bool:
+        """
+        Returns whether any multi-word phrases were compiled.
+
+        :return: True if phrases present
+        :rtype: bool
+        """
+        return len(self._goto) > 1
+
+    def __len__(self) -> int:
+        """
+        Returns the number of single words and states of the phrase automaton.
+
+        :return: the size
+        :rtype: int
+        """
+        return len(self._words) + len(self._goto) - 1
+
+    def _search_phrases(self, tokens: List[str]) -> Optional[str]:
+        """
+        Scans the tokens for the first phrase with the automaton.
+
+        :param tokens: the (lower case) tokens to scan
+        :type tokens: list
+        :return: the phrase that was found, None if none found
+        :rtype: str
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for token in tokens:
+            while True:
+                next_state = goto[state].get(token)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if (state > 0) and (output[state] is not None):
+                return output[state]
+        return None
+
+    def search(self, tokens: List[str]) -> Optional[str]:
+        """
+        Looks for the keywords/phrases in the tokens.
+
+        :param tokens: the (lower case) tokens to scan
+        :type tokens: list
+        :return: the first single-word keyword that was found, otherwise the first phrase, None if none found
+        :rtype: str
+        """
+        if len(self._words) > 0:
+            for token in tokens:
+                if token in self._words:
+                    return token
+        if len(self._goto) == 1:
+            return None
+        return self._search_phrases(tokens)
+
+    def matches(self, tokens: List[str]) -> bool:
+        """
+        Checks whether any of the keywords/phrases are present in the tokens.
+
+        :param tokens: the (lower case) tokens to scan
+        :type tokens: list
+        :return: True if at least one found
+        :rtype: bool
+        """
+        if (len(self._words) > 0) and not self._words.isdisjoint(tokens):
+            return True
+        if len(self._goto) == 1:
+            return False
+        return self._search_phrases(tokens) is not None
+
+
+# character categories that include the newline character
+_NEWLINE_CATEGORIES = {
+    sre_constants.CATEGORY_SPACE,
+    sre_constants.CATEGORY_NOT_WORD,
+    sre_constants.CATEGORY_NOT_DIGIT,
+    sre_constants.CATEGORY_LINEBREAK,
+    sre_constants.CATEGORY_UNI_SPACE,
+    sre_constants.CATEGORY_UNI_NOT_WORD,
+    sre_constants.CATEGORY_UNI_NOT_DIGIT,
+    sre_constants.CATEGORY_UNI_LINEBREAK,
+}
+
+
+def _set_matches_newline(items) -> bool:
+    """
+    Checks whether the character set can match a newline.
+
+    :param items: the items of the parsed character set
+    :type items: list
+    :return: True if the newline is matched
+    :rtype: bool
+    """
+    negate = False
+    found = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op in (sre_constants.LITERAL, sre_constants.LITERAL_IGNORE, sre_constants.LITERAL_UNI_IGNORE, sre_constants.LITERAL_LOC_IGNORE):
+            found = found or (av == 10)
+        elif op in (sre_constants.RANGE, sre_constants.RANGE_UNI_IGNORE):
+            found = found or (av[0] <= 10 <= av[1])
+        elif op is sre_constants.CATEGORY:
+            found = found or (av in _NEWLINE_CATEGORIES)
+        else:
+            # unknown item, assume the worst
+            return True
+    return found != negate
+
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: "\\d",
+    sre_constants.CATEGORY_NOT_DIGIT: "\\D",
+    sre_constants.CATEGORY_SPACE: "\\s",
+    sre_constants.CATEGORY_NOT_SPACE: "\\S",
+    sre_constants.CATEGORY_WORD: "\\w",
+    sre_constants.CATEGORY_NOT_WORD: "\\W",
+}
+
+# anchors of a single line, translated to multi-line mode
+_ANCHORS = {
+    sre_constants.AT_BEGINNING: "^",
+    sre_constants.AT_BEGINNING_STRING: "^",
+    sre_constants.AT_END: "$",
+    sre_constants.AT_END_STRING: "$",
+    sre_constants.AT_BOUNDARY: "\\b",
+}
+
+_SCOPED_FLAGS = [
+    (sre_constants.SRE_FLAG_IGNORECASE, "i"),
+    (sre_constants.SRE_FLAG_ASCII, "a"),
+    (sre_constants.SRE_FLAG_UNICODE, "u"),
+]
+
+
+def _char(c: int) -> str:
+    """
+    Turns the character code into an escaped character.
+
+    :param c: the character code
+    :type c: int
+    :return: the escaped character
+    :rtype: str
+    """
+    return re.escape(chr(c))
+
+
+def _unparse_set(items) -> str:
+    """
+    Turns the parsed character set back into a regular expression, excluding the newline.
+
+    :param items: the items of the parsed character set
+    :type items: list
+    :return: the regular expression
+    :rtype: str
+    """
+    result = ""
+    negate = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            result += _char(av)
+        elif op is sre_constants.RANGE:
+            result += _char(av[0]) + "-" + _char(av[1])
+        elif op is sre_constants.CATEGORY:
+            if av not in _CATEGORIES:
+                raise ValueError("Unsupported category: %s" % str(av))
+            result += _CATEGORIES[av]
+        else:
+            raise ValueError("Unsupported set item: %s" % str(op))
+    if negate:
+        return "[^" + result + "\\n]"
+    result = "[" + result + "]"
+    if _set_matches_newline(items):
+        result = "(?!\\n)" + result
+    return result
+
+
+def _unparse(items, group_names) -> str:
+    """
+    Turns the parsed (sub-)pattern back into a regular expression that cannot match a newline.
+
+    :param items: the parsed (sub-)pattern
+    :param group_names: the mapping from group index to group name
+    :type group_names: dict
+    :return: the regular expression
+    :rtype: str
+    """
+    result = ""
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            # a newline never occurs within a line
+            result += "(?!)" if (av == 10) else _char(av)
+        elif op is sre_constants.NOT_LITERAL:
+            result += "[^" + _char(av) + "\\n]"
+        elif op is sre_constants.ANY:
+            result += "[^\\n]"
+        elif op is sre_constants.IN:
+            result += _unparse_set(av)
+        elif op is sre_constants.AT:
+            if av not in _ANCHORS:
+                raise ValueError("Unsupported anchor: %s" % str(av))
+            result += _ANCHORS[av]
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) or (op is getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+            lo, hi, sub = av
+            result += "(?:" + _unparse(sub, group_names) + ")"
+            result += "{%d,%s}" % (lo, "" if (hi is sre_constants.MAXREPEAT) else str(hi))
+            if op is sre_constants.MIN_REPEAT:
+                result += "?"
+            elif op is not sre_constants.MAX_REPEAT:
+                result += "+"
+        elif op is sre_constants.SUBPATTERN:
+            group, add_flags, del_flags, sub = av
+            flags = ""
+            if (add_flags != 0) or (del_flags != 0):
+                flags = "".join(c for f, c in _SCOPED_FLAGS if add_flags & f)
+                if del_flags & sre_constants.SRE_FLAG_IGNORECASE:
+                    flags += "-i"
+            if group is None:
+                result += "(?" + flags + ":"
+            elif flags != "":
+                # scoped flags cannot be combined with a capturing group
+                result += "(" + ("?P<%s>" % group_names[group] if (group in group_names) else "") + "(?" + flags + ":"
+            elif group in group_names:
+                result += "(?P<%s>" % group_names[group]
+            else:
+                result += "("
+            result += _unparse(sub, group_names) + ")"
+            if (group is not None) and (flags != ""):
+                result += ")"
+        elif op is sre_constants.BRANCH:
+            result += "(?:" + "|".join(_unparse(x, group_names) for x in av[1]) + ")"
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, sub = av
+            result += "(?" + ("<" if (direction < 0) else "") + ("=" if (op is sre_constants.ASSERT) else "!")
+            result += _unparse(sub, group_names) + ")"
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            result += "(?>" + _unparse(av, group_names) + ")"
+        elif op is sre_constants.GROUPREF:
+            result += "(?:\\%d)" % av
+        elif op is sre_constants.GROUPREF_EXISTS:
+            group, yes, no = av
+            result += "(?(%d)" % group + _unparse(yes, group_names)
+            if no is not None:
+                result += "|" + _unparse(no, group_names)
+            result += ")"
+        else:
+            raise ValueError("Unsupported operation: %s" % str(op))
+    return result
+
+
+def line_local_pattern(pattern: str, flags: int = 0) -> Optional[re.Pattern]:
+    """
+    Rewrites the regular expression in such a way that it can be applied to a whole multi-line
+    document with the same results as applying the original expression to each line separately,
+    i.e., it cannot match the newline and ^, $, \\A and \\Z refer to the start/end of lines.
+
+    :param pattern: the regular expression to rewrite
+    :type pattern: str
+    :param flags: the flags for the regular expression
+    :type flags: int
+    :return: the compiled equivalent expression, None if it cannot be rewritten (or is faster to apply line by line)
+    :rtype: re.Pattern
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+        group_names = dict((v, k) for k, v in parsed.state.groupdict.items())
+        flags = parsed.state.flags & ~(sre_constants.SRE_FLAG_DOTALL | sre_constants.SRE_FLAG_VERBOSE)
+        items = list(parsed.data)
+        # anchored at the start of the line: searching in multi-line mode cannot make use of a literal
+        # prefix, hence the anchor gets checked after the prefix ("^abc" -> "abc(?<=^abc)");
+        # without a prefix, searching each line separately is faster
+        if (len(items) > 0) and (items[0][0] is sre_constants.AT) \
+                and (items[0][1] in (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)):
+            num = 1
+            while (num < len(items)) and (items[num][0] is sre_constants.LITERAL) and (items[num][1] != 10):
+                num += 1
+            if num == 1:
+                return None
+            prefix = _unparse(items[1:num], group_names)
+            return re.compile(prefix + "(?<=^" + prefix + ")" + _unparse(items[num:], group_names), flags | re.MULTILINE)
+        return re.compile(_unparse(parsed.data, group_names), flags | re.MULTILINE)
+    except Exception:
+        return None
+
+
+def _anchors(items) -> set:
+    """
+    Collects the anchors used in the parsed (sub-)pattern.
+
+    :param items: the parsed (sub-)pattern
+    :return: the anchors
+    :rtype: set
+    """
+    result = set()
+    for op, av in items:
+        if op is sre_constants.AT:
+            result.add(av)
+        elif isinstance(av, sre_parse.SubPattern):
+            result.update(_anchors(av))
+        elif isinstance(av, (tuple, list)):
+            for x in av:
+                if isinstance(x, sre_parse.SubPattern):
+                    result.update(_anchors(x))
+                elif isinstance(x, list):
+                    for y in x:
+                        if isinstance(y, sre_parse.SubPattern):
+                            result.update(_anchors(y))
+    return result
+
+
+def re2_available() -> bool:
+    """
+    Returns whether the re2 backend (google-re2 package) is available.
+
+    :return: True if available
+    :rtype: bool
+    """
+    return re2 is not None
+
+
+def _compile_re2(pattern: str, flags: int = 0, lines: bool = False):
+    """
+    Compiles the regular expression with re2.
+
+    :param pattern: the regular expression to compile
+    :type pattern: str
+    :param flags: the re flags to translate into re2 options
+    :type flags: int
+    :param lines: whether to compile the expression for matching within lines only (multi-line mode, never matching the newline)
+    :type lines: bool
+    :return: the compiled expression, None if not supported by re2
+    """
+    if (re2 is None) or ((flags & ~_RE2_FLAGS) != 0):
+        return None
+    options = re2.Options()
+    options.log_errors = False
+    options.case_sensitive = (flags & re.IGNORECASE) == 0
+    options.dot_nl = (flags & re.DOTALL) != 0
+    options.never_nl = lines
+    if lines or ((flags & re.MULTILINE) != 0):
+        pattern = "(?m)" + pattern
+    try:
+        return re2.compile(pattern, options)
+    except re2.error:
+        return None
+
+
+def _re2_line_pattern(pattern: str, flags: int = 0):
+    """
+    Compiles the regular expression with re2 for applying it to a whole multi-line document,
+    with the same results as applying it to each line separately.
+
+    :param pattern: the regular expression to compile
+    :type pattern: str
+    :param flags: the re flags to translate into re2 options
+    :type flags: int
+    :return: the compiled expression, None if not possible
+    """
+    # \A, \Z and \B behave differently when applied to the whole document, as do empty matches
+    # at the start of lines (due to how re2 handles never_nl)
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return None
+    if parsed.getwidth()[0] == 0:
+        return None
+    if len(_anchors(parsed.data) & {sre_constants.AT_BEGINNING_STRING, sre_constants.AT_END_STRING, sre_constants.AT_NON_BOUNDARY}) > 0:
+        return None
+    return _compile_re2(pattern, flags=flags, lines=True)
+
+
+def compile_regexp(pattern: str, flags: int = 0, backend: str = REGEXP_BACKEND_RE, logger: logging.Logger = None):
+    """
+    Compiles the regular expression with the specified backend. The re2 backend guarantees matching
+    in linear time, but does not support all of the syntax (e.g., backreferences and lookarounds),
+    in which case the re module gets used instead (as well as when re2 is not installed).
+
+    :param pattern: the regular expression to compile
+    :type pattern: str
+    :param flags: the flags for the regular expression (re2 only supports IGNORECASE, DOTALL and MULTILINE)
+    :type flags: int
+    :param backend: the backend to use, see REGEXP_BACKENDS
+    :type backend: str
+    :param logger: the optional logger for outputting a warning when falling back on re
+    :type logger: logging.Logger
+    :return: the compiled expression, offering search/match/fullmatch/sub
+    """
+    if backend not in REGEXP_BACKENDS:
+        raise Exception("Invalid regexp backend: %s" % backend)
+    if backend == REGEXP_BACKEND_RE2:
+        result = _compile_re2(pattern, flags=flags)
+        if result is not None:
+            return result
+        if logger is not None:
+            if re2 is None:
+                logger.warning("re2 is not installed (google-re2 package), using re instead: %s" % pattern)
+            else:
+                logger.warning("Pattern not supported by re2, using re instead: %s" % pattern)
+    return re.compile(pattern, flags)
+
+
+def add_regexp_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the options for the regexp backend (--regexp_backend) and the match time budget (--time_budget)
+    to the parser.
+
+    :param parser: the parser to add the options to
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--regexp_backend", choices=REGEXP_BACKENDS, default=REGEXP_BACKEND_RE, help="The engine for the regular expressions; re2 matches in linear time, but does not support backreferences and lookarounds and \\d/\\w/\\s only match ASCII characters; empty matches get handled differently when replacing, e.g., for lazy expressions like \\d*? or \\w*?; falls back on re for unsupported expressions or if the google-re2 package is not installed", required=False)
+    parser.add_argument("--time_budget", metavar="SECONDS", type=float, default=0.0, help="The maximum time in seconds for matching a record, records that exceed it get reported and skipped; no limit if <= 0", required=False)
+
+
+class MatchTimeout(Exception):
+    """
+    Gets raised when matching exceeds the time budget.
+    """
+    pass
+
+
+def _raise_match_timeout(signum, frame):
+    """
+    Signal handler for the time budget.
+    """
+    raise MatchTimeout()
+
+
+@contextmanager
+def match_time_budget(seconds: float):
+    """
+    Limits the time that can be spent in the block, raising a MatchTimeout once exceeded.
+    Long-running matches get interrupted with a timer signal (SIGALRM), which is only available
+    in the main thread on Unix; otherwise the time gets checked once the block has finished.
+
+    :param seconds: the time budget in seconds, no limit if None or <= 0
+    :type seconds: float
+    """
+    if (seconds is None) or (seconds <= 0):
+        yield
+        return
+    interrupt = hasattr(signal, "setitimer") and (threading.current_thread() is threading.main_thread())
+    previous = None
+    start = time.perf_counter()
+    if interrupt:
+        previous = signal.signal(signal.SIGALRM, _raise_match_timeout)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        if interrupt:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    if time.perf_counter() - start > seconds:
+        raise MatchTimeout()
+
+
+class MatchBudget(object):
+    """
+    Runs the matching of records under a time budget (see match_time_budget), counting and
+    reporting the records that exceed it.
+    """
+
+    def __init__(self, seconds: float, logger: logging.Logger):
+        """
+        Initializes the budget.
+
+        :param seconds: the time budget in seconds per record, no limit if None or <= 0
+        :type seconds: float
+        :param logger: the logger to report the records that exceed the budget with
+        :type logger: logging.Logger
+        """
+        self.seconds = seconds
+        self.logger = logger
+        self.num_timeouts = 0
+
+    def run(self, func: Callable, item) -> Tuple[bool, Any]:
+        """
+        Runs the function under the time budget, logging a warning if the budget gets exceeded.
+
+        :param func: the function to run (no arguments)
+        :type func: Callable
+        :param item: the record (or file name etc) to mention in the warning if the budget gets exceeded
+        :return: the tuple of whether the function finished within the budget and its result (None if exceeded)
+        :rtype: tuple
+        """
+        try:
+            with match_time_budget(self.seconds):
+                return True, func()
+        except MatchTimeout:
+            self.num_timeouts += 1
+            self.logger.warning("Time budget of %s seconds exceeded, skipping: %s" % (str(self.seconds), str(item)))
+            return False, None
+
+    def report(self):
+        """
+        Outputs the number of records that exceeded the budget, if any.
+        """
+        if self.num_timeouts > 0:
+            self.logger.warning("# records exceeding time budget: %d" % self.num_timeouts)
+
+
+class PatternSet(object):
+    """
+    Precompiled set of regular expressions (or plain sub-strings) that get searched for or
+    substituted in the order they were supplied.
+    Multi-line texts get processed as a whole rather than line by line, with identical results:
+    the expressions get rewritten (see line_local_pattern) and applied to the whole text,
+    only the ones that cannot be rewritten get applied to each line separately.
+    With the re2 backend, the expressions get searched for simultaneously in a single pass.
+    """
+
+    def __init__(self, patterns: Iterable[str], replacements: Iterable[str] = None,
+                 is_regexp: bool = True, flags: int = 0, backend: str = REGEXP_BACKEND_RE,
+                 logger: logging.Logger = None):
+        """
+        Compiles the patterns.
+
+        :param patterns: the regular expressions (or sub-strings) to use
+        :type patterns: list
+        :param replacements: the replacement strings for the patterns, None to remove the matches
+        :type replacements: list
+        :param is_regexp: whether the patterns are regular expressions or plain sub-strings
+        :type is_regexp: bool
+        :param flags: the flags to compile the regular expressions with
+        :type flags: int
+        :param backend: the regexp backend to use, see REGEXP_BACKENDS
+        :type backend: str
+        :param logger: the optional logger for outputting warnings
+        :type logger: logging.Logger
+        """
+        self.patterns = list(patterns)
+        if replacements is None:
+            self.replacements = [""] * len(self.patterns)
+        else:
+            self.replacements = list(replacements)
+        if len(self.patterns) != len(self.replacements):
+            raise Exception("Number of patterns and replacement strings differ: %d != %d" % (len(self.patterns), len(self.replacements)))
+        self.is_regexp = is_regexp
+        self.backend = backend
+        self._set = None
+        self._set_indices = None
+        self._other_indices = None
+        if is_regexp:
+            self._compiled = [compile_regexp(x, flags=flags, backend=backend, logger=logger) for x in self.patterns]
+            line_patterns = []
+            for i, x in enumerate(self.patterns):
+                if isinstance(self._compiled[i], re.Pattern):
+                    line_patterns.append(line_local_pattern(x, flags))
+                else:
+                    line_patterns.append(_re2_line_pattern(x, flags))
+            self._init_set(flags)
+        else:
+            self._compiled = [re.compile(re.escape(x), flags) for x in self.patterns]
+            line_patterns = [line_local_pattern(re.escape(x), flags) for x in self.patterns]
+        self._pairs = list(zip(self._compiled, self.replacements))
+        # group consecutive patterns into segments that can be applied to the whole text
+        # (using the rewritten patterns) or have to be applied line by line: (line-local, [(compiled, replacement), ...])
+        self._segments = []
+        for i in range(len(self.patterns)):
+            line_local = line_patterns[i] is not None
+            if line_local:
+                pair = (line_patterns[i], self.replacements[i])
+            else:
+                pair = self._pairs[i]
+            if (len(self._segments) == 0) or (self._segments[-1][0] != line_local):
+                self._segments.append((line_local, []))
+            self._segments[-1][1].append(pair)
+        self._line_local = all(x is not None for x in line_patterns)
+
+    def _init_set(self, flags: int):
+        """
+        Compiles the expressions that re2 supports into a single re2 set for searching.
+
+        :param flags: the flags to compile the regular expressions with
+        :type flags: int
+        """
+        self._set_indices = [i for i, x in enumerate(self._compiled) if not isinstance(x, re.Pattern)]
+        self._other_indices = [i for i, x in enumerate(self._compiled) if isinstance(x, re.Pattern)]
+        if len(self._set_indices) < 2:
+            return
+        options = re2.Options()
+        options.log_errors = False
+        options.case_sensitive = (flags & re.IGNORECASE) == 0
+        options.dot_nl = (flags & re.DOTALL) != 0
+        prefix = "(?m)" if ((flags & re.MULTILINE) != 0) else ""
+        self._set = re2.Set.SearchSet(options)
+        for i in self._set_indices:
+            self._set.Add(prefix + self.patterns[i])
+        self._set.Compile()
+
+    @property
+    def is_line_local(self) -> bool:
+        """
+        Returns whether all the patterns could be rewritten, i.e., whether multi-line texts
+        can be processed as a whole.
+
+        :return: True if line-local
+        :rtype: bool
+        """
+        return self._line_local
+
+    def __len__(self) -> int:
+        """
+        Returns the number of patterns.
+
+        :return: the number of patterns
+        :rtype: int
+        """
+        return len(self.patterns)
+
+    def search(self, s: str) -> Optional[str]:
+        """
+        Looks for the patterns in the string.
+
+        :param s: the string to search
+        :type s: str
+        :return: the first pattern that was found, None if none found
+        :rtype: str
+        """
+        # re2: all the expressions in a single pass
+        if self._set is not None:
+            found = self._set.Match(s)
+            first = None
+            if found:
+                first = min(self._set_indices[i] for i in found)
+            for i in self._other_indices:
+                if (first is not None) and (i > first):
+                    break
+                if self._compiled[i].search(s) is not None:
+                    return self.patterns[i]
+            return None if (first is None) else self.patterns[first]
+        # a single alternation of all the patterns is slower with re, as it defeats the
+        # literal prefix search of the individual patterns
+        if self.is_regexp:
+            for i, p in enumerate(self._compiled):
+                if p.search(s) is not None:
+                    return self.patterns[i]
+        else:
+            for p in self.patterns:
+                if p in s:
+                    return p
+        return None
+
+    def matches(self, s: str) -> bool:
+        """
+        Checks whether any of the patterns are present in the string.
+
+        :param s: the string to search
+        :type s: str
+        :return: True if at least one found
+        :rtype: bool
+        """
+        return self.search(s) is not None
+
+    def sub(self, s: str) -> str:
+        """
+        Applies the patterns one after the other to the string.
+
+        :param s: the string to process
+        :type s: str
+        :return: the processed string
+        :rtype: str
+        """
+        for p, r in self._pairs:
+            s = p.sub(r, s)
+        return s
+
+    def _sub_each(self, lines: List[str]) -> Tuple[List[str], int]:
+        """
+        Applies the patterns to each line separately.
+
+        :param lines: the lines to process
+        :type lines: list
+        :return: the tuple of processed lines and number of lines that were affected
+        :rtype: tuple
+        """
+        result = []
+        affected = 0
+        for line in lines:
+            new_line = self.sub(line)
+            if new_line != line:
+                result.append(new_line)
+                affected += 1
+            else:
+                result.append(line)
+        return result, affected
+
+    def _sub_whole(self, text: str) -> Optional[Tuple[str, int]]:
+        """
+        Applies the patterns to the text as a whole, segment by segment.
+
+        :param text: the text to process
+        :type text: str
+        :return: the tuple of processed text and number of lines that were affected, None if the text has to be processed line by line
+        :rtype: tuple
+        """
+        num_lines = text.count("\n")
+        result = text
+        for line_local, pairs in self._segments:
+            if line_local:
+                for p, r in pairs:
+                    result = p.sub(r, result)
+            else:
+                lines = result.split("\n")
+                for i, line in enumerate(lines):
+                    for p, r in pairs:
+                        line = p.sub(r, line)
+                    lines[i] = line
+                result = "\n".join(lines)
+            # a replacement that introduces new lines would change what subsequent patterns see
+            if result.count("\n") != num_lines:
+                return None
+        if result == text:
+            return text, 0
+        affected = 0
+        for old, new in zip(text.split("\n"), result.split("\n")):
+            if old != new:
+                affected += 1
+        return result, affected
+
+    def sub_text(self, text: str) -> Tuple[str, int]:
+        """
+        Applies the patterns to the lines of the text, processing the text as a whole if possible.
+
+        :param text: the text to process
+        :type text: str
+        :return: the tuple of processed text and number of lines that were affected
+        :rtype: tuple
+        """
+        result = self._sub_whole(text)
+        if result is not None:
+            return result
+        lines, affected = self._sub_each(text.split("\n"))
+        return "\n".join(lines), affected
+
+    def sub_lines(self, lines: List[str]) -> Tuple[List[str], int]:
+        """
+        Applies the patterns to the lines, processing them as a whole if possible.
+
+        :param lines: the lines to process
+        :type lines: list
+        :return: the tuple of processed lines and number of lines that were affected
+        :rtype: tuple
+        """
+        if len(lines) > 0:
+            text = "\n".join(lines)
+            # lines must not contain new lines themselves
+            if text.count("\n") == len(lines) - 1:
+                result = self._sub_whole(text)
+                if result is not None:
+                    if result[1] == 0:
+                        return list(lines), 0
+                    return result[0].split("\n"), result[1]
+        return self._sub_each(lines)
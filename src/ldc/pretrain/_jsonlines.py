@@ -1,13 +1,12 @@
 import argparse
-import jsonlines
 import os
-from typing import Iterable, List, Union
+from typing import Iterable, List, Set, Union
 
 from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix
-from ldc.api import open_file, generate_output, is_compressed
+from ldc.api import open_file, generate_output, open_json_lines, read_json_lines, JsonLinesWriter, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next
 from ldc.api.pretrain import PretrainData, PretrainReader, StreamPretrainWriter
 from ldc.text_utils import empty_str_if_none
 
@@ -19,7 +18,7 @@ class JsonLinesPretrainReader(PretrainReader):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  att_content: str = None, att_id: str = None, att_meta: List[str] = None,
-                 encoding: str = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 encoding: str = None, lazy: bool = False, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
 
@@ -33,6 +32,8 @@ class JsonLinesPretrainReader(PretrainReader):
         :type att_meta: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param lazy: whether to only decode the attributes that are required, skipping all others
+        :type lazy: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -45,6 +46,7 @@ class JsonLinesPretrainReader(PretrainReader):
         self.att_id = att_id
         self.att_meta = att_meta
         self.encoding = encoding
+        self.lazy = lazy
         self._inputs = None
         self._current_input = None
         self._reader = None
@@ -81,6 +83,7 @@ class JsonLinesPretrainReader(PretrainReader):
         parser.add_argument("--att_id", metavar="ATT", type=str, default=None, help="The attribute the record ID (gets stored under 'id' in meta-data)", required=False)
         parser.add_argument("--att_meta", metavar="ATT", type=str, default=None, help="The attributes to store in the meta-data", required=False, nargs="*")
         parser.add_argument("--encoding", metavar="ENC", type=str, default=None, help="The encoding to force instead of auto-detecting it, e.g., 'utf-8'", required=False)
+        parser.add_argument("--lazy", action="store_true", help="Only decodes the required attributes, skipping all others (faster for records with many/large attributes not being used); does not detect invalid JSON in skipped attributes", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -97,6 +100,7 @@ class JsonLinesPretrainReader(PretrainReader):
         self.att_id = ns.att_id
         self.att_meta = ns.att_meta
         self.encoding = ns.encoding
+        self.lazy = ns.lazy
 
     def initialize(self):
         """
@@ -107,6 +111,21 @@ class JsonLinesPretrainReader(PretrainReader):
         if self.att_content is None:
             raise Exception("No content attribute specified!")
 
+    def _required_attributes(self) -> Set[str]:
+        """
+        Returns the attributes that need decoding.
+
+        :return: the attributes
+        :rtype: set
+        """
+        result = set()
+        for att in [self.att_content, self.att_id]:
+            if att is not None:
+                result.add(att)
+        if self.att_meta is not None:
+            result.update(self.att_meta)
+        return result
+
     def read(self) -> Iterable[PretrainData]:
         """
         Loads the data and returns the items one by one.
@@ -119,9 +138,10 @@ class JsonLinesPretrainReader(PretrainReader):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
-        self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger())
+        self._current_input = open_json_lines(self._current_input, encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session))
+        prefetch_next(self._inputs, self.session)
 
-        self._reader = jsonlines.Reader(self._current_input)
+        self._reader = read_json_lines(self._current_input, keys=self._required_attributes() if self.lazy else None)
         for item in self._reader:
             val_content = None
             if self.att_content is not None:
@@ -208,6 +228,8 @@ class JsonLinesPretrainWriter(StreamPretrainWriter):
         self._first_item = True
         self._fname_format = None
         self._buffer = []
+        self._output = None
+        self._output_writer = None
 
     def name(self) -> str:
         """
@@ -269,49 +291,65 @@ class JsonLinesPretrainWriter(StreamPretrainWriter):
             self._concatenate = False
         else:
             self._concatenate = True
-            if is_compressed(self.target):
-                raise Exception("Cannot use compression when concatenating due to streaming!")
+        if not self._concatenate and self._sharding_enabled():
+            self.logger().warning("Sharding is not available when writing one file per record, ignoring!")
         self._buffer.clear()
 
-    def _write(self, data: List[PretrainData], output: str, mode: str):
+    def _open_output(self, output: str):
         """
-        Writes the data to disk.
+        Opens the output file for writing, closing any previously opened one.
 
-        :param data: the records to write
-        :type data: list
         :param output: the file to write to
         :type output: str
-        :param mode: the file mode to use
-        :type mode: str
         """
-        with open(output, mode) as fp:
-            writer = jsonlines.Writer(fp)
-            for item in data:
-                d = {self.att_content: empty_str_if_none(item.content)}
-                if self.att_id is not None:
-                    if (item.meta is not None) and ("id" in item.meta):
-                        d[self.att_id] = item.meta["id"]
-                try:
-                    writer.write(d)
-                except KeyboardInterrupt as e:
-                    raise e
-                except:
-                    self.logger().exception("Failed to write record: %s" % str(d))
-            writer.close()
+        self._close_output()
+        self.logger().info("Writing to: %s" % output)
+        self._output = open_file(output, mode="wb", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+        self._output_writer = JsonLinesWriter(self._output)
+
+    def _close_output(self):
+        """
+        Closes the output file, if open.
+        """
+        if self._output is not None:
+            self._output_writer.close()
+            self._output_writer = None
+            self._output.close()
+            self._output = None
+
+    def _write(self, data: List[PretrainData]):
+        """
+        Writes the data to the current output.
+
+        :param data: the records to write
+        :type data: list
+        """
+        for item in data:
+            if self._shard_is_full():
+                self._open_output(self._shard_next())
+            d = {self.att_content: empty_str_if_none(item.content)}
+            if self.att_id is not None:
+                if (item.meta is not None) and ("id" in item.meta):
+                    d[self.att_id] = item.meta["id"]
+            try:
+                self._shard_written(self._output_writer.write(d))
+            except KeyboardInterrupt as e:
+                raise e
+            except:
+                self.logger().exception("Failed to write record: %s" % str(d))
 
     def _flush_buffer(self):
         """
         Writes the buffer content to disk.
         """
         self.logger().debug("flushing buffer: %d" % len(self._buffer))
-        mode = "w" if self._first_item else "a"
         output_file = self.target
         if self.session.options.force_batch and os.path.isdir(output_file):
             output_file = generate_output(self.session.current_input, output_file, ".jsonl", None)
-        if self._first_item:
-            self.logger().info("Writing to: %s" % output_file)
+        if self._first_item or (output_file != self._shard_base):
+            self._open_output(self._shard_begin(output_file))
         self._first_item = False
-        self._write(self._buffer, output_file, mode)
+        self._write(self._buffer)
         self._buffer.clear()
 
     def write_stream(self, data: Union[PretrainData, Iterable[PretrainData]]):
@@ -338,8 +376,18 @@ class JsonLinesPretrainWriter(StreamPretrainWriter):
                 else:
                     fname = self._fname_format % self.session.count
                 output = generate_output(fname, self.target, ".jsonl", self.session.options.compression)
-                self.logger().info("Writing to: %s" % output)
-                self._write([item], output, "w")
+                self._open_output(output)
+                self._write([item])
+                self._close_output()
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        return ".jsonl"
 
     def finalize(self):
         """
@@ -348,3 +396,4 @@ class JsonLinesPretrainWriter(StreamPretrainWriter):
         super().finalize()
         if len(self._buffer) > 0:
             self._flush_buffer()
+        self._close_output()
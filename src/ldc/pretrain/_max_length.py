@@ -4,15 +4,17 @@ import copy
 from wai.logging import LOGGING_WARNING
 from ldc.core import domain_suffix
 from ldc.api.pretrain import PretrainData, PretrainFilter
-from ldc.text_utils import apply_max_length
+from ldc.text_utils import apply_max_length, load_tokenizer
 
 
 class MaxLength(PretrainFilter):
     """
     Splits pretrain text into segments of at most the specified length (uses word boundary).
+    The length can be measured in characters or in tokens, using a tokenizer file.
     """
 
-    def __init__(self, max_length: int = -1, split_records: bool = False, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+    def __init__(self, max_length: int = -1, split_records: bool = False, tokenizer: str = None, overlap: int = 0,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
 
@@ -20,6 +22,10 @@ class MaxLength(PretrainFilter):
         :type max_length: int
         :param split_records: whether to split the records
         :type split_records: bool
+        :param tokenizer: the tokenizer file (e.g., tokenizer.json of a huggingface model) for measuring the length in tokens rather than characters, None for characters
+        :type tokenizer: str
+        :param overlap: the maximum length of the text from the end of a segment to repeat at the start of the next segment (at word boundary), <= 0 for no overlap
+        :type overlap: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -28,6 +34,9 @@ class MaxLength(PretrainFilter):
         super().__init__(logger_name=logger_name, logging_level=logging_level)
         self.max_length = max_length
         self.split_records = split_records
+        self.tokenizer = tokenizer
+        self.overlap = overlap
+        self._tokenizer = None
         self._total_pre = 0
         self._total_post = 0
 
@@ -47,7 +56,9 @@ class MaxLength(PretrainFilter):
         :return: the description
         :rtype: str
         """
-        return "Splits pretrain text into segments of at most the specified length (uses word boundary)."
+        return "Splits pretrain text into segments of at most the specified length (uses word boundary). " \
+               "The length is measured in characters or, when supplying a tokenizer file (e.g., the tokenizer.json " \
+               "of a huggingface model; requires the tokenizers package), in tokens."
 
     def _create_argparser(self) -> argparse.ArgumentParser:
         """
@@ -59,6 +70,8 @@ class MaxLength(PretrainFilter):
         parser = super()._create_argparser()
         parser.add_argument("-m", "--max_length", type=int, help="The maximum text length, use <=0 for unbounded.", default=-1, required=False)
         parser.add_argument("-s", "--split_records", action="store_true", help="Splits the lines into separate records (one line per record) after reassambling the lines instead of combining them back into single document.", required=False)
+        parser.add_argument("-t", "--tokenizer", metavar="FILE", type=str, help="The tokenizer file (e.g., tokenizer.json of a huggingface model) to use for measuring the length in tokens rather than characters.", default=None, required=False)
+        parser.add_argument("-o", "--overlap", metavar="NUM", type=int, help="The maximum length (characters or tokens) of the text from the end of a segment to repeat at the start of the next segment of the same line, uses word boundary; <=0 for no overlap.", default=0, required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -71,12 +84,19 @@ class MaxLength(PretrainFilter):
         super()._apply_args(ns)
         self.max_length = ns.max_length
         self.split_records = ns.split_records
+        self.tokenizer = ns.tokenizer
+        self.overlap = ns.overlap
 
     def initialize(self):
         """
         Initializes the processing, e.g., for opening files or databases.
         """
         super().initialize()
+        if (self.max_length > 0) and (self.overlap >= self.max_length):
+            raise Exception("Overlap must be smaller than the maximum length: overlap=%d, max_length=%d" % (self.overlap, self.max_length))
+        self._tokenizer = None
+        if self.tokenizer is not None:
+            self._tokenizer = load_tokenizer(self.tokenizer)
         self._total_pre = 0
         self._total_post = 0
 
@@ -93,7 +113,7 @@ class MaxLength(PretrainFilter):
 
         lines = data.content.split("\n")
         pre = len(lines)
-        lines = apply_max_length(lines, self.max_length)
+        lines = apply_max_length(lines, self.max_length, overlap=self.overlap, tokenizer=self._tokenizer)
         post = len(lines)
         self._total_pre += pre
         self._total_post += post
@@ -121,4 +141,5 @@ class MaxLength(PretrainFilter):
         Finishes the processing, e.g., for closing files or databases.
         """
         super().finalize()
+        self._tokenizer = None
         self.logger().info("total of enforcing max length %d, #lines: %d -> %d" % (self.max_length, self._total_pre, self._total_post))
@@ -1,8 +1,6 @@
 import argparse
 from typing import Iterable, List, Union
 
-import pandas as pd
-import pyarrow as pa
 import pyarrow.parquet as pq
 
 from wai.logging import LOGGING_WARNING
@@ -10,7 +8,9 @@ from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix
 from ldc.api import generate_output
-from ldc.api.pretrain import PretrainData, PretrainReader, BatchPretrainWriter
+from ldc.api.pretrain import PretrainData, PretrainReader, StreamPretrainWriter
+from ldc.parquet_utils import DEFAULT_BATCH_SIZE, iterate_rows, RowGroupLoader, BufferedParquetWriter, \
+    DEFAULT_ROW_GROUP_SIZE, DEFAULT_ROW_GROUP_BYTES
 from ldc.text_utils import empty_str_if_none
 
 
@@ -21,6 +21,7 @@ class ParquetPretrainReader(PretrainReader):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  col_content: str = None, col_id: str = None, col_meta: List[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, num_workers: int = 1,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -33,6 +34,10 @@ class ParquetPretrainReader(PretrainReader):
         :type col_id: str
         :param col_meta: the columns to store in the meta-data, can be None
         :type col_meta: list
+        :param batch_size: the number of rows to decode at a time
+        :type batch_size: int
+        :param num_workers: the number of threads for decoding row groups concurrently, <= 1 for sequential decoding
+        :type num_workers: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -44,9 +49,12 @@ class ParquetPretrainReader(PretrainReader):
         self.col_content = col_content
         self.col_id = col_id
         self.col_meta = col_meta
+        self.batch_size = batch_size
+        self.num_workers = num_workers
         self._inputs = None
         self._current_input = None
-        self._current_table = None
+        self._current_file = None
+        self._loader = None
 
     def name(self) -> str:
         """
@@ -79,6 +87,8 @@ class ParquetPretrainReader(PretrainReader):
         parser.add_argument("--col_content", metavar="COL", type=str, default=None, help="The name of the column with the text to retrieve", required=False)
         parser.add_argument("--col_id", metavar="COL", type=str, default=None, help="The name of the column with the row IDs (gets stored under 'id' in meta-data)", required=False)
         parser.add_argument("--col_meta", metavar="COL", type=str, default=None, help="The name of the columns to store in the meta-data", required=False, nargs="*")
+        parser.add_argument("-b", "--batch_size", metavar="SIZE", type=int, default=DEFAULT_BATCH_SIZE, help="The number of rows to decode at a time (only the required columns get decoded)", required=False)
+        parser.add_argument("-w", "--num_workers", metavar="NUM", type=int, default=1, help="The number of threads to use for decoding row groups concurrently (also across files); records are still output in file/row group order", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -94,6 +104,8 @@ class ParquetPretrainReader(PretrainReader):
         self.col_content = ns.col_content
         self.col_id = ns.col_id
         self.col_meta = ns.col_meta
+        self.batch_size = ns.batch_size
+        self.num_workers = ns.num_workers
 
     def initialize(self):
         """
@@ -103,6 +115,21 @@ class ParquetPretrainReader(PretrainReader):
         self._inputs = locate_files(self.source, input_lists=self.source_list, fail_if_empty=True, default_glob="*.parquet")
         if self.col_content is None:
             raise Exception("No content column specified!")
+        self._loader = None
+        if self.num_workers > 1:
+            self._loader = RowGroupLoader(self._inputs, self._required_columns(), self.num_workers)
+
+    def _required_columns(self) -> List[str]:
+        """
+        Returns the columns that need to be loaded.
+
+        :return: the columns, can contain None
+        :rtype: list
+        """
+        result = [self.col_content, self.col_id]
+        if self.col_meta is not None:
+            result.extend(self.col_meta)
+        return result
 
     def read(self) -> Iterable[PretrainData]:
         """
@@ -116,11 +143,18 @@ class ParquetPretrainReader(PretrainReader):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
-        self._current_table = pq.read_table(self._current_input).to_pandas()
-        if (self.col_content is not None) and (self.col_content not in self._current_table.columns):
+        self._current_file = pq.ParquetFile(self._current_input)
+        columns = self._current_file.schema_arrow.names
+        if (self.col_content is not None) and (self.col_content not in columns):
             raise Exception("Failed to locate content column: %s" % self.col_content)
-
-        for index, row in self._current_table.iterrows():
+        if (self.col_id is not None) and (self.col_id not in columns):
+            raise Exception("Failed to locate ID column: %s" % self.col_id)
+
+        if self._loader is not None:
+            rows = self._loader.rows(self._current_input, batch_size=self.batch_size)
+        else:
+            rows = iterate_rows(self._current_file, self._required_columns(), batch_size=self.batch_size)
+        for row in rows:
             val_content = None if (self.col_content is None) else row[self.col_content]
 
             id_ = None
@@ -162,15 +196,20 @@ class ParquetPretrainReader(PretrainReader):
         """
         if self._current_input is not None:
             super().finalize()
+            self._current_file = None
             self._current_input = None
+        if (self._loader is not None) and (len(self._inputs) == 0):
+            self._loader.close()
+            self._loader = None
 
 
-class ParquetPretrainWriter(BatchPretrainWriter):
+class ParquetPretrainWriter(StreamPretrainWriter):
     """
     Writer for Parquet database files.
     """
 
     def __init__(self, target: str = None, col_content: str = None, col_id: str = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
@@ -181,6 +220,10 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         :type col_content: str
         :param col_id: the (optional) column containing row IDs
         :type col_id: str
+        :param row_group_size: the maximum number of records per row group, <= 0 for no limit
+        :type row_group_size: int
+        :param row_group_bytes: the maximum (estimated) size in bytes per row group, <= 0 for no limit
+        :type row_group_bytes: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -190,9 +233,10 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         self.target = target
         self.col_content = col_content
         self.col_id = col_id
+        self.row_group_size = row_group_size
+        self.row_group_bytes = row_group_bytes
         self._current_output = None
         self._output = None
-        self._output_writer = None
 
     def name(self) -> str:
         """
@@ -223,6 +267,8 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         parser.add_argument("-o", "--output", type=str, help="Path of the CSV file to write (directory when processing multiple files)", required=True)
         parser.add_argument("--col_content", metavar="COL", type=str, default=None, help="The name of the column for the text content", required=False)
         parser.add_argument("--col_id", metavar="COL", type=str, default=None, help="The name of the column for the row IDs (uses 'id' from meta-data)", required=False)
+        parser.add_argument("--row_group_size", metavar="NUM", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="The maximum number of records per row group, <= 0 for no limit", required=False)
+        parser.add_argument("--row_group_bytes", metavar="BYTES", type=int, default=DEFAULT_ROW_GROUP_BYTES, help="The maximum (estimated) size in bytes per row group, <= 0 for no limit", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -236,6 +282,8 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         self.target = ns.output
         self.col_content = ns.col_content
         self.col_id = ns.col_id
+        self.row_group_size = ns.row_group_size
+        self.row_group_bytes = ns.row_group_bytes
 
     def initialize(self):
         """
@@ -245,36 +293,68 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         if self.col_content is None:
             raise Exception("No content column specified!")
 
-    def write_batch(self, data: Iterable[PretrainData]):
+    def _columns(self) -> List[str]:
+        """
+        Returns the columns to write.
+
+        :return: the column names
+        :rtype: list
+        """
+        result = []
+        if self.col_content is not None:
+            result.append(self.col_content)
+        if self.col_id is not None:
+            result.append(self.col_id)
+        return result
+
+    def _open_output(self, path: str):
+        """
+        Opens the specified Parquet file for writing.
+
+        :param path: the file to write to
+        :type path: str
+        """
+        self.logger().info("Writing to: " + path)
+        self._output = BufferedParquetWriter(path, self._columns(),
+                                             row_group_size=self.row_group_size, row_group_bytes=self.row_group_bytes)
+
+    def write_stream(self, data: Union[PretrainData, Iterable[PretrainData]]):
         """
-        Saves the data in one go.
+        Saves the data one by one.
 
-        :param data: the data to write as iterable of PretrainData
-        :type data: Iterable
+        :param data: the data to write
+        :type data: PretrainData
         """
+        if isinstance(data, PretrainData):
+            data = [data]
+
         if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, ".parquet"):
             self.finalize()
             self._current_output = generate_output(self.session.current_input, self.target, ".parquet", self.session.options.compression)
-            self.logger().info("Writing to: " + self._current_output)
-            # create dictionary
-            d_content = []
-            d_ids = []
-            for row in data:
-                d_content.append(empty_str_if_none(row.content))
-                if self.col_id is not None:
-                    if (row.meta is not None) and ("id" in row.meta):
-                        d_ids.append(row.meta["id"])
-                    else:
-                        d_ids.append(None)
-            d = dict()
+            self._open_output(self._shard_begin(self._current_output))
+
+        for item in data:
+            if self._shard_is_full():
+                self._output.close()
+                self._open_output(self._shard_next())
+            row = dict()
             if self.col_content is not None:
-                d[self.col_content] = d_content
+                row[self.col_content] = empty_str_if_none(item.content)
             if self.col_id is not None:
-                d[self.col_id] = d_ids
-            # create pandas dataframe
-            df = pd.DataFrame.from_dict(d)
-            table = pa.Table.from_pandas(df)
-            pq.write_table(table, self._current_output)
+                if (item.meta is not None) and ("id" in item.meta):
+                    row[self.col_id] = item.meta["id"]
+                else:
+                    row[self.col_id] = None
+            self._shard_written(self._output.append(row))
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        return ".parquet"
 
     def finalize(self):
         """
@@ -282,6 +362,5 @@ class ParquetPretrainWriter(BatchPretrainWriter):
         """
         if self._output is not None:
             super().finalize()
-            self._output_writer = None
             self._output.close()
             self._output = None
@@ -1,16 +1,18 @@
 import argparse
 import os
 import traceback
-from typing import Iterable, List, Union
+from typing import Iterable, Iterator, List, Union
 
 from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix, DEFAULT_END_CHARS, DEFAULT_QUOTE_CHARS
-from ldc.api import open_file, generate_output, is_compressed
+from ldc.api import open_file, generate_output, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next, parse_size
 from ldc.api.pretrain import PretrainData, PretrainReader, StreamPretrainWriter
+from ldc.pattern_utils import PatternSet
 from ldc.text_utils import assemble_preformatted, split_into_sentences, combine_sentences, remove_empty, \
-    remove_patterns, remove_blocks, empty_str_if_none
+    remove_patterns, remove_blocks, empty_str_if_none, iter_assemble_preformatted, iter_split_into_sentences, \
+    iter_combine_sentences, iter_remove_empty, iter_remove_patterns, iter_remove_blocks
 
 METADATA_LINE = "line"
 
@@ -25,7 +27,7 @@ class TxtPretrainReader(PretrainReader):
                  expr_remove: List[str] = None, sentences: bool = False, end_chars: str = DEFAULT_END_CHARS,
                  quote_chars: str = DEFAULT_QUOTE_CHARS,
                  block_removal_start: List[str] = None, block_removal_end: List[str] = None,
-                 max_sentences: int = 1, encoding: str = None,
+                 max_sentences: int = 1, encoding: str = None, streaming: bool = False,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -52,6 +54,8 @@ class TxtPretrainReader(PretrainReader):
         :type max_sentences: int
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param streaming: whether to process the files line by line rather than loading them completely
+        :type streaming: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -63,6 +67,7 @@ class TxtPretrainReader(PretrainReader):
         self.split_lines = split_lines
         self.skip_empty = skip_empty
         self.expr_remove = expr_remove
+        self._expr_remove = None
         self.sentences = sentences
         self.end_chars = end_chars
         self.quote_chars = quote_chars
@@ -70,8 +75,10 @@ class TxtPretrainReader(PretrainReader):
         self.block_removal_end = block_removal_end
         self.max_sentences = max_sentences
         self.encoding = encoding
+        self.streaming = streaming
         self._inputs = None
         self._current_input = None
+        self._read_failed = False
 
     def name(self) -> str:
         """
@@ -112,6 +119,7 @@ class TxtPretrainReader(PretrainReader):
         parser.add_argument("--block_removal_end", type=str, help="The ending strings for blocks to remove", required=False, nargs="*")
         parser.add_argument("-m", "--max_sentences", type=int, help="The maximum number of sentences per line.", default=1, required=False)
         parser.add_argument("--encoding", metavar="ENC", type=str, default=None, help="The encoding to force instead of auto-detecting it, e.g., 'utf-8'", required=False)
+        parser.add_argument("--streaming", action="store_true", help="Processes the text files line by line rather than loading them completely, applying block removal, sentence assembly, pattern removal and skipping of empty lines on the fly; memory usage is only bounded in conjunction with --split_lines; records read before a read error are forwarded as well.")
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -134,6 +142,7 @@ class TxtPretrainReader(PretrainReader):
         self.block_removal_end = ns.block_removal_end
         self.max_sentences = ns.max_sentences
         self.encoding = ns.encoding
+        self.streaming = ns.streaming
 
     def initialize(self):
         """
@@ -154,6 +163,9 @@ class TxtPretrainReader(PretrainReader):
                 raise Exception("Differing number of block removal starts and ends: %d != %d" % (len(self.block_removal_start), len(self.block_removal_end)))
         if self.max_sentences < 1:
             raise Exception("At least one sentence per line is required, currently set: %d" % self.max_sentences)
+        self._expr_remove = None
+        if self.expr_remove is not None:
+            self._expr_remove = PatternSet(self.expr_remove)
 
     def _remove_blocks(self, lines: List[str]) -> List[str]:
         """
@@ -196,7 +208,7 @@ class TxtPretrainReader(PretrainReader):
         :return: the processed lines
         :rtype: list
         """
-        result, affected = remove_patterns(lines, self.expr_remove)
+        result, affected = remove_patterns(lines, self._expr_remove)
         self.logger().info("remove patterns, affected #lines: %d" % affected)
         return result
 
@@ -215,6 +227,88 @@ class TxtPretrainReader(PretrainReader):
         self.logger().info("removing empty, #lines: %d -> %d" % (pre, post))
         return result
 
+    def _iterate_lines(self, index: int) -> Iterator[str]:
+        """
+        Reads the lines of the specified input file one by one.
+        Read errors get logged and end the iteration.
+
+        :param index: the index of the input file
+        :type index: int
+        :return: the lines
+        :rtype: Iterator
+        """
+        try:
+            with open_file(self._inputs[index], mode="rt", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session)) as fp:
+                prefetch_next(self._inputs[index + 1:], self.session)
+                for line in fp:
+                    yield line
+        except KeyboardInterrupt as e:
+            raise e
+        except Exception:
+            self._read_failed = True
+            self.logger().warning("Failed to read: %s\n%s" % (self._inputs[index], traceback.format_exc(1)))
+
+    def _process_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Applies block removal, sentence assembly, pattern removal and skipping of empty lines
+        to the lines, one line at a time.
+
+        :param lines: the lines to process
+        :type lines: Iterable
+        :return: the processed lines
+        :rtype: Iterator
+        """
+        # remove blocks?
+        if self.block_removal_start is not None:
+            lines = iter_remove_blocks(lines, self.block_removal_start, self.block_removal_end)
+        # assemble sentences?
+        if self.sentences:
+            lines = iter_assemble_preformatted(lines, end_chars=self.end_chars, quote_chars=self.quote_chars)
+            lines = iter_split_into_sentences(lines, end_chars=self.end_chars)
+            lines = iter_combine_sentences(lines, max_sentences=self.max_sentences)
+        # remove patterns?
+        if self.expr_remove is not None:
+            lines = iter_remove_patterns(lines, self._expr_remove)
+        # skip empty?
+        if self.skip_empty:
+            lines = iter_remove_empty(lines)
+        return iter(lines)
+
+    def _read_streaming(self, index: int) -> Iterable[PretrainData]:
+        """
+        Processes the specified input file line by line. Without splitting the lines,
+        files that fail to read get skipped.
+
+        :param index: the index of the input file
+        :type index: int
+        :return: the data
+        :rtype: PretrainData
+        """
+        self._read_failed = False
+        lines = self._process_lines(self._iterate_lines(index))
+
+        meta = None
+
+        # file
+        meta = add_metadata(meta, "file", self.session.current_input)
+
+        if self.split_lines:
+            count = 0
+            for count, line in enumerate(lines, start=1):
+                meta = add_metadata(meta, METADATA_LINE, count - 1)
+                yield PretrainData(
+                    content=line.strip(),
+                    meta=meta
+                )
+            self.logger().info("#lines: %d" % count)
+        else:
+            content = "".join(lines)
+            if not self._read_failed:
+                yield PretrainData(
+                    content=content,
+                    meta=meta
+                )
+
     def read(self) -> Iterable[PretrainData]:
         """
         Loads the data and returns the items one by one.
@@ -224,11 +318,16 @@ class TxtPretrainReader(PretrainReader):
         """
         self.finalize()
 
-        for input_file in self._inputs:
+        for index, input_file in enumerate(self._inputs):
             self.session.current_input = input_file
             self.logger().info("Reading from: " + str(input_file))
+            if self.streaming:
+                for item in self._read_streaming(index):
+                    yield item
+                continue
             try:
-                with open_file(self.session.current_input, mode="rt", encoding=self.encoding, logger=self.logger()) as fp:
+                with open_file(self.session.current_input, mode="rt", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session)) as fp:
+                    prefetch_next(self._inputs[index + 1:], self.session)
                     lines = fp.readlines()
             except KeyboardInterrupt as e:
                 raise e
@@ -283,7 +382,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
     Writer for the plain text files.
     """
 
-    def __init__(self, target: str = None, num_digits: int = 6, buffer_size: int = 1000,
+    def __init__(self, target: str = None, num_digits: int = 6, buffer_size: int = 1000, buffer_bytes: int = 0,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
@@ -294,6 +393,8 @@ class TxtPretrainWriter(StreamPretrainWriter):
         :type num_digits: int
         :param buffer_size: the size of the record buffer (< 1 for unlimited)
         :type buffer_size: int
+        :param buffer_bytes: the maximum size of the buffered content (in characters) before flushing, < 1 for no limit
+        :type buffer_bytes: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logger_name: the name to use for the logger
@@ -305,6 +406,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
         self.target = target
         self.num_digits = num_digits
         self.buffer_size = buffer_size
+        self.buffer_bytes = buffer_bytes
         self._current_output = None
         self._output = None
         self._writer = None
@@ -312,6 +414,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
         self._first_item = True
         self._fname_format = None
         self._buffer = []
+        self._buffered = 0
 
     def name(self) -> str:
         """
@@ -332,8 +435,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
         return "Writes pretrain data to plain text files.\n" \
                + "When providing an output directory, either uses the current session counter as the filename or, " \
                + "if present, the 'id' value from the meta-data.\n" \
-               + "When providing an output file, all incoming content will be concatenated in this one file. " \
-               + "Compression is not available in this case due to the streaming context."
+               + "When providing an output file, all incoming content will be concatenated in this one file."
 
     def _create_argparser(self) -> argparse.ArgumentParser:
         """
@@ -346,6 +448,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
         parser.add_argument("-o", "--output", type=str, help="Path to the directory or file to write to", required=True)
         parser.add_argument("-d", "--num_digits", metavar="NUM", type=int, default=6, help="The number of digits to use for the filenames", required=False)
         parser.add_argument("-b", "--buffer_size", metavar="SIZE", type=int, default=1000, help="The size of the record buffer when concatenating (to improve I/O throughput)", required=False)
+        parser.add_argument("--buffer_bytes", metavar="SIZE", type=parse_size, default=0, help="The maximum size of the buffered content (in characters) when concatenating, flushes the buffer once reached regardless of the number of records; supports K/M/G suffixes; <= 0 for no limit", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -359,6 +462,7 @@ class TxtPretrainWriter(StreamPretrainWriter):
         self.target = ns.output
         self.num_digits = ns.num_digits
         self.buffer_size = ns.buffer_size
+        self.buffer_bytes = ns.buffer_bytes
 
     def initialize(self):
         """
@@ -371,32 +475,61 @@ class TxtPretrainWriter(StreamPretrainWriter):
             self._concatenate = False
         else:
             self._concatenate = True
-            if is_compressed(self.target):
-                raise Exception("Cannot use compression when concatenating due to streaming!")
+        if not self._concatenate and self._sharding_enabled():
+            self.logger().warning("Sharding is not available when writing one file per record, ignoring!")
         self._buffer.clear()
+        self._buffered = 0
+
+    def _open_output(self, output: str):
+        """
+        Opens the output file for writing, closing any previously opened one.
+
+        :param output: the file to write to
+        :type output: str
+        """
+        self._close_output()
+        self.logger().info("Writing to: %s" % output)
+        self._output = open_file(output, mode="wt", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+
+    def _close_output(self):
+        """
+        Closes the output file, if open.
+        """
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+    def _write(self, data: List[PretrainData]):
+        """
+        Writes the data to the current output.
+
+        :param data: the records to write
+        :type data: list
+        """
+        for item in data:
+            if self._shard_is_full():
+                self._open_output(self._shard_next())
+            try:
+                self._shard_written(self._output.write(empty_str_if_none(item.content) + "\n"))
+            except KeyboardInterrupt as e:
+                raise e
+            except:
+                self.logger().exception("Failed to write record: %s" % str(item))
 
     def _flush_buffer(self):
         """
         Writes the buffer content to disk.
         """
         self.logger().debug("flushing buffer: %d" % len(self._buffer))
-        mode = "w" if self._first_item else "a"
         output_file = self.target
         if self.session.options.force_batch and os.path.isdir(output_file):
             output_file = generate_output(self.session.current_input, output_file, ".txt", None)
-        if self._first_item:
-            self.logger().info("Writing to: %s" % output_file)
+        if self._first_item or (output_file != self._shard_base):
+            self._open_output(self._shard_begin(output_file))
         self._first_item = False
-        with open(output_file, mode) as fp:
-            for d in self._buffer:
-                try:
-                    fp.write(d.content)
-                    fp.write("\n")
-                except KeyboardInterrupt as e:
-                    raise e
-                except:
-                    self.logger().exception("Failed to write record: %s" % str(d))
+        self._write(self._buffer)
         self._buffer.clear()
+        self._buffered = 0
 
     def write_stream(self, data: Union[PretrainData, Iterable[PretrainData]]):
         """
@@ -409,9 +542,12 @@ class TxtPretrainWriter(StreamPretrainWriter):
             data = [data]
 
         if self._concatenate:
-            self._buffer.extend(data)
-            if len(self._buffer) >= self.buffer_size:
-                self._flush_buffer()
+            for item in data:
+                self._buffer.append(item)
+                if self.buffer_bytes > 0:
+                    self._buffered += len(empty_str_if_none(item.content)) + 1
+                if (len(self._buffer) >= self.buffer_size) or ((self.buffer_bytes > 0) and (self._buffered >= self.buffer_bytes)):
+                    self._flush_buffer()
         else:
             for d in data:
                 if (d.meta is not None) and ("id" in d.meta):
@@ -422,9 +558,20 @@ class TxtPretrainWriter(StreamPretrainWriter):
                 else:
                     fname = self._fname_format % self.session.count
                 output = generate_output(fname, self.target, ".txt", self.session.options.compression)
-                self.logger().info("Writing to: %s" % output)
-                with open(output, "w") as fp:
-                    fp.write(empty_str_if_none(d.content))
+                self._open_output(output)
+                try:
+                    self._output.write(empty_str_if_none(d.content))
+                finally:
+                    self._close_output()
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        return ".txt"
 
     def finalize(self):
         """
@@ -433,3 +580,4 @@ class TxtPretrainWriter(StreamPretrainWriter):
         super().finalize()
         if len(self._buffer) > 0:
             self._flush_buffer()
+        self._close_output()
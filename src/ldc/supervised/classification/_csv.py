@@ -9,9 +9,10 @@ from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix
-from ldc.api import open_file, generate_output
-from ldc.api.supervised.classification import ClassificationData, ClassificationReader, BatchClassificationWriter
+from ldc.api import open_file, generate_output, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next, parse_size
+from ldc.api.supervised.classification import ClassificationData, ClassificationReader, StreamClassificationWriter
 from ldc.utils import str_to_column_index
+from ldc.csv_utils import ArrowCsvReader, CSV_ENGINE_PYTHON, CSV_ENGINE_PYARROW, CSV_ENGINES, DEFAULT_BLOCK_SIZE
 from ldc.text_utils import empty_str_if_none
 
 
@@ -23,6 +24,7 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_text: str = None, col_label: str = None,
                  col_id: str = None, col_meta: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -41,6 +43,10 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         :type col_meta: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -59,6 +65,8 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         self.idx_id = -1
         self.idx_meta = None
         self.encoding = encoding
+        self.engine = engine
+        self.block_size = block_size
         self._inputs = None
         self._current_input = None
         self._current_reader = None
@@ -106,6 +114,8 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         parser.add_argument("--col_meta", metavar="COL", type=str, default=None, help="The name (or 1-based index) of the columns to store in the meta-data", required=False, nargs="*")
         parser.add_argument("-n", "--no_header", action="store_true", help="For files with no header row", required=False)
         parser.add_argument("--encoding", metavar="ENC", type=str, default=None, help="The encoding to force instead of auto-detecting it, e.g., 'utf-8'", required=False)
+        parser.add_argument("--engine", choices=CSV_ENGINES, default=CSV_ENGINE_PYTHON, help="The engine to use for parsing the files; 'pyarrow' parses blocks of data using multiple threads, reading all cells as strings and skipping rows with an unexpected number of columns", required=False)
+        parser.add_argument("--block_size", metavar="SIZE", type=parse_size, default=DEFAULT_BLOCK_SIZE, help="The number of bytes to parse at a time with the pyarrow engine; supports K/M/G suffixes", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -124,6 +134,8 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         self.col_meta = ns.col_meta
         self.no_header = ns.no_header
         self.encoding = ns.encoding
+        self.engine = ns.engine
+        self.block_size = ns.block_size
 
     def initialize(self):
         """
@@ -156,6 +168,35 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         """
         raise NotImplementedError()
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def _required_columns(self) -> List[Union[str, int]]:
+        """
+        Returns the columns that need to be parsed when using the pyarrow engine.
+
+        :return: the column names or 0-based indices (if no header)
+        :rtype: list
+        """
+        if self.no_header:
+            result = [x for x in [self.idx_text, self.idx_label] if x > -1]
+            if self.col_id is not None:
+                result.append(self.idx_id)
+            if self.idx_meta is not None:
+                result.extend([x for x in self.idx_meta if x > -1])
+            return result
+        else:
+            result = [self.col_text, self.col_label, self.col_id]
+            if self.col_meta is not None:
+                result.extend(self.col_meta)
+            return [x for x in result if x is not None]
+
     def read(self) -> Iterable[ClassificationData]:
         """
         Loads the data and returns the items one by one.
@@ -168,8 +209,17 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
-        self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger())
-        self._current_reader = self._init_reader(self._current_input)
+        if self.engine == CSV_ENGINE_PYARROW:
+            self._current_input = ArrowCsvReader(self._current_input, delimiter=self._get_delimiter(), no_header=self.no_header,
+                                                 as_dict=not self.no_header, columns=self._required_columns(),
+                                                 encoding=self.encoding, block_size=self.block_size,
+                                                 compression_threads=get_compression_threads(self.session),
+                                                 prefetch_size=get_prefetch_size(self.session), logger=self.logger())
+            self._current_reader = self._current_input
+        else:
+            self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session))
+            self._current_reader = self._init_reader(self._current_input)
+        prefetch_next(self._inputs, self.session)
 
         for row in self._current_reader:
             try:
@@ -242,14 +292,14 @@ class AbstractCsvLikeClassificationReader(ClassificationReader, abc.ABC):
             self._current_input = None
 
 
-class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
+class AbstractCsvLikeClassificationWriter(StreamClassificationWriter, abc.ABC):
     """
     Ancestor for writers of CSV-like files.
     """
 
     def __init__(self, target: str = None, no_header: bool = False,
                  col_text: str = None, col_label: str = None, col_id: str = None,
-                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -263,6 +313,8 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
         :type col_label: str
         :param col_id: the (optional) column containing row IDs
         :type col_id: str
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -277,6 +329,8 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
         self._current_output = None
         self._output = None
         self._output_writer = None
+        self.buffer_size = buffer_size
+        self._buffer = []
 
     def _get_output_description(self) -> str:
         """
@@ -300,6 +354,7 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
         parser.add_argument("--col_label", metavar="COL", type=str, default=None, help="The name of the column for the labels", required=False)
         parser.add_argument("--col_id", metavar="COL", type=str, default=None, help="The name of the column for the row IDs (uses 'id' from meta-data)", required=False)
         parser.add_argument("-n", "--no_header", action="store_true", help="For suppressing the header row", required=False)
+        parser.add_argument("-b", "--buffer_size", metavar="SIZE", type=int, default=1000, help="The number of records to buffer before writing them to the output (to improve I/O throughput)", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -311,6 +366,7 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
         """
         super()._apply_args(ns)
         self.target = ns.output
+        self.buffer_size = ns.buffer_size
         self.col_text = ns.col_text
         self.col_label = ns.col_label
         self.col_id = ns.col_id
@@ -343,30 +399,37 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
         """
         raise NotImplementedError()
 
-    def write_batch(self, data: Iterable[ClassificationData]):
+    def _open_output(self, path: str):
         """
-        Saves the data in one go.
+        Opens the specified file for writing and outputs the header row, if required.
 
-        :param data: the data to write as iterable of ClassificationData
-        :type data: Iterable
+        :param path: the file to write to
+        :type path: str
         """
-        if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, self._get_extension()):
-            self.finalize()
-            self._current_output = generate_output(self.session.current_input, self.target, self._get_extension(), self.session.options.compression)
-            self.logger().info("Writing to: " + self._current_output)
-            self._output = open_file(self._current_output, mode="wt")
-            self._output_writer = self._init_writer(self._output)
-            if not self.no_header:
-                row = []
-                if self.col_id is not None:
-                    row.append(self.col_id)
-                if self.col_text is not None:
-                    row.append(self.col_text)
-                if self.col_label is not None:
-                    row.append(self.col_label)
-                self._output_writer.writerow(row)
+        self.logger().info("Writing to: " + path)
+        self._output = open_file(path, mode="wt", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+        self._output_writer = self._init_writer(self._output)
+        if not self.no_header:
+            row = []
+            if self.col_id is not None:
+                row.append(self.col_id)
+            if self.col_text is not None:
+                row.append(self.col_text)
+            if self.col_label is not None:
+                row.append(self.col_label)
+            self._output_writer.writerow(row)
+
+    def _write(self, data: List[ClassificationData]):
+        """
+        Writes the records to the current output.
 
+        :param data: the records to write
+        :type data: list
+        """
         for item in data:
+            if self._shard_is_full():
+                self._output.close()
+                self._open_output(self._shard_next())
             row = []
             if self.col_id is not None:
                 if (item.meta is not None) and ("id" in item.meta):
@@ -381,16 +444,44 @@ class AbstractCsvLikeClassificationWriter(BatchClassificationWriter, abc.ABC):
                 if self.col_label is not None:
                     row.append(empty_str_if_none(item.label))
             try:
-                self._output_writer.writerow(row)
+                self._shard_written(self._output_writer.writerow(row))
             except:
                 print("Failed to write row: %s" % str(row), file=sys.stderr)
                 traceback.print_exc()
 
+    def _flush_buffer(self):
+        """
+        Writes the buffered records to the current output.
+        """
+        self.logger().debug("flushing buffer: %d" % len(self._buffer))
+        self._write(self._buffer)
+        self._buffer.clear()
+
+    def write_stream(self, data: Union[ClassificationData, Iterable[ClassificationData]]):
+        """
+        Saves the data one by one.
+
+        :param data: the data to write
+        :type data: ClassificationData
+        """
+        if isinstance(data, ClassificationData):
+            data = [data]
+
+        if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, self._get_extension()):
+            self.finalize()
+            self._current_output = generate_output(self.session.current_input, self.target, self._get_extension(), self.session.options.compression)
+            self._open_output(self._shard_begin(self._current_output))
+
+        self._buffer.extend(data)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush_buffer()
+
     def finalize(self):
         """
         Finishes the writing, e.g., for closing files or databases.
         """
         if self._output is not None:
+            self._flush_buffer()
             super().finalize()
             self._output_writer = None
             self._output.close()
@@ -405,6 +496,7 @@ class CsvClassificationReader(AbstractCsvLikeClassificationReader):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_text: str = None, col_label: str = None,
                  col_id: str = None, col_meta: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -423,6 +515,10 @@ class CsvClassificationReader(AbstractCsvLikeClassificationReader):
         :type col_meta: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -431,6 +527,7 @@ class CsvClassificationReader(AbstractCsvLikeClassificationReader):
         super().__init__(source=source, source_list=source_list,
                          no_header=no_header, col_text=col_text, col_label=col_label,
                          col_id=col_id, col_meta=col_meta, encoding=encoding,
+                         engine=engine, block_size=block_size,
                          logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
@@ -482,6 +579,15 @@ class CsvClassificationReader(AbstractCsvLikeClassificationReader):
         else:
             return csv.DictReader(current_input)
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        return ","
+
 
 class CsvClassificationWriter(AbstractCsvLikeClassificationWriter):
     """
@@ -490,7 +596,7 @@ class CsvClassificationWriter(AbstractCsvLikeClassificationWriter):
 
     def __init__(self, target: str = None, no_header: bool = False,
                  col_text: str = None, col_label: str = None, col_id: str = None,
-                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -504,13 +610,15 @@ class CsvClassificationWriter(AbstractCsvLikeClassificationWriter):
         :type col_label: str
         :param col_id: the (optional) column containing row IDs
         :type col_id: str
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(target=target, no_header=no_header, col_text=col_text, col_label=col_label,
-                         col_id=col_id, logger_name=logger_name, logging_level=logging_level)
+                         col_id=col_id, buffer_size=buffer_size, logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
         """
@@ -567,6 +675,7 @@ class TsvClassificationReader(AbstractCsvLikeClassificationReader):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_text: str = None, col_label: str = None,
                  col_id: str = None, col_meta: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -585,6 +694,10 @@ class TsvClassificationReader(AbstractCsvLikeClassificationReader):
         :type col_meta: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -593,6 +706,7 @@ class TsvClassificationReader(AbstractCsvLikeClassificationReader):
         super().__init__(source=source, source_list=source_list,
                          no_header=no_header, col_text=col_text, col_label=col_label,
                          col_id=col_id, col_meta=col_meta, encoding=encoding,
+                         engine=engine, block_size=block_size,
                          logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
@@ -644,6 +758,15 @@ class TsvClassificationReader(AbstractCsvLikeClassificationReader):
         else:
             return csv.DictReader(current_input, delimiter='\t')
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        return '\t'
+
 
 class TsvClassificationWriter(AbstractCsvLikeClassificationWriter):
     """
@@ -652,7 +775,7 @@ class TsvClassificationWriter(AbstractCsvLikeClassificationWriter):
 
     def __init__(self, target: str = None, no_header: bool = False,
                  col_text: str = None, col_label: str = None, col_id: str = None,
-                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -666,13 +789,15 @@ class TsvClassificationWriter(AbstractCsvLikeClassificationWriter):
         :type col_label: str
         :param col_id: the (optional) column containing row IDs
         :type col_id: str
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(target=target, no_header=no_header, col_text=col_text, col_label=col_label,
-                         col_id=col_id, logger_name=logger_name, logging_level=logging_level)
+                         col_id=col_id, buffer_size=buffer_size, logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
         """
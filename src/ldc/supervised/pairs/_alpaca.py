@@ -5,7 +5,7 @@ from typing import Iterable, List, Union
 from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
-from ldc.api import open_file, generate_output
+from ldc.api import open_file, generate_output, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next
 from ldc.api.supervised.pairs import PairData, PairReader, BatchPairWriter
 
 
@@ -97,7 +97,8 @@ class AlpacaReader(PairReader):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
-        self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger())
+        self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session))
+        prefetch_next(self._inputs, self.session)
 
         array = json.load(self._current_input)
         for item in array:
@@ -195,6 +196,38 @@ class AlpacaWriter(BatchPairWriter):
         self.pretty_print = ns.pretty_print
         self.ensure_ascii = ns.ensure_ascii
 
+    def _open_output(self, path: str):
+        """
+        Opens the specified file for writing.
+
+        :param path: the file to write to
+        :type path: str
+        """
+        self.logger().info("Writing to: " + path)
+        self._output = open_file(path, mode="wt", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+
+    def _write_dicts(self, dicts: List[dict]):
+        """
+        Writes the dictionaries as JSON array, splitting them across shards if necessary.
+
+        :param dicts: the dictionaries to write
+        :type dicts: list
+        """
+        indent = 2 if self.pretty_print else None
+        shard = []
+        for d in dicts:
+            if self._shard_is_full():
+                json.dump(shard, self._output, ensure_ascii=self.ensure_ascii, indent=indent)
+                shard = []
+                self._output.close()
+                self._open_output(self._shard_next())
+            shard.append(d)
+            if self.shard_bytes > 0:
+                self._shard_written(len(json.dumps(d, ensure_ascii=self.ensure_ascii, indent=indent)))
+            else:
+                self._shard_written()
+        json.dump(shard, self._output, ensure_ascii=self.ensure_ascii, indent=indent)
+
     def write_batch(self, data: Iterable[PairData]):
         """
         Saves the data in one go.
@@ -205,12 +238,19 @@ class AlpacaWriter(BatchPairWriter):
         if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, ".json"):
             self.finalize()
             self._current_output = generate_output(self.session.current_input, self.target, ".json", self.session.options.compression)
-            self.logger().info("Writing to: " + self._current_output)
-            self._output = open_file(self._current_output, mode="wt")
+            self._open_output(self._shard_begin(self._current_output))
 
         dicts = [x.to_dict() for x in data]
-        indent = 2 if self.pretty_print else None
-        json.dump(dicts, self._output, ensure_ascii=self.ensure_ascii, indent=indent)
+        self._write_dicts(dicts)
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        return ".json"
 
     def finalize(self):
         """
@@ -1,9 +1,19 @@
 import copy
+import itertools
+import os
 import re
 import string
-from typing import List, Tuple, Optional, Dict, Union
+from typing import Iterable, Iterator, List, Tuple, Optional, Dict, Union
+
+import numpy as np
 
 from ldc.core import DEFAULT_END_CHARS, DEFAULT_QUOTE_CHARS
+from ldc.pattern_utils import PatternSet
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
 
 
 def prune_lines(lines: List[str], min_len: int = 1) -> List[str]:
@@ -25,23 +35,23 @@ def prune_lines(lines: List[str], min_len: int = 1) -> List[str]:
     return result
 
 
-def assemble_preformatted(lines: List[str], end_chars: str = DEFAULT_END_CHARS,
-                          quote_chars: str = DEFAULT_QUOTE_CHARS) -> List[str]:
+def iter_assemble_preformatted(lines: Iterable[str], end_chars: str = DEFAULT_END_CHARS,
+                               quote_chars: str = DEFAULT_QUOTE_CHARS) -> Iterator[str]:
     """
-    Assembles preformatted lines into full sentences.
+    Assembles preformatted lines into full sentences, one line at a time.
 
     :param lines: the lines to process
-    :type lines: list
+    :type lines: Iterable
     :param end_chars: the characters that end a sentence
     :type end_chars: str
     :param quote_chars: the quote characters to use
     :type quote_chars: str
-    :return: the updated lines
-    :rtype: list
+    :return: the assembled lines
+    :rtype: Iterator
     """
-    result = []
     new_sentence = False
-    buffer = None
+    # the parts of the current sentence, joined only once complete
+    buffer = []
 
     for line in lines:
         line = line.strip()
@@ -64,78 +74,136 @@ def assemble_preformatted(lines: List[str], end_chars: str = DEFAULT_END_CHARS,
         if new_sentence:
             new_sentence = False
             if len(line) > 0:
-                if buffer is None:
-                    buffer = line
-                else:
-                    buffer += " " + line
-            if buffer is not None:
-                result.append(buffer)
-                buffer = None
+                buffer.append(line)
+            if len(buffer) > 0:
+                yield " ".join(buffer)
+                buffer = []
         else:
-            if buffer is None:
-                buffer = line
-            else:
-                buffer += " " + line
+            buffer.append(line)
 
-    if buffer is not None:
-        result.append(buffer)
+    if len(buffer) > 0:
+        yield " ".join(buffer)
 
-    prune_lines(result)
 
-    return result
-
-
-def split_into_sentences(lines: List[str], end_chars: str = DEFAULT_END_CHARS) -> List[str]:
+def assemble_preformatted(lines: List[str], end_chars: str = DEFAULT_END_CHARS,
+                          quote_chars: str = DEFAULT_QUOTE_CHARS) -> List[str]:
     """
-    Splits text lines into separate sentences.
+    Assembles preformatted lines into full sentences.
 
     :param lines: the lines to process
     :type lines: list
     :param end_chars: the characters that end a sentence
     :type end_chars: str
+    :param quote_chars: the quote characters to use
+    :type quote_chars: str
     :return: the updated lines
     :rtype: list
     """
+    return list(iter_assemble_preformatted(lines, end_chars=end_chars, quote_chars=quote_chars))
+
+
+_END_CHARS_REGEXPS = dict()
+""" the cache for the compiled character classes of end chars. """
+
+
+def _end_chars_regexp(end_chars: str):
+    """
+    Returns the compiled character class for the end chars.
+
+    :param end_chars: the characters that end a sentence
+    :type end_chars: str
+    :return: the compiled regexp
+    """
+    if end_chars not in _END_CHARS_REGEXPS:
+        _END_CHARS_REGEXPS[end_chars] = re.compile("[" + "".join(re.escape(c) for c in end_chars) + "]")
+    return _END_CHARS_REGEXPS[end_chars]
+
+
+def split_line_into_sentences(line: str, end_chars: str = DEFAULT_END_CHARS) -> List[str]:
+    """
+    Splits a single text line into separate sentences in a single pass, i.e., without
+    re-slicing the remainder of the line after each sentence.
+
+    :param line: the line to split
+    :type line: str
+    :param end_chars: the characters that end a sentence
+    :type end_chars: str
+    :return: the sentences
+    :rtype: list
+    """
     result = []
+    regexp = _end_chars_regexp(end_chars) if (len(end_chars) > 0) else None
+    # the remainder of the line to process: line[start:end]
+    start = 0
+    end = len(line)
+    while start < end:
+        m = None if (regexp is None) else regexp.search(line, start, end)
+        if m is None:
+            result.append(line[start:end].strip())
+            break
+        pos = m.start()
+        result.append(line[start:pos + 1].strip())
+        # strip the remainder
+        start = pos + 1
+        while (start < end) and line[start].isspace():
+            start += 1
+        while (end > start) and line[end - 1].isspace():
+            end -= 1
+        # dangling char?
+        if end - start == 1:
+            result[-1] += line[start:end]
+            break
+
+    return prune_lines(result)
+
+
+def iter_split_into_sentences(lines: Iterable[str], end_chars: str = DEFAULT_END_CHARS) -> Iterator[str]:
+    """
+    Splits text lines into separate sentences, one line at a time.
 
+    :param lines: the lines to process
+    :type lines: Iterable
+    :param end_chars: the characters that end a sentence
+    :type end_chars: str
+    :return: the sentences
+    :rtype: Iterator
+    """
     for line in lines:
-        while len(line) > 0:
-            pos = len(line)
-            for c in end_chars:
-                if c in line:
-                    pos = min(pos, line.index(c))
-            if pos < len(line):
-                result.append(line[0:pos + 1].strip())
-                line = line[pos + 1:].strip()
-                # dangling char?
-                if len(line) == 1:
-                    result[-1] += line
-                    line = ""
-            else:
-                result.append(line.strip())
-                line = ""
+        for sentence in split_line_into_sentences(line, end_chars=end_chars):
+            yield sentence
 
-    result = prune_lines(result)
 
-    return result
+def split_into_sentences(lines: List[str], end_chars: str = DEFAULT_END_CHARS) -> List[str]:
+    """
+    Splits text lines into separate sentences.
 
+    :param lines: the lines to process
+    :type lines: list
+    :param end_chars: the characters that end a sentence
+    :type end_chars: str
+    :return: the updated lines
+    :rtype: list
+    """
+    return list(iter_split_into_sentences(lines, end_chars=end_chars))
 
-def combine_sentences(sentences: List[str], max_sentences: int) -> List[str]:
+
+def iter_combine_sentences(sentences: Iterable[str], max_sentences: int) -> Iterator[str]:
     """
     Combines the lines (each representing a single sentence) into lines with at
-    most the specified number of sentences.
+    most the specified number of sentences, one line at a time.
 
     :param sentences: the sentences to combine
-    :type sentences: list
+    :type sentences: Iterable
     :param max_sentences: the maximum number of sentences per output line
     :type max_sentences: int
     :return: the new lines
-    :rtype: list
+    :rtype: Iterator
     """
     if max_sentences <= 1:
-        return sentences
+        for sentence in sentences:
+            yield sentence
+        return
 
-    result = []
     current = []
     for sentence in sentences:
         if len(current) < max_sentences:
@@ -145,15 +213,32 @@ def combine_sentences(sentences: List[str], max_sentences: int) -> List[str]:
                     sentence += "."
             current.append(sentence)
         else:
-            result.append(" ".join(current))
+            combined = " ".join(current)
+            if len(combined.strip()) > 1:
+                yield combined
             current = []
 
     if len(current) > 0:
-        result.append(" ".join(current))
+        combined = " ".join(current)
+        if len(combined.strip()) > 1:
+            yield combined
 
-    result = prune_lines(result)
 
-    return result
+def combine_sentences(sentences: List[str], max_sentences: int) -> List[str]:
+    """
+    Combines the lines (each representing a single sentence) into lines with at
+    most the specified number of sentences.
+
+    :param sentences: the sentences to combine
+    :type sentences: list
+    :param max_sentences: the maximum number of sentences per output line
+    :type max_sentences: int
+    :return: the new lines
+    :rtype: list
+    """
+    if max_sentences <= 1:
+        return sentences
+    return list(iter_combine_sentences(sentences, max_sentences))
 
 
 def find_word_boundary(s: str, pos: int, before: bool) -> int:
@@ -185,66 +270,223 @@ def find_word_boundary(s: str, pos: int, before: bool) -> int:
     return result
 
 
-def apply_max_length(lines: List[str], max_length: int) -> List[str]:
+_MAX_WHITESPACE = 0x3000
+""" the largest code point of a whitespace character (ideographic space). """
+
+_WHITESPACE = np.array([chr(x).isspace() for x in range(_MAX_WHITESPACE + 2)])
+""" lookup table for whitespace characters, the last entry stands for all characters above. """
+
+
+def tokenizers_available() -> bool:
+    """
+    Returns whether tokenizers (tokenizers package) are available for counting tokens.
+
+    :return: True if available
+    :rtype: bool
+    """
+    return Tokenizer is not None
+
+
+def load_tokenizer(path: str):
+    """
+    Loads the tokenizer from the specified local file, e.g., the tokenizer.json file
+    of a huggingface model.
+
+    :param path: the tokenizer file to load
+    :type path: str
+    :return: the tokenizer
+    """
+    if Tokenizer is None:
+        raise Exception("The tokenizers package is not installed, cannot load tokenizer: %s" % path)
+    if not os.path.exists(path):
+        raise Exception("Tokenizer file does not exist: %s" % path)
+    return Tokenizer.from_file(path)
+
+
+def word_offsets(line: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Determines the start and end offsets of the words (separated by whitespace) in the line.
+
+    :param line: the line to process
+    :type line: str
+    :return: the tuple of start and end offsets
+    :rtype: tuple
+    """
+    codes = np.frombuffer(line.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    word = ~_WHITESPACE[np.minimum(codes, _MAX_WHITESPACE + 1)]
+    changes = np.diff(word.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
+
+def _token_positions(starts: np.ndarray, offsets: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the tokens per word and turns them into cumulative positions, i.e., the number of
+    tokens before each word and up to the end of each word. A token gets assigned to the word
+    that its last character belongs to.
+
+    :param starts: the start offsets of the words
+    :type starts: np.ndarray
+    :param offsets: the character offsets of the tokens
+    :type offsets: list
+    :return: the tuple of start and end positions
+    :rtype: tuple
+    """
+    offsets = np.fromiter(itertools.chain.from_iterable(offsets), dtype=np.int64, count=2 * len(offsets)).reshape((-1, 2))
+    offsets = offsets[offsets[:, 1] > offsets[:, 0]]
+    words = np.maximum(np.searchsorted(starts, offsets[:, 1] - 1, side="right") - 1, 0)
+    counts = np.bincount(words, minlength=len(starts))
+    ends = np.cumsum(counts)
+    return ends - counts, ends
+
+
+def _chunk_line(line: str, starts: np.ndarray, ends: np.ndarray, pos_start: np.ndarray, pos_end: np.ndarray,
+                max_length: int, overlap: int, split_words: bool) -> List[str]:
+    """
+    Chunks the line at the word boundaries. The positions determine the length of a chunk,
+    i.e., a chunk from word i to word j has a length of pos_end[j] - pos_start[i].
+
+    :param line: the line to chunk
+    :type line: str
+    :param starts: the start offsets of the words in the line
+    :type starts: np.ndarray
+    :param ends: the end offsets of the words in the line
+    :type ends: np.ndarray
+    :param pos_start: the (ascending) start positions of the words
+    :type pos_start: np.ndarray
+    :param pos_end: the (ascending) end positions of the words
+    :type pos_end: np.ndarray
+    :param max_length: the maximum length of a chunk
+    :type max_length: int
+    :param overlap: the maximum length of the words from the end of a chunk to repeat at the start of the next one
+    :type overlap: int
+    :param split_words: whether to split words that exceed the maximum length (positions are characters)
+    :type split_words: bool
+    :return: the chunks
+    :rtype: list
+    """
+    result = []
+    starts = starts.tolist()
+    ends = ends.tolist()
+    # the last word that fits into a chunk starting at each of the words
+    lasts = (np.searchsorted(pos_end, pos_start + max_length, side="right") - 1).tolist()
+    num = len(starts)
+    i = 0
+    while i < num:
+        j = lasts[i]
+        if j < i:
+            # word on its own exceeds the maximum length
+            if split_words:
+                for n in range(starts[i], ends[i], max_length):
+                    result.append(line[n:min(n + max_length, ends[i])])
+            else:
+                result.append(line[starts[i]:ends[i]])
+            i += 1
+            continue
+        result.append(line[starts[i]:ends[j]])
+        if (overlap > 0) and (j + 1 < num):
+            i = max(i + 1, int(np.searchsorted(pos_start, pos_end[j] - overlap, side="left")))
+        else:
+            i = j + 1
+    return result
+
+
+def apply_max_length(lines: List[str], max_length: int, overlap: int = 0, tokenizer=None) -> List[str]:
     """
     Ensures that no line is longer than the specified maximum length.
-    If a line should be longer, it is split at the word boundary below the limit.
+    If a line should be longer, it is split at the word boundaries (whitespace) below the limit,
+    based on the offsets of the words, i.e., the whitespace between the words of a chunk is preserved.
+    The length is measured in characters or, if a tokenizer is supplied, in tokens. In the latter
+    case, all lines get encoded in a single batch and the tokens are counted in the context of the
+    whole line, i.e., encoding a chunk on its own can result in slightly different counts at its start.
+    Words that exceed the limit on their own get split when measuring characters and are output as is
+    when measuring tokens.
 
     :param lines: the lines to process
     :type lines: list
     :param max_length: the maximum length for a line, <= 0 for unbounded
     :type max_length: int
+    :param overlap: the maximum length of the words from the end of a chunk to repeat at the start of the next chunk of the same line, <= 0 for no overlap
+    :type overlap: int
+    :param tokenizer: the tokenizer to use for counting tokens instead of characters (tokenizers.Tokenizer), see load_tokenizer
     :return: the processed lines
-    :rtype: int
+    :rtype: list
     """
     if max_length <= 0:
         return lines
+    if overlap >= max_length:
+        raise Exception("Overlap must be smaller than the maximum length: overlap=%d, max_length=%d" % (overlap, max_length))
+
+    if tokenizer is None:
+        offsets = None
+    else:
+        offsets = [x.offsets for x in tokenizer.encode_batch(lines, add_special_tokens=False)]
 
     result = []
-    for line in lines:
-        line = line.strip()
-        while len(line) > 0:
-            if len(line) > max_length:
-                parts = line.split()
-                line = ""
-                for part in parts:
-                    if len(line) + len(part) + 1 <= max_length:
-                        line += " " + part
-                    else:
-                        result.append(line.strip())
-                        line = ""
-                if len(line) > 0:
-                    result.append(line)
-                    line = ""
-            else:
+    for index, line in enumerate(lines):
+        if (offsets is None) and (len(line) <= max_length):
+            line = line.strip()
+            if len(line) > 0:
                 result.append(line)
-                line = ""
+            continue
+        starts, ends = word_offsets(line)
+        if len(starts) == 0:
+            continue
+        if offsets is None:
+            pos_start, pos_end = starts, ends
+        else:
+            pos_start, pos_end = _token_positions(starts, offsets[index])
+        if pos_end[-1] - pos_start[0] <= max_length:
+            result.append(line[starts[0]:ends[-1]])
+        else:
+            result.extend(_chunk_line(line, starts, ends, pos_start, pos_end, max_length, overlap, offsets is None))
     return result
 
 
-def remove_patterns(lines: List[str], expr_remove: List[str]) -> Tuple[List[str], int]:
+def iter_remove_patterns(lines: Iterable[str], expr_remove: Union[List[str], PatternSet]) -> Iterator[str]:
+    """
+    Removes the patterns from the lines (inline), one line at a time.
+
+    :param lines: the lines to process
+    :type lines: Iterable
+    :param expr_remove: the list of regular expression for removing substrings (uses re.sub(expr, "", line)) or the precompiled patterns
+    :type expr_remove: list or PatternSet
+    :return: the processed lines
+    :rtype: Iterator
+    """
+    if not isinstance(expr_remove, PatternSet):
+        expr_remove = PatternSet(expr_remove)
+    for line in lines:
+        yield expr_remove.sub(line)
+
+
+def remove_patterns(lines: List[str], expr_remove: Union[List[str], PatternSet]) -> Tuple[List[str], int]:
     """
     Removes all lines that match the patterns (inline).
 
     :param lines: the lines to process
     :type lines: list
-    :param expr_remove: the list of regular expression for removing substrings (uses re.sub(expr, "", line))
-    :type expr_remove: list
+    :param expr_remove: the list of regular expression for removing substrings (uses re.sub(expr, "", line)) or the precompiled patterns
+    :type expr_remove: list or PatternSet
     :return: the tuple of processed lines and counter of how many lines were affected
     :rtype: tuple
     """
-    result = []
-    affected = 0
-    for i in range(len(lines)):
-        new_line = lines[i]
-        for expr in expr_remove:
-            new_line = re.sub(expr, "", new_line)
-        if len(lines[i]) != len(new_line):
-            result.append(new_line)
-            affected += 1
-        else:
-            result.append(lines[i])
-    return result, affected
+    if not isinstance(expr_remove, PatternSet):
+        expr_remove = PatternSet(expr_remove)
+    return expr_remove.sub_lines(lines)
+
+
+def iter_remove_empty(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Skips empty lines, one line at a time.
+
+    :param lines: the lines to process
+    :type lines: Iterable
+    :return: the non-empty lines
+    :rtype: Iterator
+    """
+    for line in lines:
+        if len(line.strip()) > 0:
+            yield line
 
 
 def remove_empty(lines: List[str]) -> List[str]:
@@ -256,27 +498,22 @@ def remove_empty(lines: List[str]) -> List[str]:
     :return: the updated list
     :rtype: list
     """
-    result = []
-    for line in lines:
-        if len(line.strip()) > 0:
-            result.append(line)
-    return result
+    return list(iter_remove_empty(lines))
 
 
-def remove_blocks(lines: List[str], block_removal_start: List[str], block_removal_end: List[str]) -> List[str]:
+def iter_remove_blocks(lines: Iterable[str], block_removal_start: List[str], block_removal_end: List[str]) -> Iterator[str]:
     """
-    Removes blocks of text between the defined start/end strings (incl these strings).
+    Removes blocks of text between the defined start/end strings (incl these strings), one line at a time.
 
     :param lines: the lines to process
-    :type lines: list
+    :type lines: Iterable
     :param block_removal_start: the strings signifying the start of a block
     :type block_removal_start: list
     :param block_removal_end: the strings signifying the end of a block
     :type block_removal_end: list
-    :return: the updated lines
-    :rtype: list
+    :return: the lines outside the blocks
+    :rtype: Iterator
     """
-    result = []
     in_block = False
 
     for line in lines:
@@ -291,39 +528,43 @@ def remove_blocks(lines: List[str], block_removal_start: List[str], block_remova
                     in_block = True
                     break
             if not in_block:
-                result.append(line)
+                yield line
 
-    return result
 
+def remove_blocks(lines: List[str], block_removal_start: List[str], block_removal_end: List[str]) -> List[str]:
+    """
+    Removes blocks of text between the defined start/end strings (incl these strings).
 
-def replace_patterns(lines: List[str], find: List[str], replace: List[str]) -> Tuple[List[str], int]:
+    :param lines: the lines to process
+    :type lines: list
+    :param block_removal_start: the strings signifying the start of a block
+    :type block_removal_start: list
+    :param block_removal_end: the strings signifying the end of a block
+    :type block_removal_end: list
+    :return: the updated lines
+    :rtype: list
+    """
+    return list(iter_remove_blocks(lines, block_removal_start, block_removal_end))
+
+
+def replace_patterns(lines: List[str], find: Union[List[str], PatternSet], replace: List[str] = None) -> Tuple[List[str], int]:
     """
     Replaces the regexp patterns with the replacement strings.
 
     :param lines: the lines to process
     :type lines: list
-    :param find: the list of regular expression for finding substrings to replace (uses re.sub(find, replace, line))
-    :type find: list
-    :param replace: the list of replacement strings
+    :param find: the list of regular expression for finding substrings to replace (uses re.sub(find, replace, line)) or the precompiled patterns (incl replacements)
+    :type find: list or PatternSet
+    :param replace: the list of replacement strings, ignored if find is a PatternSet
     :type replace: list
     :return: the tuple of processed lines and counter of how many lines were affected
     :rtype: tuple
     """
-    if len(find) != len(replace):
-        raise Exception("Number of regexp to find strings and replacement strings differ: %d != %d" % (len(find), len(replace)))
-
-    result = []
-    affected = 0
-    for i in range(len(lines)):
-        new_line = lines[i]
-        for n, f in enumerate(find):
-            new_line = re.sub(f, replace[n], new_line)
-        if lines[i] != new_line:
-            result.append(new_line)
-            affected += 1
-        else:
-            result.append(lines[i])
-    return result, affected
+    if not isinstance(find, PatternSet):
+        if len(find) != len(replace):
+            raise Exception("Number of regexp to find strings and replacement strings differ: %d != %d" % (len(find), len(replace)))
+        find = PatternSet(find, replace)
+    return find.sub_lines(lines)
 
 
 def empty_str_if_none(s: Union[Optional[str], List[str], Dict[str, str]]) -> Union[str, List[str], Dict[str, str]]:
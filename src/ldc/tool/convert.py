@@ -1,4 +1,5 @@
 import argparse
+import functools
 import logging
 import sys
 import traceback
@@ -9,9 +10,10 @@ from seppl import enumerate_plugins, is_help_requested, split_args, args_to_obje
 from seppl.io import execute, Writer
 from wai.logging import init_logging, set_logging_level, add_logging_level, LOGGING_LEVELS
 from ldc.core import check_compatibility, Session, ENV_LLM_LOGLEVEL
-from ldc.api import Filter, MultiFilter
+from ldc.api import Filter, MultiFilter, is_stateful
 from ldc.help import generate_plugin_usage
-from ldc.api import COMPRESSION_FORMATS, Reader
+from ldc.api import COMPRESSION_FORMATS, Reader, parse_size, load_encoding_map
+from ldc.execution import execute_parallel, execute_per_file, DEFAULT_CHUNK_SIZE
 from ldc.registry import available_readers, available_filters, available_writers
 
 
@@ -49,7 +51,10 @@ def _print_usage(plugin_details: bool = False):
     logging_levels = ",".join(LOGGING_LEVELS)
     print(cmd + " [-h|--help|--help-all|-help-plugin NAME] [-u INTERVAL]")
     print(prefix + "[-c {%s}]" % compression_formats)
+    print(prefix + "[--compression_level LEVEL] [--compression_threads NUM]")
+    print(prefix + "[--prefetch SIZE] [--encoding_map FILE]")
     print(prefix + "[-l {%s}]" % logging_levels)
+    print(prefix + "[-j NUM] [--chunk_size NUM] [--preserve_order] [--per_file]")
     print(prefix + "reader")
     print(prefix + "[filter [filter [...]]]")
     print(prefix + "[writer]")
@@ -71,8 +76,30 @@ def _print_usage(plugin_details: bool = False):
     print("  -c {%s}, --compression {%s}" % (compression_formats, compression_formats))
     print("                          the type of compression to use when only providing an output")
     print("                          directory to the writer (default: None)")
+    print("  --compression_level LEVEL")
+    print("                          the compression level to use for outputs (gz/bz2: 1-9, xz: 0-9,")
+    print("                          zstd: 1-22), uses the format's default if not specified")
+    print("  --compression_threads NUM")
+    print("                          the number of threads to use for compressing outputs (zstd uses")
+    print("                          NUM worker threads, the other formats a background thread) and")
+    print("                          for decompressing inputs in the background (default: 0)")
+    print("  --prefetch SIZE         the number of bytes to read (and decompress) ahead from the input")
+    print("                          files in a background thread, also starts reading the next input")
+    print("                          file early; supports K/M/G suffixes (default: 0)")
+    print("  --encoding_map FILE     the per-file encodings (.jsonl or .csv) as generated by")
+    print("                          llm-file-encoding, used by readers instead of auto-detection")
     print("  -b, --force_batch       processes the data in batches")
     print("  -U, --unescape_unicode  unescape unicode characters in the command-line")
+    print("  -j NUM, --num_processes NUM")
+    print("                          the number of processes to run the filter(s) in; pipelines with")
+    print("                          filters that keep state across records (e.g., skip-duplicate-text)")
+    print("                          get executed serially (default: 1)")
+    print("  --chunk_size NUM        the number of records to send to a process at a time (default: %d)" % DEFAULT_CHUNK_SIZE)
+    print("  --preserve_order        preserves the order of the records within an input when using")
+    print("                          multiple processes")
+    print("  --per_file              processes each input file separately with its own pipeline,")
+    print("                          using the number of processes specified with -j; the writer")
+    print("                          must output to a directory, generating one output per input file")
     print()
     if plugin_details:
         for plugin in sorted(_available_plugins().keys()):
@@ -108,12 +135,23 @@ def _parse_args(args: List[str], require_reader: bool = True, require_writer: bo
     parser = argparse.ArgumentParser()
     add_logging_level(parser)
     parser.add_argument("-c", "--compression", default=None, choices=COMPRESSION_FORMATS)
+    parser.add_argument("--compression_level", type=int, default=None)
+    parser.add_argument("--compression_threads", type=int, default=0)
+    parser.add_argument("--prefetch", type=parse_size, default=0)
+    parser.add_argument("--encoding_map", type=str, default=None)
     parser.add_argument("-u", "--update_interval", type=int, default=DEFAULT_UPDATE_INTERVAL)
     parser.add_argument("-b", "--force_batch", action="store_true")
     parser.add_argument("-U", "--unescape_unicode", action="store_true")
+    parser.add_argument("-j", "--num_processes", type=int, default=1)
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--preserve_order", action="store_true")
+    parser.add_argument("--per_file", action="store_true")
     session = Session(options=parser.parse_args(parsed[""] if ("" in parsed) else []))
     session.logger = logging.getLogger(CONVERT)
     set_logging_level(session.logger, session.options.logging_level)
+    if session.options.encoding_map is not None:
+        num_encodings = load_encoding_map(session.options.encoding_map)
+        session.logger.info("Loaded %d encoding(s) from: %s" % (num_encodings, session.options.encoding_map))
 
     plugins = args_to_objects(parsed, _available_plugins(), allow_global_options=True, unescape=session.options.unescape_unicode)
     reader = None
@@ -162,6 +200,18 @@ def _parse_args(args: List[str], require_reader: bool = True, require_writer: bo
     return reader, filter_, writer, session
 
 
+def _stateful_names(filter_) -> List[str]:
+    """
+    Returns the names of the filters that keep state across records.
+
+    :param filter_: the filter (chain) to check
+    :return: the names of the stateful filters
+    :rtype: list
+    """
+    filters = filter_.filters if isinstance(filter_, MultiFilter) else [filter_]
+    return [x.name() for x in filters if is_stateful(x)]
+
+
 def main(args=None):
     """
     The main method for parsing command-line arguments.
@@ -181,7 +231,17 @@ def main(args=None):
 
     session.logger.info("options: %s" % str(_args))
 
-    execute(reader, filter_, writer, session)
+    if session.options.per_file:
+        execute_per_file(functools.partial(_parse_args, _args, require_writer=False), session.options.num_processes)
+    elif (session.options.num_processes > 1) and (filter_ is not None) and is_stateful(filter_):
+        session.logger.warning("Filter(s) keep state across records, ignoring -j %d and executing serially: %s"
+                               % (session.options.num_processes, ", ".join(_stateful_names(filter_))))
+        execute(reader, filter_, writer, session)
+    elif (session.options.num_processes > 1) and (filter_ is not None):
+        execute_parallel(reader, filter_, writer, session, session.options.num_processes,
+                         chunk_size=session.options.chunk_size, preserve_order=session.options.preserve_order)
+    else:
+        execute(reader, filter_, writer, session)
 
 
 def sys_main() -> int:
@@ -1,10 +1,13 @@
 import argparse
+import csv
+import json
 import logging
 import os
 import sys
 import traceback
 
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 
 from wai.logging import init_logging, set_logging_level, add_logging_level
 from seppl.io import locate_files
@@ -16,7 +19,68 @@ FILE_ENCODING = "llm-file-encoding"
 _logger = logging.getLogger(FILE_ENCODING)
 
 
-def determine(input_files: List[str], max_check_length: int = None, output_file: str = None):
+OUTPUT_FORMAT_TEXT = "text"
+OUTPUT_FORMAT_JSONL = "jsonl"
+OUTPUT_FORMAT_CSV = "csv"
+OUTPUT_FORMATS = [
+    OUTPUT_FORMAT_TEXT,
+    OUTPUT_FORMAT_JSONL,
+    OUTPUT_FORMAT_CSV,
+]
+
+DEFAULT_UPDATE_INTERVAL = 1000
+
+
+def _determine_file(input_file: str, max_check_length: Optional[int]) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Determines the encoding of a single file.
+
+    :param input_file: the file to check
+    :type input_file: str
+    :param max_check_length: the maximum number of bytes to use for determining the file encoding, auto-mode if None
+    :type max_check_length: int
+    :return: the tuple of file, encoding and error message (None if successful)
+    :rtype: tuple
+    """
+    try:
+        return input_file, determine_encoding(input_file, max_check_length=max_check_length), None
+    except KeyboardInterrupt as e:
+        raise e
+    except:
+        return input_file, None, traceback.format_exc()
+
+
+def _write_result(output, output_format: str, csv_writer, input_file: str, encoding: Optional[str]):
+    """
+    Outputs the determined encoding.
+
+    :param output: the file-like object to write to
+    :param output_format: the format to use
+    :type output_format: str
+    :param csv_writer: the CSV writer to use, only used for CSV format
+    :param input_file: the file that was checked
+    :type input_file: str
+    :param encoding: the determined encoding
+    :type encoding: str
+    """
+    if output_format == OUTPUT_FORMAT_TEXT:
+        output.write(input_file)
+        output.write("\n")
+        output.write("    ")
+        output.write(str(encoding))
+        output.write("\n")
+    elif output_format == OUTPUT_FORMAT_JSONL:
+        output.write(json.dumps({"file": input_file, "encoding": encoding}, ensure_ascii=False))
+        output.write("\n")
+    elif output_format == OUTPUT_FORMAT_CSV:
+        csv_writer.writerow([input_file, "" if (encoding is None) else encoding])
+    else:
+        raise Exception("Unhandled output format: %s" % output_format)
+
+
+def determine(input_files: List[str], max_check_length: int = None, output_file: str = None,
+              output_format: str = OUTPUT_FORMAT_TEXT, num_processes: int = 1,
+              update_interval: int = DEFAULT_UPDATE_INTERVAL):
     """
     Determines the file encoding for the list of text files.
 
@@ -26,7 +90,17 @@ def determine(input_files: List[str], max_check_length: int = None, output_file:
     :type max_check_length: int
     :param output_file: the file to store the result in, prints to stdout if None
     :type output_file: str
+    :param output_format: the format to output the encodings in (text/jsonl/csv)
+    :type output_format: str
+    :param num_processes: the number of processes to use for checking the files
+    :type num_processes: int
+    :param update_interval: the number of files after which to output progress information, <= 0 for none
+    :type update_interval: int
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise Exception("Unknown output format: %s" % output_format)
+    if num_processes < 1:
+        raise Exception("At least one process is required: %d" % num_processes)
     if len(input_files) >= 10:
         input_files_info = "%d files" % len(input_files)
     else:
@@ -40,23 +114,34 @@ def determine(input_files: List[str], max_check_length: int = None, output_file:
         output = sys.stdout
     else:
         _logger.info("Opening: %s" % output_file)
-        output = open(output_file, "w")
+        output = open(output_file, "w", newline="" if (output_format == OUTPUT_FORMAT_CSV) else None)
+    csv_writer = None
+    if output_format == OUTPUT_FORMAT_CSV:
+        csv_writer = csv.writer(output)
+        csv_writer.writerow(["file", "encoding"])
 
     # determine
-    for input_file in input_files:
-        try:
-            _logger.info("Checking: %s" % input_file)
-            output.write(input_file)
-            output.write("\n")
-            enc = determine_encoding(input_file, max_check_length=max_check_length)
-            output.write("    ")
-            output.write(str(enc))
-            output.write("\n")
-        except:
-            _logger.exception("Failed to determine file encoding of: %s" % input_file)
+    executor = None
+    if num_processes > 1:
+        executor = ProcessPoolExecutor(max_workers=num_processes)
+        chunk_size = max(1, min(100, len(input_files) // (num_processes * 4)))
+        results = executor.map(_determine_file, input_files, [max_check_length] * len(input_files), chunksize=chunk_size)
+    else:
+        results = (_determine_file(x, max_check_length) for x in input_files)
+    try:
+        for count, (input_file, encoding, error) in enumerate(results, start=1):
+            if error is None:
+                _write_result(output, output_format, csv_writer, input_file, encoding)
+            else:
+                _logger.error("Failed to determine file encoding of: %s\n%s" % (input_file, error))
+            if (update_interval > 0) and (count % update_interval == 0):
+                _logger.info("%d/%d files checked..." % (count, len(input_files)))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
 
     # close output file
-    if output_file is not None:
+    if output is not sys.stdout:
         _logger.info("Closing: %s" % output_file)
         output.close()
 
@@ -77,11 +162,15 @@ def main(args=None):
     parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the actual files to check", required=False, nargs="*")
     parser.add_argument("-m", "--max_check_length", type=int, help="The maxmimum number of bytes to use for checking", required=False, default=None)
     parser.add_argument("-o", "--output", metavar="FILE", help="The path of the file to store the determined encodings in; outputs it to stdout if omitted or a directory", default=None, type=str, required=False)
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, help="The format to output the encodings in; jsonl and csv can be used as encoding map with llm-convert", default=OUTPUT_FORMAT_TEXT, required=False)
+    parser.add_argument("-j", "--num_processes", metavar="NUM", type=int, help="The number of processes to use for checking the files", default=1, required=False)
+    parser.add_argument("-u", "--update_interval", metavar="NUM", type=int, help="The number of files after which to output progress information (logging level INFO), <= 0 for none", default=DEFAULT_UPDATE_INTERVAL, required=False)
     add_logging_level(parser)
     parsed = parser.parse_args(args=args)
     set_logging_level(_logger, parsed.logging_level)
     input_files = locate_files(parsed.input, input_lists=parsed.input_list, fail_if_empty=True)
-    determine(input_files=input_files, max_check_length=parsed.max_check_length, output_file=parsed.output)
+    determine(input_files=input_files, max_check_length=parsed.max_check_length, output_file=parsed.output,
+              output_format=parsed.format, num_processes=parsed.num_processes, update_interval=parsed.update_interval)
 
 
 def sys_main() -> int:
@@ -0,0 +1,171 @@
+import argparse
+import logging
+import sys
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from wai.logging import init_logging, set_logging_level, add_logging_level
+from seppl.io import locate_files
+from ldc.core import ENV_LLM_LOGLEVEL
+from ldc.hash_utils import bucket_index
+
+RESOLVE_BUCKETS = "llm-resolve-buckets"
+
+_logger = logging.getLogger(RESOLVE_BUCKETS)
+
+
+def _resolve_bucket(index: int, bucket_files: List[str], duplicates: bool) -> Tuple[int, int, List[Tuple[str, int]], Optional[str]]:
+    """
+    Resolves the duplicates of a single bucket, keeping the occurrence with the smallest location
+    (file, then position).
+
+    :param index: the index of the bucket
+    :type index: int
+    :param bucket_files: the files of the bucket (from all nodes)
+    :type bucket_files: list
+    :param duplicates: whether to return the duplicates rather than the records to keep
+    :type duplicates: bool
+    :return: tuple of bucket index, number of records, the sorted locations (file, position) and the error (None if successful)
+    :rtype: tuple
+    """
+    best = dict()
+    dups = []
+    count = 0
+    try:
+        for bucket_file in bucket_files:
+            with open(bucket_file, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    line = line.rstrip("\n")
+                    if len(line) == 0:
+                        continue
+                    digest, rest = line.split("\t", 1)
+                    filename, position = rest.rsplit("\t", 1)
+                    location = (filename, int(position))
+                    count += 1
+                    if digest not in best:
+                        best[digest] = location
+                    elif location < best[digest]:
+                        dups.append(best[digest])
+                        best[digest] = location
+                    else:
+                        dups.append(location)
+    except Exception:
+        return index, count, [], traceback.format_exc()
+    if duplicates:
+        return index, count, sorted(dups), None
+    return index, count, sorted(best.values()), None
+
+
+def resolve(bucket_files: List[str], output_file: str = None, duplicates: bool = False, num_processes: int = 1):
+    """
+    Resolves the duplicates in the bucket files generated by the hash-partition filter and outputs
+    the locations (file and position) of the records to keep, one per line (tab-separated).
+
+    :param bucket_files: the bucket files to resolve
+    :type bucket_files: list
+    :param output_file: the file to store the locations in, prints to stdout if None
+    :type output_file: str
+    :param duplicates: whether to output the duplicates rather than the records to keep
+    :type duplicates: bool
+    :param num_processes: the number of processes to use for resolving the buckets
+    :type num_processes: int
+    """
+    if num_processes < 1:
+        raise Exception("At least one process is required: %d" % num_processes)
+
+    # group files by bucket
+    buckets: Dict[int, List[str]] = dict()
+    for bucket_file in bucket_files:
+        index = bucket_index(bucket_file)
+        if index is None:
+            raise Exception("Not a bucket file: %s" % bucket_file)
+        if index not in buckets:
+            buckets[index] = []
+        buckets[index].append(bucket_file)
+    indices = sorted(buckets.keys())
+    _logger.info("%d bucket files, %d buckets" % (len(bucket_files), len(indices)))
+
+    # output
+    if output_file is None:
+        output = sys.stdout
+    else:
+        _logger.info("Opening: %s" % output_file)
+        output = open(output_file, "w", encoding="utf-8")
+
+    # resolve
+    executor = None
+    if num_processes > 1:
+        executor = ProcessPoolExecutor(max_workers=num_processes)
+        results = executor.map(_resolve_bucket, indices, [buckets[x] for x in indices], [duplicates] * len(indices))
+    else:
+        results = (_resolve_bucket(x, buckets[x], duplicates) for x in indices)
+    total = 0
+    listed = 0
+    failed = 0
+    try:
+        for index, count, locations, error in results:
+            if error is not None:
+                failed += 1
+                _logger.error("Failed to resolve bucket %d:\n%s" % (index, error))
+                continue
+            total += count
+            listed += len(locations)
+            for filename, position in locations:
+                output.write("%s\t%d\n" % (filename, position))
+            _logger.debug("Bucket %d: %d records -> %d" % (index, count, len(locations)))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if output_file is not None:
+            output.close()
+
+    _logger.info("# records: %d" % total)
+    _logger.info("# %s: %d" % ("duplicates" if duplicates else "records to keep", listed))
+    if failed > 0:
+        raise Exception("Failed to resolve %d of %d bucket(s)!" % (failed, len(indices)))
+
+
+def main(args=None):
+    """
+    The main method for parsing command-line arguments.
+
+    :param args: the commandline arguments, uses sys.argv if not supplied
+    :type args: list
+    """
+    init_logging(env_var=ENV_LLM_LOGLEVEL)
+    parser = argparse.ArgumentParser(
+        description="Tool for resolving the duplicates in the bucket files generated by the hash-partition filter (from one or more nodes). Outputs the tab-separated locations (file and position) of the records to keep, which can be applied with the record-filter filter.",
+        prog=RESOLVE_BUCKETS,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-i", "--input", type=str, help="Path to the bucket file(s) to resolve; glob syntax is supported", required=False, nargs="*")
+    parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the actual bucket files to resolve", required=False, nargs="*")
+    parser.add_argument("-o", "--output", metavar="FILE", help="The path of the file to store the locations in; outputs them to stdout if omitted", default=None, type=str, required=False)
+    parser.add_argument("-d", "--duplicates", action="store_true", help="Outputs the locations of the duplicates rather than the ones of the records to keep")
+    parser.add_argument("-j", "--num_processes", metavar="NUM", type=int, help="The number of processes to use for resolving the buckets", default=1, required=False)
+    add_logging_level(parser)
+    parsed = parser.parse_args(args=args)
+    set_logging_level(_logger, parsed.logging_level)
+    bucket_files = locate_files(parsed.input, input_lists=parsed.input_list, fail_if_empty=True)
+    resolve(bucket_files, output_file=parsed.output, duplicates=parsed.duplicates, num_processes=parsed.num_processes)
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure.
+    """
+    try:
+        main()
+        return 0
+    except Exception:
+        traceback.print_exc()
+        print("options: %s" % str(sys.argv[1:]), file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    main()
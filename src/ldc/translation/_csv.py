@@ -9,9 +9,10 @@ from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix
-from ldc.api import open_file, generate_output
-from ldc.api.translation import TranslationData, TranslationReader, BatchTranslationWriter
+from ldc.api import open_file, generate_output, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next, parse_size
+from ldc.api.translation import TranslationData, TranslationReader, StreamTranslationWriter
 from ldc.utils import str_to_column_index
+from ldc.csv_utils import ArrowCsvReader, CSV_ENGINE_PYTHON, CSV_ENGINE_PYARROW, CSV_ENGINES, DEFAULT_BLOCK_SIZE
 from ldc.text_utils import empty_str_if_none
 
 
@@ -23,6 +24,7 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_id: str = None, col_meta: List[str] = None,
                  columns: List[str] = None, languages: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -41,6 +43,10 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         :type languages: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -58,6 +64,8 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         self.languages = languages
         self.indices = None
         self.encoding = encoding
+        self.engine = engine
+        self.block_size = block_size
         self._inputs = None
         self._current_input = None
         self._current_reader = None
@@ -105,6 +113,8 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         parser.add_argument("--col_id", metavar="COL", type=str, default=None, help="The 1-based column containing the row ID", required=False)
         parser.add_argument("--col_meta", metavar="COL", type=str, default=None, help="The name (or 1-based index) of the columns to store in the meta-data", required=False, nargs="*")
         parser.add_argument("--encoding", metavar="ENC", type=str, default=None, help="The encoding to force instead of auto-detecting it, e.g., 'utf-8'", required=False)
+        parser.add_argument("--engine", choices=CSV_ENGINES, default=CSV_ENGINE_PYTHON, help="The engine to use for parsing the files; 'pyarrow' parses blocks of data using multiple threads, reading all cells as strings and skipping rows with an unexpected number of columns", required=False)
+        parser.add_argument("--block_size", metavar="SIZE", type=parse_size, default=DEFAULT_BLOCK_SIZE, help="The number of bytes to parse at a time with the pyarrow engine; supports K/M/G suffixes", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -123,6 +133,8 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         self.col_id = ns.col_id
         self.col_meta = ns.col_meta
         self.encoding = ns.encoding
+        self.engine = ns.engine
+        self.block_size = ns.block_size
 
     def initialize(self):
         """
@@ -155,6 +167,29 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         """
         raise NotImplementedError()
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def _required_columns(self) -> List[Union[str, int]]:
+        """
+        Returns the columns that need to be parsed when using the pyarrow engine.
+
+        :return: the column names or 0-based indices (if no header)
+        :rtype: list
+        """
+        result = self.indices[:]
+        if self.idx_id > -1:
+            result.append(self.idx_id)
+        if self.no_header and (self.idx_meta is not None):
+            result.extend([x for x in self.idx_meta if x > -1])
+        return result
+
     def read(self) -> Iterable[TranslationData]:
         """
         Loads the data and returns the items one by one.
@@ -167,8 +202,17 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
         self._current_input = self._inputs.pop(0)
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
-        self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger())
-        self._current_reader = self._init_reader(self._current_input)
+        if self.engine == CSV_ENGINE_PYARROW:
+            self._current_input = ArrowCsvReader(self._current_input, delimiter=self._get_delimiter(), no_header=self.no_header,
+                                                 as_dict=False, columns=self._required_columns(),
+                                                 encoding=self.encoding, block_size=self.block_size,
+                                                 compression_threads=get_compression_threads(self.session),
+                                                 prefetch_size=get_prefetch_size(self.session), logger=self.logger())
+            self._current_reader = self._current_input
+        else:
+            self._current_input = open_file(self._current_input, mode="rt", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session))
+            self._current_reader = self._init_reader(self._current_input)
+        prefetch_next(self._inputs, self.session)
 
         count = 0
         for row in self._current_reader:
@@ -232,13 +276,13 @@ class AbstractCsvLikeTranslationReader(TranslationReader, abc.ABC):
             self._current_input = None
 
 
-class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
+class AbstractCsvLikeTranslationWriter(StreamTranslationWriter, abc.ABC):
     """
     Ancestor for writers of CSV-like files.
     """
 
     def __init__(self, target: str = None, no_header: bool = False, no_col_id: bool = False,
-                 languages: List[str] = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 languages: List[str] = None, buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -250,6 +294,8 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
         :type no_col_id: bool
         :param languages: the list of languages to output
         :type languages: list
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -263,6 +309,8 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
         self._current_output = None
         self._output = None
         self._output_writer = None
+        self.buffer_size = buffer_size
+        self._buffer = []
 
     def _get_output_description(self) -> str:
         """
@@ -285,6 +333,7 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
         parser.add_argument("-g", "--languages", metavar="LANG", type=str, default=None, help="The language IDs (ISO 639-1) to output in separate columns", required=True, nargs="+")
         parser.add_argument("-n", "--no_header", action="store_true", help="For suppressing the header row", required=False)
         parser.add_argument("--no_col_id", action="store_true", help="For suppressing the column with the row IDs", required=False)
+        parser.add_argument("-b", "--buffer_size", metavar="SIZE", type=int, default=1000, help="The number of records to buffer before writing them to the output (to improve I/O throughput)", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -296,6 +345,7 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
         """
         super()._apply_args(ns)
         self.target = ns.output
+        self.buffer_size = ns.buffer_size
         self.languages = ns.languages
         self.no_header = ns.no_header
         self.no_col_id = ns.no_col_id
@@ -327,27 +377,34 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
         """
         raise NotImplementedError()
 
-    def write_batch(self, data: Iterable[TranslationData]):
+    def _open_output(self, path: str):
         """
-        Saves the data in one go.
+        Opens the specified file for writing and outputs the header row, if required.
 
-        :param data: the data to write as iterable of TranslationData
-        :type data: Iterable
+        :param path: the file to write to
+        :type path: str
         """
-        if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, self._get_extension()):
-            self.finalize()
-            self._current_output = generate_output(self.session.current_input, self.target, self._get_extension(), self.session.options.compression)
-            self.logger().info("Writing to: " + self._current_output)
-            self._output = open_file(self._current_output, mode="wt")
-            self._output_writer = self._init_writer(self._output)
-            if not self.no_header:
-                row = []
-                if not self.no_col_id:
-                    row.append("ID")
-                row.extend(self.languages[:])
-                self._output_writer.writerow(row)
+        self.logger().info("Writing to: " + path)
+        self._output = open_file(path, mode="wt", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+        self._output_writer = self._init_writer(self._output)
+        if not self.no_header:
+            row = []
+            if not self.no_col_id:
+                row.append("ID")
+            row.extend(self.languages[:])
+            self._output_writer.writerow(row)
 
+    def _write(self, data: List[TranslationData]):
+        """
+        Writes the records to the current output.
+
+        :param data: the records to write
+        :type data: list
+        """
         for item in data:
+            if self._shard_is_full():
+                self._output.close()
+                self._open_output(self._shard_next())
             row = []
             if not self.no_col_id:
                 if (item.meta is not None) and ("id" in item.meta):
@@ -360,16 +417,44 @@ class AbstractCsvLikeTranslationWriter(BatchTranslationWriter, abc.ABC):
                 else:
                     row.append(None)
             try:
-                self._output_writer.writerow(row)
+                self._shard_written(self._output_writer.writerow(row))
             except:
                 print("Failed to write row: %s" % str(row), file=sys.stderr)
                 traceback.print_exc()
 
+    def _flush_buffer(self):
+        """
+        Writes the buffered records to the current output.
+        """
+        self.logger().debug("flushing buffer: %d" % len(self._buffer))
+        self._write(self._buffer)
+        self._buffer.clear()
+
+    def write_stream(self, data: Union[TranslationData, Iterable[TranslationData]]):
+        """
+        Saves the data one by one.
+
+        :param data: the data to write
+        :type data: TranslationData
+        """
+        if isinstance(data, TranslationData):
+            data = [data]
+
+        if self._has_input_changed(update=True) and self._output_needs_changing(self._current_output, self.target, self._get_extension()):
+            self.finalize()
+            self._current_output = generate_output(self.session.current_input, self.target, self._get_extension(), self.session.options.compression)
+            self._open_output(self._shard_begin(self._current_output))
+
+        self._buffer.extend(data)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush_buffer()
+
     def finalize(self):
         """
         Finishes the writing, e.g., for closing files or databases.
         """
         if self._output is not None:
+            self._flush_buffer()
             super().finalize()
             self._output_writer = None
             self._output.close()
@@ -384,6 +469,7 @@ class CsvTranslationReader(AbstractCsvLikeTranslationReader):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_id: str = None, col_meta: List[str] = None,
                  columns: List[str] = None, languages: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -402,6 +488,10 @@ class CsvTranslationReader(AbstractCsvLikeTranslationReader):
         :type languages: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -410,6 +500,7 @@ class CsvTranslationReader(AbstractCsvLikeTranslationReader):
         super().__init__(source=source, source_list=source_list,
                          no_header=no_header, columns=columns, languages=languages,
                          col_id=col_id, col_meta=col_meta, encoding=encoding,
+                         engine=engine, block_size=block_size,
                          logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
@@ -461,6 +552,15 @@ class CsvTranslationReader(AbstractCsvLikeTranslationReader):
             next(reader)
         return reader
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        return ","
+
 
 class CsvTranslationWriter(AbstractCsvLikeTranslationWriter):
     """
@@ -468,7 +568,7 @@ class CsvTranslationWriter(AbstractCsvLikeTranslationWriter):
     """
 
     def __init__(self, target: str = None, no_header: bool = False,
-                 languages: List[str] = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 languages: List[str] = None, buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -478,13 +578,15 @@ class CsvTranslationWriter(AbstractCsvLikeTranslationWriter):
         :type no_header: bool
         :param languages: the list of languages to output
         :type languages: list
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(target=target, no_header=no_header, languages=languages,
-                         logger_name=logger_name, logging_level=logging_level)
+                         buffer_size=buffer_size, logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
         """
@@ -541,6 +643,7 @@ class TsvTranslationReader(AbstractCsvLikeTranslationReader):
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  no_header: bool = False, col_id: str = None, col_meta: List[str] = None,
                  columns: List[str] = None, languages: List[str] = None, encoding: str = None,
+                 engine: str = CSV_ENGINE_PYTHON, block_size: int = DEFAULT_BLOCK_SIZE,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -559,6 +662,10 @@ class TsvTranslationReader(AbstractCsvLikeTranslationReader):
         :type languages: list
         :param encoding: the encoding to use, None for auto-detect
         :type encoding: str
+        :param engine: the engine to use for parsing the files (python|pyarrow)
+        :type engine: str
+        :param block_size: the number of bytes to parse at a time with the pyarrow engine
+        :type block_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -567,6 +674,7 @@ class TsvTranslationReader(AbstractCsvLikeTranslationReader):
         super().__init__(source=source, source_list=source_list,
                          no_header=no_header, columns=columns, languages=languages,
                          col_id=col_id, col_meta=col_meta, encoding=encoding,
+                         engine=engine, block_size=block_size,
                          logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
@@ -618,6 +726,15 @@ class TsvTranslationReader(AbstractCsvLikeTranslationReader):
             next(reader)
         return reader
 
+    def _get_delimiter(self) -> str:
+        """
+        Returns the delimiter used by the files.
+
+        :return: the delimiter
+        :rtype: str
+        """
+        return '\t'
+
 
 class TsvTranslationWriter(AbstractCsvLikeTranslationWriter):
     """
@@ -625,7 +742,7 @@ class TsvTranslationWriter(AbstractCsvLikeTranslationWriter):
     """
 
     def __init__(self, target: str = None, no_header: bool = False,
-                 languages: List[str] = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 languages: List[str] = None, buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -635,13 +752,15 @@ class TsvTranslationWriter(AbstractCsvLikeTranslationWriter):
         :type no_header: bool
         :param languages: the list of languages to output
         :type languages: list
+        :param buffer_size: the number of records to buffer before writing them to the output
+        :type buffer_size: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(target=target, no_header=no_header, languages=languages,
-                         logger_name=logger_name, logging_level=logging_level)
+                         buffer_size=buffer_size, logger_name=logger_name, logging_level=logging_level)
 
     def name(self) -> str:
         """
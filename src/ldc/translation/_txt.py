@@ -7,7 +7,7 @@ from wai.logging import LOGGING_WARNING
 from seppl import add_metadata
 from seppl.io import locate_files
 from ldc.core import domain_suffix
-from ldc.api import open_file, generate_output, is_compressed
+from ldc.api import open_file, generate_output, get_compression_level, get_compression_threads, get_prefetch_size, prefetch_next, parse_size
 from ldc.api.translation import TranslationData, TranslationReader, StreamTranslationWriter
 from ldc.utils import str_to_column_index
 from ldc.text_utils import empty_str_if_none
@@ -170,7 +170,7 @@ class TxtTranslationReader(TranslationReader):
         """
         self.finalize()
 
-        for input_file in self._inputs:
+        for index, input_file in enumerate(self._inputs):
             self.session.current_input = input_file
             self.logger().info("Reading from: " + str(input_file))
 
@@ -181,7 +181,8 @@ class TxtTranslationReader(TranslationReader):
             else:
                 sep = self.col_sep
 
-            with open_file(self.session.current_input, mode="r", encoding=self.encoding, logger=self.logger()) as fp:
+            with open_file(self.session.current_input, mode="r", encoding=self.encoding, logger=self.logger(), compression_threads=get_compression_threads(self.session), prefetch_size=get_prefetch_size(self.session)) as fp:
+                prefetch_next(self._inputs[index + 1:], self.session)
                 lines = fp.readlines()
             for line in lines:
                 old_id = curr_id
@@ -235,7 +236,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
     """
 
     def __init__(self, target: str = None, num_digits: int = 6, line_format: str = "%s-%s: %s" % (PH_LANG, PH_ID, PH_CONTENT),
-                 buffer_size: int = 1000, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 buffer_size: int = 1000, buffer_bytes: int = 0, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the writer.
 
@@ -247,6 +248,8 @@ class TxtTranslationWriter(StreamTranslationWriter):
         :type line_format: str
         :param buffer_size: the size of the record buffer (< 1 for unlimited)
         :type buffer_size: int
+        :param buffer_bytes: the maximum size of the buffered translations (in characters) before flushing, < 1 for no limit
+        :type buffer_bytes: int
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -257,6 +260,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
         self.num_digits = num_digits
         self.line_format = line_format
         self.buffer_size = buffer_size
+        self.buffer_bytes = buffer_bytes
         self._current_output = None
         self._output = None
         self._writer = None
@@ -264,6 +268,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
         self._first_item = True
         self._fname_format = None
         self._buffer = []
+        self._buffered = 0
 
     def name(self) -> str:
         """
@@ -284,8 +289,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
         return "Writes translation data to plain text files.\n" \
                + "When providing an output directory, either uses the current session counter as the filename or, " \
                + "if present, the 'id' value from the meta-data.\n" \
-               + "When providing an output file, all incoming content will be concatenated in this one file. " \
-               + "Compression is not available in this case due to the streaming context."
+               + "When providing an output file, all incoming content will be concatenated in this one file."
 
     def _create_argparser(self) -> argparse.ArgumentParser:
         """
@@ -299,6 +303,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
         parser.add_argument("-d", "--num_digits", metavar="NUM", type=int, default=6, help="The number of digits to use for the filenames", required=False)
         parser.add_argument("-f", "--line_format", metavar="FORMAT", type=str, default="%s-%s: %s" % (PH_LANG, PH_ID, PH_CONTENT), help="The format for the lines in the text file", required=False)
         parser.add_argument("-b", "--buffer_size", metavar="SIZE", type=int, default=1000, help="The size of the record buffer when concatenating (to improve I/O throughput)", required=False)
+        parser.add_argument("--buffer_bytes", metavar="SIZE", type=parse_size, default=0, help="The maximum size of the buffered translations (in characters) when concatenating, flushes the buffer once reached regardless of the number of records; supports K/M/G suffixes; <= 0 for no limit", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -313,6 +318,7 @@ class TxtTranslationWriter(StreamTranslationWriter):
         self.num_digits = ns.num_digits
         self.line_format = ns.line_format
         self.buffer_size = ns.buffer_size
+        self.buffer_bytes = ns.buffer_bytes
 
     def initialize(self):
         """
@@ -325,9 +331,10 @@ class TxtTranslationWriter(StreamTranslationWriter):
             self._concatenate = False
         else:
             self._concatenate = True
-            if is_compressed(self.target):
-                raise Exception("Cannot use compression when concatenating due to streaming!")
+        if not self._concatenate and self._sharding_enabled():
+            self.logger().warning("Sharding is not available when writing one file per record, ignoring!")
         self._buffer.clear()
+        self._buffered = 0
 
     def _write_data(self, fp, id, data: TranslationData):
         """
@@ -337,14 +344,18 @@ class TxtTranslationWriter(StreamTranslationWriter):
         :param id: the ID of the translation
         :param data: the translation data to write
         :type data: TranslationData
+        :return: the number of characters written
+        :rtype: int
         """
+        result = 0
         for lang in data.translations.keys():
             line = self.line_format
             line = line.replace(PH_LANG, lang)
             line = line.replace(PH_ID, str(id))
             line = line.replace(PH_CONTENT, empty_str_if_none(data.translations[lang]))
-            fp.write(line)
-            fp.write("\n")
+            result += fp.write(line)
+            result += fp.write("\n")
+        return result
 
     def _get_id(self, data: TranslationData) -> Union[str, int]:
         """
@@ -359,28 +370,56 @@ class TxtTranslationWriter(StreamTranslationWriter):
         else:
             return self.session.count
 
+    def _open_output(self, output: str):
+        """
+        Opens the output file for writing, closing any previously opened one.
+
+        :param output: the file to write to
+        :type output: str
+        """
+        self._close_output()
+        self.logger().info("Writing to: %s" % output)
+        self._output = open_file(output, mode="wt", compression_level=get_compression_level(self.session), compression_threads=get_compression_threads(self.session))
+
+    def _close_output(self):
+        """
+        Closes the output file, if open.
+        """
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+    def _write(self, data: List[TranslationData]):
+        """
+        Writes the data to the current output.
+
+        :param data: the records to write
+        :type data: list
+        """
+        for item in data:
+            if self._shard_is_full():
+                self._open_output(self._shard_next())
+            try:
+                self._shard_written(self._write_data(self._output, self._get_id(item), item))
+            except KeyboardInterrupt as e:
+                raise e
+            except:
+                self.logger().exception("Failed to write record: %s" % str(item))
+
     def _flush_buffer(self):
         """
         Writes the buffer content to disk.
         """
         self.logger().debug("flushing buffer: %d" % len(self._buffer))
-        mode = "w" if self._first_item else "a"
         output_file = self.target
         if self.session.options.force_batch and os.path.isdir(output_file):
             output_file = generate_output(self.session.current_input, output_file, ".txt", None)
-        if self._first_item:
-            self.logger().info("Writing to: %s" % output_file)
+        if self._first_item or (output_file != self._shard_base):
+            self._open_output(self._shard_begin(output_file))
         self._first_item = False
-        with open(output_file, mode) as fp:
-            for d in self._buffer:
-                try:
-                    id_ = self._get_id(d)
-                    self._write_data(fp, id_, d)
-                except KeyboardInterrupt as e:
-                    raise e
-                except:
-                    self.logger().exception("Failed to write record: %s" % str(d))
+        self._write(self._buffer)
         self._buffer.clear()
+        self._buffered = 0
 
     def write_stream(self, data: Union[TranslationData, Iterable[TranslationData]]):
         """
@@ -393,9 +432,13 @@ class TxtTranslationWriter(StreamTranslationWriter):
             data = [data]
 
         if self._concatenate:
-            self._buffer.extend(data)
-            if len(self._buffer) >= self.buffer_size:
-                self._flush_buffer()
+            for item in data:
+                self._buffer.append(item)
+                if self.buffer_bytes > 0:
+                    for lang in item.translations:
+                        self._buffered += len(lang) + len(empty_str_if_none(item.translations[lang])) + 1
+                if (len(self._buffer) >= self.buffer_size) or ((self.buffer_bytes > 0) and (self._buffered >= self.buffer_bytes)):
+                    self._flush_buffer()
         else:
             for d in data:
                 id_ = self._get_id(d)
@@ -404,9 +447,20 @@ class TxtTranslationWriter(StreamTranslationWriter):
                 except:
                     fname = str(id_) + ".txt"
                 output = generate_output(fname, self.target, ".txt", self.session.options.compression)
-                self.logger().info("Writing to: %s" % output)
-                with open(output, "w") as fp:
-                    self._write_data(fp, id_, d)
+                self._open_output(output)
+                try:
+                    self._write_data(self._output, id_, d)
+                finally:
+                    self._close_output()
+
+    def _get_extension(self) -> str:
+        """
+        Returns the extension to use for output files.
+
+        :return: the extension to use (incl dot)
+        :rtype: str
+        """
+        return ".txt"
 
     def finalize(self):
         """
@@ -415,3 +469,4 @@ class TxtTranslationWriter(StreamTranslationWriter):
         super().finalize()
         if len(self._buffer) > 0:
             self._flush_buffer()
+        self._close_output()